@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Import time benchmark.
+#  Created by LulzLoL231 at 19/10/26
+#
+'''Import time benchmark of proxy6 entry points.
+
+Fails if `import proxy6` pulls in heavy dependencies, if creating a client
+loads pydantic or an optional subsystem, or if the median time of any
+measured statement exceeds its budget.
+
+Statements with a setup are timed after the setup ran, so they measure
+the cost proxy6 adds on top of its dependencies.
+
+Usage: python benchmarks/import_time.py [--runs N] [--max-ms MS]
+'''
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('httpx', 'pydantic', 'proxy6.types', 'proxy6.sync.api', 'proxy6.async_.api')
+# Modules a client must not load before its first request: the pydantic
+# models are only needed to parse responses, the rest is opt-in. httpcore
+# is not listed, the httpx transport loads it when the client is created.
+CLIENT_MODULES = (
+    'pydantic', 'proxy6.models', 'proxy6.account', 'proxy6.preflight',
+    'proxy6.proxy_cache', 'proxy6.refresh_ahead', 'proxy6.network'
+)
+CLIENT_IMPORT = "from proxy6 import Proxy6, AsyncProxy6; Proxy6('key'); AsyncProxy6('key')"
+LAZY_IMPORT = 'import proxy6'
+# (setup, statement): budget in ms. The budgets are goals for proxy6 itself,
+# not the medians of the day: asyncio and httpx alone take ~100 ms to import
+# and are excluded by the setup. The CLI has to reach its first request
+# (asyncio, httpx and a client) within 150 ms on a single-core VM.
+STATEMENTS = {
+    ('', LAZY_IMPORT): 5.0,
+    ('import asyncio, httpx', 'from proxy6 import AsyncProxy6'): 10.0,
+    # concurrent.futures is most of the sync client's own cost.
+    ('import httpx', 'from proxy6 import Proxy6'): 15.0,
+    ('', 'import proxy6.cli'): 70.0,
+    ('', "import proxy6.cli; from proxy6 import AsyncProxy6; AsyncProxy6('key')"): 150.0,
+    ('import pydantic', 'from proxy6 import models'): 100.0,
+}
+TIMER = (
+    '{setup}\n'
+    'import time; _t = time.perf_counter(); {stmt}; '
+    'print((time.perf_counter() - _t) * 1000)'
+)
+
+
+def _run(code: str) -> str:
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    return subprocess.run(
+        [sys.executable, '-c', code], env=env, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def measure(setup: str, stmt: str, runs: int) -> float:
+    return statistics.median(float(_run(TIMER.format(setup=setup, stmt=stmt))) for _ in range(runs))
+
+
+def leaked_modules(stmt: str, modules: tuple[str, ...]) -> list[str]:
+    out = _run(f'import sys; {stmt}; print(",".join(m for m in {modules!r} if m in sys.modules))')
+    return [m for m in out.split(',') if m]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--max-ms', type=float, default=None, help='override budgets of the heavy statements')
+    args = parser.parse_args()
+
+    failed = False
+    for stmt, modules in ((LAZY_IMPORT, HEAVY_MODULES), (CLIENT_IMPORT, CLIENT_MODULES)):
+        leaked = leaked_modules(stmt, modules)
+        if leaked:
+            print(f'FAIL {stmt} loads: {", ".join(leaked)}')
+            failed = True
+    for (setup, stmt), budget in STATEMENTS.items():
+        if args.max_ms is not None and stmt != LAZY_IMPORT:
+            budget = args.max_ms
+        took = measure(setup, stmt, args.runs)
+        over = took > budget
+        failed |= over
+        label = f'[{setup}] {stmt}' if setup else stmt
+        print(f'{"FAIL" if over else "ok  "} {label:<72} {took:8.2f} ms (budget {budget} ms)')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,10 +3,33 @@
 #  pyProxy6 API
 #  Created by LulzLoL231 at 02/07/22
 #
-from .sync.api import Proxy6
-from .async_.api import AsyncProxy6
+# Clients and models are imported on first attribute access: importing
+# httpx and pydantic costs more than most short CLI or serverless runs.
+from importlib import import_module
 
 
 __author__ = 'LulzLoL231'
 __version__ = '1.2'
 __contact__ = 'https://github.com/LulzLoL231'
+__all__ = ['Proxy6', 'AsyncProxy6', 'types', 'errors']
+
+_LAZY_ATTRS = {
+    'Proxy6': '.sync.api',
+    'AsyncProxy6': '.async_.api',
+}
+_LAZY_MODULES = ('types', 'errors')
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRS:
+        value = getattr(import_module(_LAZY_ATTRS[name], __name__), name)
+    elif name in _LAZY_MODULES:
+        value = import_module(f'.{name}', __name__)
+    else:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
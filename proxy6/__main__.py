@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: python -m proxy6
+#  Created by LulzLoL231 at 19/10/26
+#
+import sys
+
+from .cli import main
+
+
+sys.exit(main())
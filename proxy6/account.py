@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Account state.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable
+
+from pydantic import BaseModel, Field
+
+
+log = logging.getLogger('proxy6')
+
+
+class AccountSnapshot(BaseModel):
+    '''Consistent copy of the account fields at one point in time.
+    '''
+    user_id: str | None = Field(
+        None, description='Номер вашего аккаунта'
+    )
+    balance: Decimal | None = Field(
+        None, description='Последнее известное состояние баланса'
+    )
+    currency: str | None = Field(
+        None, description='Валюта аккаунта (RUB, либо USD)'
+    )
+    updated_at: datetime | None = Field(
+        None, description='Время получения последнего ответа API'
+    )
+
+
+class BalanceChange(BaseModel):
+    '''Emitted when the balance reported by the API changes.
+    '''
+    user_id: str | None = Field(None, description='Номер вашего аккаунта')
+    old: Decimal | None = Field(
+        None, description='Предыдущий баланс (None для первого ответа)'
+    )
+    new: Decimal = Field(..., description='Новый баланс')
+    currency: str | None = Field(None, description='Валюта аккаунта')
+    timestamp: datetime = Field(..., description='Время изменения')
+
+
+class AccountState:
+    '''Tracks account fields returned with every successful API response.
+
+    The connectors feed every parsed response into `update`, so reading
+    the balance never costs an API call.
+    '''
+    SPEND_WINDOW = 3600
+
+    def __init__(self, spend_window: float = SPEND_WINDOW) -> None:
+        self.spend_window = spend_window
+        self._lock = threading.Lock()
+        self._snapshot = AccountSnapshot()
+        self._history: deque[tuple[float, Decimal]] = deque()
+        self._listeners: list[tuple[Callable[[BalanceChange], Any], asyncio.AbstractEventLoop | None]] = []
+        self._sent: float | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def user_id(self) -> str | None:
+        return self._snapshot.user_id
+
+    @property
+    def balance(self) -> Decimal | None:
+        return self._snapshot.balance
+
+    @property
+    def currency(self) -> str | None:
+        return self._snapshot.currency
+
+    @property
+    def updated_at(self) -> datetime | None:
+        return self._snapshot.updated_at
+
+    def snapshot(self) -> AccountSnapshot:
+        '''Returns the latest account fields.
+
+        Returns:
+            AccountSnapshot: Account fields and the time they were received.
+        '''
+        return self._snapshot
+
+    def subscribe(self, callback: Callable[[BalanceChange], Any]) -> Callable[[], None]:
+        '''Registers balance change listener.
+
+        Coroutine listeners run on the event loop they were subscribed
+        from, also when the update comes from a sync client thread.
+
+        Args:
+            callback (Callable[[BalanceChange], Any]): Listener.
+
+        Raises:
+            TypeError: Coroutine listener subscribed outside of a running event loop.
+
+        Returns:
+            Callable[[], None]: Unsubscribe function.
+        '''
+        loop = None
+        if inspect.iscoroutinefunction(callback):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                raise TypeError('Асинхронный обработчик должен подписываться из запущенного event loop.')
+        listener = callback, loop
+        with self._lock:
+            self._listeners.append(listener)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+        return unsubscribe
+
+    def update(self, resp: dict, sent: float | None = None) -> BalanceChange | None:
+        '''Updates state from successful API response.
+
+        Concurrent responses may arrive out of order; with `sent`, a
+        response to a request sent before the one already applied is
+        ignored, so an older balance never overwrites a newer one.
+
+        Args:
+            resp (dict): API response.
+            sent (float | None, optional): `time.monotonic()` when the request was sent. Defaults to None.
+
+        Returns:
+            BalanceChange | None: Change event, if balance was changed.
+        '''
+        if 'balance' not in resp:
+            return None
+        balance = Decimal(str(resp['balance']))
+        user_id = resp.get('user_id')
+        now = time.time()
+        with self._lock:
+            if sent is not None:
+                if self._sent is not None and sent < self._sent:
+                    return None
+                self._sent = sent
+            old = self._snapshot.balance
+            self._snapshot = AccountSnapshot(
+                user_id=str(user_id) if user_id is not None else self._snapshot.user_id,
+                balance=balance,
+                currency=resp.get('currency', self._snapshot.currency),
+                updated_at=datetime.fromtimestamp(now)
+            )
+            if old == balance:
+                return None
+            self._history.append((now, balance))
+            self._trim_history(now)
+            listeners = list(self._listeners)
+            change = BalanceChange(
+                user_id=self._snapshot.user_id, old=old, new=balance,
+                currency=self._snapshot.currency,
+                timestamp=self._snapshot.updated_at
+            )
+        for listener in listeners:
+            self._notify(listener, change)
+        return change
+
+    def spend_rate(self) -> Decimal:
+        '''Estimates spending speed over the rolling window.
+
+        Top-ups are not counted, only balance decreases.
+
+        Returns:
+            Decimal: Spent amount per hour.
+        '''
+        now = time.time()
+        with self._lock:
+            self._trim_history(now)
+            history = list(self._history)
+        if len(history) < 2:
+            return Decimal(0)
+        spent = sum(
+            (max(prev - cur, Decimal(0)) for (_, prev), (_, cur) in zip(history, history[1:])),
+            Decimal(0)
+        )
+        elapsed = max(now - history[0][0], 1.0)
+        return spent * 3600 / Decimal(str(elapsed))
+
+    def _trim_history(self, now: float) -> None:
+        # Keep one sample older than the window as the baseline for the first delta.
+        while len(self._history) > 1 and now - self._history[1][0] > self.spend_window:
+            self._history.popleft()
+
+    def _notify(
+            self, listener: tuple[Callable[[BalanceChange], Any], asyncio.AbstractEventLoop | None],
+            change: BalanceChange
+    ) -> None:
+        callback, loop = listener
+        try:
+            result = callback(change)
+            if not inspect.iscoroutine(result):
+                return
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            loop = loop or running
+            if loop is None:
+                result.close()
+                log.error('Balance listener returned a coroutine outside of an event loop')
+            elif loop is running:
+                task = loop.create_task(result)
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            else:
+                asyncio.run_coroutine_threadsafe(result, loop)
+        except Exception:
+            log.exception('Balance listener failed')
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: IP allowlist manager.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import ipaddress
+import json
+import logging
+import os
+import time
+from typing import Iterable
+
+from .async_.api import AsyncProxy6
+
+
+log = logging.getLogger('proxy6')
+
+
+def _normalize(ip: str) -> str:
+    try:
+        return str(ipaddress.ip_address(ip.strip()))
+    except ValueError:
+        raise ValueError(f'Некорректный IP-адрес: "{ip}".')
+
+
+def _lock_file(path: str) -> int:
+    import fcntl
+
+    fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+def _close_locked(locking: asyncio.Future) -> None:
+    if not locking.cancelled() and locking.exception() is None:
+        os.close(locking.result())
+
+
+class AllowlistManager:
+    '''Keeps the `ipauth` allowlist in sync with a locally desired IP set.
+
+    `ipauth` replaces the whole list, so concurrent callers would overwrite
+    each other. Here `add`/`remove` only change the desired set; all
+    changes made within `debounce` seconds of the first one are sent as
+    one `ipauth` call, and no call is made if the resulting set equals the
+    last one sent. With `ttl`, added IPs are leases that callers refresh by
+    adding them again; expired ones are dropped on the next flush.
+
+    With `path`, the desired and applied sets are kept in that JSON file
+    and every flush runs under an exclusive `fcntl` lock on `path + '.lock'`,
+    so workers of a fleet merge their changes into one shared set and a
+    worker that finds its change already applied by another sends nothing.
+    The file mode is POSIX-only.
+    '''
+    DEBOUNCE = 1.0
+
+    def __init__(
+            self, client: AsyncProxy6, debounce: float = DEBOUNCE,
+            path: str | None = None, ttl: float | None = None
+    ) -> None:
+        self.client = client
+        self.debounce = debounce
+        self.path = path
+        self.ttl = ttl
+        self.desired: dict[str, float | None] = {}
+        self.applied: frozenset[str] | None = None
+        self.calls = 0
+        self.skipped = 0
+        self._ops: list[tuple[bool, str, float | None]] = []
+        self._waiters: list[asyncio.Future] = []
+        self._flusher: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def effective(self) -> frozenset[str]:
+        '''IPs that should be allowed now.
+        '''
+        now = time.time()
+        return frozenset(ip for ip, expires in self.desired.items() if expires is None or expires > now)
+
+    async def add(self, *ips: str, wait: bool = True) -> frozenset[str] | None:
+        '''Adds IPs to the allowlist.
+
+        Args:
+            *ips (str): IP addresses.
+            wait (bool, optional): Wait until the change is sent. Defaults to True.
+
+        Raises:
+            ValueError: Некорректный IP-адрес.
+
+        Returns:
+            frozenset[str] | None: Allowlist after the flush, None if not waiting.
+        '''
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        return await self._submit([(True, _normalize(ip), expires) for ip in ips], wait)
+
+    async def remove(self, *ips: str, wait: bool = True) -> frozenset[str] | None:
+        '''Removes IPs from the allowlist.
+
+        Args:
+            *ips (str): IP addresses.
+            wait (bool, optional): Wait until the change is sent. Defaults to True.
+
+        Raises:
+            ValueError: Некорректный IP-адрес.
+
+        Returns:
+            frozenset[str] | None: Allowlist after the flush, None if not waiting.
+        '''
+        return await self._submit([(False, _normalize(ip), None) for ip in ips], wait)
+
+    async def flush(self) -> frozenset[str]:
+        '''Sends pending changes now, skipping the call if the allowlist is unchanged.
+
+        Returns:
+            frozenset[str]: Allowlist.
+        '''
+        async with self._lock:
+            ops, self._ops = self._ops, []
+            waiters, self._waiters = self._waiters, []
+            try:
+                if self.path is None:
+                    result = await self._apply(ops)
+                else:
+                    result = await self._apply_shared(ops)
+            except BaseException as e:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                raise
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(result)
+            return result
+
+    async def close(self) -> None:
+        '''Sends pending changes and stops the debounce timer.
+        '''
+        if self._ops or self._waiters:
+            await self.flush()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+
+    async def _submit(self, ops: list[tuple[bool, str, float | None]], wait: bool) -> frozenset[str] | None:
+        self._ops.extend(ops)
+        future = asyncio.get_running_loop().create_future() if wait else None
+        if future is not None:
+            self._waiters.append(future)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._debounced())
+        return await future if future is not None else None
+
+    async def _debounced(self) -> None:
+        # Changes submitted while a flush is running go to the next window.
+        while self._ops or self._waiters:
+            await asyncio.sleep(self.debounce)
+            try:
+                await self.flush()
+            except Exception as e:
+                # Waiters already got the error.
+                log.warning(f'ipauth flush failed: {e!r}')
+
+    def _merge(self, desired: dict[str, float | None], ops: Iterable[tuple[bool, str, float | None]]) -> None:
+        for add, ip, expires in ops:
+            if add:
+                desired[ip] = expires
+            else:
+                desired.pop(ip, None)
+        now = time.time()
+        for ip in [ip for ip, expires in desired.items() if expires is not None and expires <= now]:
+            del desired[ip]
+
+    async def _apply(self, ops: list[tuple[bool, str, float | None]]) -> frozenset[str]:
+        self._merge(self.desired, ops)
+        effective = self.effective
+        if effective != self.applied:
+            await self._send(effective)
+            self.applied = effective
+        else:
+            self.skipped += 1
+        return effective
+
+    async def _apply_shared(self, ops: list[tuple[bool, str, float | None]]) -> frozenset[str]:
+        # The thread blocked in `flock` can't be cancelled: it keeps the lock
+        # file open and the cancelled flush closes it once the lock is taken.
+        locking = asyncio.ensure_future(asyncio.to_thread(_lock_file, f'{self.path}.lock'))
+        try:
+            fd = await asyncio.shield(locking)
+        except asyncio.CancelledError:
+            locking.add_done_callback(_close_locked)
+            raise
+        try:
+            state = self._read()
+            desired = state['desired']
+            applied = frozenset(state['applied']) if state['applied'] is not None else None
+            self._merge(desired, ops)
+            self.desired = desired
+            effective = self.effective
+            try:
+                if effective != applied:
+                    await self._send(effective)
+                    applied = effective
+                else:
+                    self.skipped += 1
+            finally:
+                # Changes are kept even if the call failed, the next flush resends them.
+                self._write(desired, applied)
+                self.applied = applied
+            return effective
+        finally:
+            os.close(fd)
+
+    async def _send(self, ips: frozenset[str]) -> None:
+        self.calls += 1
+        if ips:
+            await self.client.ipauth(sorted(ips))
+        else:
+            await self.client.ipauth(delete=True)
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return {'desired': {}, 'applied': None}
+        except ValueError:
+            log.warning(f'Broken allowlist state in {self.path}, starting over')
+            return {'desired': {}, 'applied': None}
+        return {'desired': dict(state.get('desired', {})), 'applied': state.get('applied')}
+
+    def _write(self, desired: dict[str, float | None], applied: frozenset[str] | None) -> None:
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'desired': desired,
+                'applied': sorted(applied) if applied is not None else None
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
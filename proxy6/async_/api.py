@@ -3,90 +3,457 @@
 #  pyProxy6 API: Async API.
 #  Created by LulzLoL231 at 02/07/22
 #
+# Annotations are not evaluated, so the response models (pydantic) and the
+# optional subsystems are only imported when used: a client sends its first
+# request without them.
+from __future__ import annotations
+
+import asyncio
+import contextlib
 import logging
 import time
 from asyncio import sleep
-from typing import Coroutine, Any
+from typing import TYPE_CHECKING, AsyncIterator, Coroutine, Any, TypeVar
 from urllib.parse import urlencode
 
-from httpx import AsyncClient, Response, USE_CLIENT_DEFAULT
+from httpx import AsyncBaseTransport, AsyncClient, AsyncHTTPTransport, Limits, Response, URL, USE_CLIENT_DEFAULT
 
 from .. import types
 from .. import errors
+from .. import tracing
+from ..hedging import HEDGE_METHODS, LatencyTracker
+from .scheduler import RequestScheduler, RequestPriority, method_priority
+
+if TYPE_CHECKING:
+    from ..account import AccountState
+    from ..refresh_ahead import RefreshAheadCache
 
 log = logging.getLogger('proxy6')
+T = TypeVar('T')
 
 
 class RequestDelayer:
     REQUESTS_SECONDS_INTERVAL = 1
     MAX_REQUESTS_PER_INTERVAL = 2
+    POLL_INTERVAL = 0.05
 
     def __init__(self):
         self.last_requests: list[dict[str, float]] = list()
 
-    async def run_or_delay(self, coro: Coroutine[Any, Any, Response]) -> Response:
+    async def acquire(self) -> dict[str, float]:
+        '''Waits for a free request slot and takes it.
+
+        Returns:
+            dict[str, float]: Request record, must be passed to `release` or `cancel`.
+        '''
         while True:
+            now = time.time()
             old_requests = [request for request in self.last_requests if "finish" in request and
-                            time.time() - request["finish"] > self.REQUESTS_SECONDS_INTERVAL]
+                            now - request["finish"] > self.REQUESTS_SECONDS_INTERVAL]
             for old_request in old_requests:
                 self.last_requests.remove(old_request)
 
             if len(self.last_requests) < self.MAX_REQUESTS_PER_INTERVAL:
                 break
 
-            await sleep(1)
+            finished = [request["finish"] for request in self.last_requests if "finish" in request]
+            if finished:
+                await sleep(max(min(finished) + self.REQUESTS_SECONDS_INTERVAL - now, self.POLL_INTERVAL))
+            else:
+                await sleep(self.POLL_INTERVAL)
 
         request = {"start": time.time()}
         self.last_requests.append(request)
+        return request
+
+    def release(self, request: dict[str, float]) -> None:
+        request["finish"] = time.time()
+
+    def cancel(self, request: dict[str, float]) -> None:
+        self.last_requests = [r for r in self.last_requests if r is not request]
 
+    async def run_or_delay(self, coro: Coroutine[Any, Any, Response]) -> Response:
+        request = await self.acquire()
         try:
             result = await coro
         finally:
-            request["finish"] = time.time()
+            self.release(request)
 
         return result
 
 
 class AsyncAPIConnector:
     ENDPOINT = 'https://proxy6.net/api/{}/{}'
-
-    def __init__(self, apikey: str, request_timeout: int = None) -> None:
+    KEEPALIVE_INTERVAL = 30.0
+    KEEPALIVE_EXPIRY = 90.0
+
+    def __init__(
+            self, apikey: str, request_timeout: int = None, preflight: bool = False,
+            transport: AsyncBaseTransport | None = None, reuse_proxy_models: bool = False,
+            warmup: int = 0, refresh_ahead: bool | RefreshAheadCache = False,
+            hedge_percentile: float = 0.95
+    ) -> None:
         self.apikey = apikey
         self.request_timeout = request_timeout
+        self.transport = transport
         self.request_delayer = RequestDelayer()
+        self.scheduler = RequestScheduler(self.request_delayer)
+        self.latency = LatencyTracker(hedge_percentile)
+        self._account: AccountState | None = None
+        self.preflight = None
+        if preflight:
+            from ..preflight import PreflightValidator
+
+            self.preflight = PreflightValidator(self.account)
+        self.proxy_cache = None
+        if reuse_proxy_models:
+            from ..proxy_cache import ProxyListCache
+
+            self.proxy_cache = ProxyListCache()
+        if refresh_ahead is True:
+            from ..refresh_ahead import RefreshAheadCache
+
+            refresh_ahead = RefreshAheadCache()
+        self.response_cache = refresh_ahead or None
+        self.tracer = None
+        # Warm-up keeps one client with a DNS cache; otherwise every call gets its own client.
+        self.warmup = warmup
+        self.dns_cache = None
+        if warmup:
+            # httpcore is only needed for the DNS cache, keep it out of plain imports.
+            from ..network import DNSCache
+
+            self.dns_cache = DNSCache()
+        self._client: AsyncClient | None = None
+        self._warmup_task: asyncio.Task | None = None
+        self._keepalive_task: asyncio.Task | None = None
+        self._last_used = time.monotonic()
+        if warmup:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+            else:
+                self._start_warmup()
+
+    @property
+    def account(self) -> AccountState:
+        '''Account state fed by every response, created on first use.
+        '''
+        if self._account is None:
+            from ..account import AccountState
+
+            self._account = AccountState()
+        return self._account
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def ready(self) -> bool:
+        '''Waits until warm-up is done, starting it if needed.
 
-    async def make_request(self, method: str, params: dict | None = None) -> dict:
+        Returns:
+            bool: At least one connection was opened, always True without warm-up.
+        '''
+        if not self.warmup:
+            return True
+        return await asyncio.shield(self._start_warmup())
+
+    async def aclose(self) -> None:
+        '''Stops keep-alive and closes pooled connections.
+        '''
+        for task in (self._warmup_task, self._keepalive_task):
+            if task is not None and not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        self._warmup_task = self._keepalive_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def make_request(
+            self, method: str, params: dict | None = None,
+            priority: RequestPriority | None = None, deadline: float | None = None,
+            timeout: float | None = None, hedge: bool = False, cached: bool = True
+    ) -> dict:
         '''Makes API request.
 
         Args:
             method (str): API method.
             params (dict | None, optional): API params. Defaults to None.
+            priority (RequestPriority | None, optional): Scheduler priority class. Defaults to the method class: writes go before reads.
+            deadline (float | None, optional): Latest `time.monotonic()` by which the request must finish. Defaults to None.
+            timeout (float | None, optional): Request timeout in seconds. Defaults to `request_timeout`.
+            hedge (bool, optional): Send a second request if the first one is slower than usual. Only for idempotent reads. Defaults to False.
+            cached (bool, optional): Allow an answer from `response_cache`. Defaults to True.
 
         Raises:
             errors.RPSAPIError: RPS error.
             errors.UnexpectedAPIError: API unexpected error.
+            errors.DeadlineAPIError: Request couldn't start before deadline.
+            errors.BaseAPIError: Call rejected by pre-flight validation.
+            ValueError: Hedging requested for non-idempotent method.
 
         Returns:
             dict: API response.
         '''
+        try:
+            return await self._make_request(method, params, priority, deadline, timeout, hedge, cached)
+        finally:
+            # Nothing parses the answer of a raw call, so its trace ends here.
+            tracing.emit_pending()
+
+    async def _make_request(
+            self, method: str, params: dict | None = None,
+            priority: RequestPriority | None = None, deadline: float | None = None,
+            timeout: float | None = None, hedge: bool = False, cached: bool = True
+    ) -> dict:
+        # API methods call this and leave the trace to `_parse`.
         log.debug(f'Called with args: ({method}, {params})')
+        if self.preflight:
+            self.preflight.validate(method, params)
+        if priority is None:
+            priority = method_priority(method)
+        if hedge and method not in HEDGE_METHODS:
+            raise ValueError(f'Метод "{method}" не поддерживает дублирующие запросы.')
+        cache = self.response_cache
+        if cached and cache is not None and cache.caches(method):
+            return await cache.get(
+                method, params,
+                lambda: self._fetch(method, params, priority, deadline, timeout, hedge),
+                lambda: self._request(method, params, RequestPriority.BACKGROUND, None, timeout, False)
+            )
+        try:
+            return await self._fetch(method, params, priority, deadline, timeout, hedge)
+        finally:
+            # A failed or timed out write may still have been applied.
+            if cache is not None:
+                cache.invalidate(method)
+
+    @contextlib.asynccontextmanager
+    async def stream(
+            self, method: str, params: dict | None = None,
+            priority: RequestPriority | None = None, deadline: float | None = None,
+            timeout: float | None = None
+    ) -> AsyncIterator[AsyncIterator[bytes]]:
+        '''Makes API request and yields its body while it is downloaded.
+
+        For bodies too large to keep in memory, like `getproxy` of a big
+        inventory. The request goes through the scheduler and the rate
+        limiter like `make_request` and keeps its slot until the body is
+        read. The body is not checked for API errors, parse it with
+        `export.iter_raw_proxies` and feed its header into `account`.
+
+        Args:
+            method (str): API method.
+            params (dict | None, optional): API params. Defaults to None.
+            priority (RequestPriority | None, optional): Scheduler priority class. Defaults to the method class.
+            deadline (float | None, optional): Latest `time.monotonic()` by which the request must start. Defaults to None.
+            timeout (float | None, optional): Request timeout in seconds. Defaults to `request_timeout`.
+
+        Raises:
+            errors.RPSAPIError: RPS error.
+            errors.UnexpectedAPIError: API unexpected error.
+            errors.DeadlineAPIError: Request couldn't start before deadline.
+
+        Yields:
+            AsyncIterator[bytes]: Body chunks.
+        '''
+        if self.preflight:
+            self.preflight.validate(method, params)
+        if priority is None:
+            priority = method_priority(method)
+        url = self.ENDPOINT.format(self.apikey, method)
+        if params:
+            url += f'?{urlencode(params)}'
+        self._last_used = time.monotonic()
+        session = contextlib.nullcontext(self._get_client()) if self.warmup else AsyncClient(transport=self.transport)
+        async with session as sess:
+            record = await self.scheduler.acquire(priority, deadline)
+            try:
+                async with sess.stream('GET', url, timeout=self._timeout(timeout, deadline)) as resp:
+                    if resp.status_code == 503:
+                        raise errors.RPSAPIError('Большое колличество запросов. Попробуйте позже.')
+                    elif not resp.is_success:
+                        raise errors.UnexpectedAPIError('Не удалось получит данные у API.')
+                    yield resp.aiter_bytes()
+            finally:
+                self.request_delayer.release(record)
+
+    async def _fetch(
+            self, method: str, params: dict | None,
+            priority: RequestPriority, deadline: float | None, timeout: float | None,
+            hedge: bool
+    ) -> dict:
+        if hedge:
+            return await self._hedged_request(method, params, priority, deadline, timeout)
+        return await self._request(method, params, priority, deadline, timeout)
+
+    async def _hedged_request(
+            self, method: str, params: dict | None,
+            priority: RequestPriority, deadline: float | None, timeout: float | None
+    ) -> dict:
+        delay = self.latency.hedge_delay(method)
+        tasks = {asyncio.create_task(self._request(method, params, priority, deadline, timeout, False))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                log.debug(f'Hedging "{method}" after {delay:.3f}s')
+                tasks.add(asyncio.create_task(self._request(method, params, priority, deadline, timeout, False)))
+            while True:
+                done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not pending:
+                    return done.pop().result()
+                tasks = pending
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _request(
+            self, method: str, params: dict | None,
+            priority: RequestPriority, deadline: float | None, timeout: float | None,
+            defer_trace: bool = True
+    ) -> dict:
         url = self.ENDPOINT.format(self.apikey, method)
         if params:
             url += f'?{urlencode(params)}'
         log.debug(f'Final URL: {url}')
-        async with AsyncClient() as sess:
-            resp = await self.request_delayer.run_or_delay(
-                sess.get(url, timeout=self.request_timeout if self.request_timeout else USE_CLIENT_DEFAULT)
-            )
+        tracer = self.tracer or tracing.get_tracer()
+        if tracer is None:
+            return await self._send(method, params, url, priority, deadline, timeout, None)
+        trace = tracing.RequestTrace(tracer, method)
+        trace.attributes['proxy6.priority'] = priority.name.lower()
+        try:
+            result = await self._send(method, params, url, priority, deadline, timeout, trace)
+        except BaseException as e:
+            trace.emit(e)
+            raise
+        if defer_trace:
+            trace.defer()
+        else:
+            trace.emit()
+        return result
+
+    async def _send(
+            self, method: str, params: dict | None, url: str,
+            priority: RequestPriority, deadline: float | None, timeout: float | None,
+            trace: tracing.RequestTrace | None
+    ) -> dict:
+        started = time.monotonic()
+        self._last_used = time.monotonic()
+        sent = 0.0
+
+        async def send(sess: AsyncClient) -> Response:
+            nonlocal sent
+            sent = time.monotonic()
+            return await sess.get(url, timeout=self._timeout(timeout, deadline))
+
+        session = contextlib.nullcontext(self._get_client()) if self.warmup else AsyncClient(transport=self.transport)
+        async with session as sess:
+            if trace is None:
+                resp = await self.scheduler.run(
+                    lambda: send(sess),
+                    priority, deadline
+                )
+            else:
+                record = await self.scheduler.acquire(priority, deadline)
+                trace.mark('rate_wait', max(trace.marks['enqueued'], record.get('acquire_started', 0)))
+                trace.mark('dispatched')
+                sent = time.monotonic()
+                token = trace.activate()
+                try:
+                    resp = await sess.get(
+                        url, timeout=self._timeout(timeout, deadline),
+                        extensions={'trace': trace.aevent}
+                    )
+                finally:
+                    trace.deactivate(token)
+                    self.request_delayer.release(record)
+                trace.attributes['http.status_code'] = resp.status_code
             if resp.is_success:
+                if trace is not None:
+                    trace.mark('json.started')
                 json_resp = resp.json()
+                if trace is not None:
+                    trace.mark('json.complete')
                 log.debug(f'API Response: {json_resp}')
-                return (await self.process_api_response(json_resp))
+                result = await self.process_api_response(json_resp)
+                self.latency.record(method, time.monotonic() - started)
+                self.account.update(result, sent)
+                if self.preflight:
+                    self.preflight.observe(method, params, result)
+                return result
             elif resp.status_code == 503:
                 raise errors.RPSAPIError('Большое колличество запросов. Попробуйте позже.')
             else:
                 raise errors.UnexpectedAPIError('Не удалось получит данные у API.')
 
+    def _parse(self, model: type[T], resp: dict) -> T:
+        return tracing.finish_pending(model.model_validate, resp)
+
+    def _get_client(self) -> AsyncClient:
+        if self._client is None:
+            from ..network import install_dns_cache
+
+            transport = self.transport
+            if transport is None:
+                transport = AsyncHTTPTransport(limits=Limits(
+                    max_keepalive_connections=max(self.warmup, 20),
+                    keepalive_expiry=self.KEEPALIVE_EXPIRY
+                ))
+            if not install_dns_cache(transport, self.dns_cache):
+                log.debug('DNS cache is not supported by the transport')
+            self._client = AsyncClient(transport=transport)
+        return self._client
+
+    def _start_warmup(self) -> asyncio.Task:
+        if self._warmup_task is None:
+            self._warmup_task = asyncio.ensure_future(self._warmup())
+        return self._warmup_task
+
+    async def _warmup(self) -> bool:
+        ok = await self._ping()
+        if self._keepalive_task is None:
+            self._keepalive_task = asyncio.ensure_future(self._keepalive())
+        return ok
+
+    async def _keepalive(self) -> None:
+        while True:
+            idle = time.monotonic() - self._last_used
+            if idle < self.KEEPALIVE_INTERVAL:
+                await sleep(self.KEEPALIVE_INTERVAL - idle)
+                continue
+            await self._ping()
+            self._last_used = time.monotonic()
+
+    async def _ping(self) -> bool:
+        # HEAD on the site root opens pooled connections without API calls or rate limiter slots.
+        client = self._get_client()
+        url = URL(self.ENDPOINT.format('', '')).copy_with(path='/', query=None)
+        results = await asyncio.gather(
+            *(client.head(url) for _ in range(self.warmup)), return_exceptions=True
+        )
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            log.warning(f'Warm-up: {len(failed)} of {self.warmup} connections failed: {failed[0]!r}')
+        return len(failed) < self.warmup
+
+    def _timeout(self, timeout: float | None, deadline: float | None):
+        timeout = timeout or self.request_timeout
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise errors.DeadlineAPIError('Истек крайний срок выполнения запроса.')
+            timeout = min(timeout, remaining) if timeout else remaining
+        return timeout if timeout else USE_CLIENT_DEFAULT
+
     async def process_api_response(self, resp: dict) -> dict:
         '''Checking API response on errors. If not - returns response.
 
@@ -113,81 +480,26 @@ class AsyncAPIConnector:
             dict: API response.
         '''
         log.debug(f'Called with args: ({resp})')
-        if resp.get('error'):
-            match resp.get('error_id'):
-                case 30:
-                    raise errors.UnknownAPIError(
-                        resp, resp.get('error', 'Неизвестная ошибка')
-                    )
-                case 100:
-                    raise errors.KeyAPIError(
-                        resp, 'Ошибка авторизации, неверный ключ'
-                    )
-                case 110:
-                    raise errors.MethodAPIError(
-                        resp, 'Ошибочный метод'
-                    )
-                case 200:
-                    raise errors.CountAPIError(
-                        resp, 'Ошибка кол-ва прокси, неверно указано кол-во, либо отсутствует'
-                    )
-                case 210:
-                    raise errors.PeriodAPIError(
-                        resp, 'Ошибка периода, неверно указано кол-во (дней), либо отсутствует'
-                    )
-                case 220:
-                    raise errors.CountryAPIError(
-                        resp,
-                        'Ошибка страны, неверно указана страна (страны указываются в формате iso2), либо отсутствует'
-                    )
-                case 230:
-                    raise errors.IDsAPIError(
-                        resp, 'Ошибка списка номеров прокси. Номера прокси должны быть указаны через запятую'
-                    )
-                case 250:
-                    raise errors.DescrAPIError(
-                        resp, 'Ошибка технического комментария, неверно указан, либо отсутствует'
-                    )
-                case 260:
-                    raise errors.TypeAPIError(
-                        resp, 'Ошибка типа (протокола) прокси, неверно указан, либо отсутствует'
-                    )
-                case 300:
-                    raise errors.ActiveProxyAllowAPIError(
-                        resp,
-                        'Ошибка кол-ва прокси. Возникает при попытке покупки большего кол-ва прокси, чем доступно на сервисе'
-                    )
-                case 400:
-                    raise errors.NoMoneyAPIError(
-                        resp,
-                        'Ошибка баланса. На вашем балансе отсутствуют средства, либо их не хватает для покупки запрашиваемого кол-ва прокси'
-                    )
-                case 404:
-                    raise errors.NotFoundAPIError(
-                        resp, 'Ошибка поиска. Возникает когда запрашиваемый элемент не найден'
-                    )
-                case 410:
-                    raise errors.PriceAPIError(
-                        resp, 'Ошибка расчета стоимости. Итоговая стоимость меньше, либо равна нулю'
-                    )
-                case _:
-                    raise errors.UnexpectedAPIError(
-                        resp, resp.get(
-                            'error',
-                            'Неожиданная ошибка API'
-                        )
-                    )
-        else:
-            return resp
+        errors.raise_for_response(resp)
+        return resp
 
 
 class AsyncProxy6(AsyncAPIConnector):
-    def __init__(self, apikey: str, request_timeout: int = None) -> None:
-        super().__init__(apikey, request_timeout)
+    def __init__(
+            self, apikey: str, request_timeout: int = None, preflight: bool = False,
+            transport: AsyncBaseTransport | None = None, reuse_proxy_models: bool = False,
+            warmup: int = 0, refresh_ahead: bool | RefreshAheadCache = False,
+            hedge_percentile: float = 0.95
+    ) -> None:
+        super().__init__(
+            apikey, request_timeout, preflight, transport, reuse_proxy_models, warmup, refresh_ahead,
+            hedge_percentile
+        )
 
     async def get_price(
             self, count: int,
-            period: int, version: types.ProxyVersion = types.ProxyVersion.IPV6
+            period: int, version: types.ProxyVersion = types.ProxyVersion.IPV6,
+            *, timeout: float | None = None, deadline: float | None = None, hedge: bool = False
     ) -> types.GetPriceResponse:
         '''Используется для получения информации о сумме заказа в зависимости от периода и кол-ва прокси.
 
@@ -195,6 +507,9 @@ class AsyncProxy6(AsyncAPIConnector):
             count (int): Кол-во прокси.
             period (int): Период - кол-во дней
             version (types.ProxyVersion): Версия прокси. Стандартно - types.ProxyVersion.IPV6
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
+            hedge (bool, optional): Отправить дублирующий запрос, если ответ задерживается дольше обычного. Defaults to False.
 
         Returns:
             types.GetPriceResponse: Ответ API.
@@ -204,17 +519,21 @@ class AsyncProxy6(AsyncAPIConnector):
             'count': count, 'period': period,
             'version': version.value
         }
-        resp = await self.make_request('getprice', params)
-        return types.GetPriceResponse(**resp)
+        resp = await self._make_request('getprice', params, timeout=timeout, deadline=deadline, hedge=hedge)
+        return self._parse(types.GetPriceResponse, resp)
 
     async def get_count(
-            self, country: str, version: types.ProxyVersion = types.ProxyVersion.IPV6
+            self, country: str, version: types.ProxyVersion = types.ProxyVersion.IPV6,
+            *, timeout: float | None = None, deadline: float | None = None, hedge: bool = False
     ) -> types.GetCountResponse:
         '''Используется для получения информации о доступном для приобретения кол-ве прокси определенной страны.
 
         Args:
             country (str): Код страны в формате iso2.
             version (types.ProxyVersion): Версия прокси. Стандартно - types.ProxyVersion.IPV6
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
+            hedge (bool, optional): Отправить дублирующий запрос, если ответ задерживается дольше обычного. Defaults to False.
 
         Returns:
             types.GetCountResponse: Ответ API.
@@ -223,35 +542,45 @@ class AsyncProxy6(AsyncAPIConnector):
         params = {
             'country': country, 'version': version.value
         }
-        resp = await self.make_request('getcount', params)
-        return types.GetCountResponse(**resp)
+        resp = await self._make_request('getcount', params, timeout=timeout, deadline=deadline, hedge=hedge)
+        return self._parse(types.GetCountResponse, resp)
 
     async def get_country(
-            self, version: types.ProxyVersion = types.ProxyVersion.IPV6
+            self, version: types.ProxyVersion = types.ProxyVersion.IPV6,
+            *, timeout: float | None = None, deadline: float | None = None, hedge: bool = False
     ) -> types.GetCountryResponse:
         '''Используется для получения информации о доступных для приобретения странах.
 
         Args:
             version (types.ProxyVersion, optional): Версия прокси. Defaults to types.ProxyVersion.IPV6.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
+            hedge (bool, optional): Отправить дублирующий запрос, если ответ задерживается дольше обычного. Defaults to False.
 
         Returns:
             types.GetCountryResponse: Ответ API.
         '''
         log.debug(f'Called with args: ({version})')
-        resp = await self.make_request(
-            'getcountry', {'version': version.value}
+        resp = await self._make_request(
+            'getcountry', {'version': version.value}, timeout=timeout, deadline=deadline, hedge=hedge
         )
-        return types.GetCountryResponse(**resp)
+        return self._parse(types.GetCountryResponse, resp)
 
     async def get_proxy(
             self, state: types.ProxyState = types.ProxyState.ALL,
-            descr: str | None = None
+            descr: str | None = None,
+            *, timeout: float | None = None, deadline: float | None = None, hedge: bool = False,
+            cached: bool = True
     ) -> types.GetProxyResponse:
         '''Используется для получения списка ваших прокси.
 
         Args:
             state (types.ProxyState, optional): Состояние возвращаемых прокси. Доступные значения: active - Активные, expired - Неактивные, expiring - Заканчивающиеся, all - Все (по-умолчанию). Defaults to types.ProxyState.ALL.
             descr (str | None, optional): Технический комментарий, который вы указывали при покупке прокси. Если данный параметр присутствует, то будут выбраны только те прокси, у которых присутствует данный комментарий, если же данный параметр не задан, то будут выбраны все прокси. Defaults to None.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
+            hedge (bool, optional): Отправить дублирующий запрос, если ответ задерживается дольше обычного. Defaults to False.
+            cached (bool, optional): Разрешить ответ из кэша `refresh_ahead`. Defaults to True.
 
         Returns:
             types.GetProxyResponse: Ответ API.
@@ -262,17 +591,24 @@ class AsyncProxy6(AsyncAPIConnector):
         }
         if descr:
             params['descr'] = descr
-        resp = await self.make_request('getproxy', params)
-        return types.GetProxyResponse(**resp)
+        resp = await self._make_request(
+            'getproxy', params, timeout=timeout, deadline=deadline, hedge=hedge, cached=cached
+        )
+        if self.proxy_cache is not None:
+            return tracing.finish_pending(lambda r: self.proxy_cache.build(r, (state, descr)), resp)
+        return self._parse(types.GetProxyResponse, resp)
 
     async def set_type(
-            self, ids: list[str], type: types.ProxyType
+            self, ids: list[str], type: types.ProxyType,
+            *, timeout: float | None = None, deadline: float | None = None
     ) -> types.SetTypeResponse:
         '''Используется для изменения типа (протокола) у списка прокси.
 
         Args:
             ids (list[str]): Перечень внутренних номеров прокси в нашей системе;
             type (types.ProxyType): Устанавливаемый тип (протокол).
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
 
         Returns:
             types.SetTypeResponse: Ответ API.
@@ -285,12 +621,13 @@ class AsyncProxy6(AsyncAPIConnector):
             'ids': ','.join(ids),
             'type': type.value
         }
-        resp = await self.make_request('settype', params)
-        return types.SetTypeResponse(**resp)
+        resp = await self._make_request('settype', params, timeout=timeout, deadline=deadline)
+        return self._parse(types.SetTypeResponse, resp)
 
     async def set_descr(
             self, new: str, old: str | None = None,
-            ids: list[str] | None = None
+            ids: list[str] | None = None,
+            *, timeout: float | None = None, deadline: float | None = None
     ) -> types.SetDescrResponse:
         '''Используется для обновления технического комментария у списка прокси, который был установлен при покупке.
 
@@ -298,6 +635,8 @@ class AsyncProxy6(AsyncAPIConnector):
             new (str): Технический комментарий, на который нужно изменить. Максимальная длина 50 символов.
             old (str | None, optional): Технический комментарий, который нужно изменить. Defaults to None.
             ids (list[str] | None, optional): Перечень внутренних номеров прокси в нашей системе. Defaults to None.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
 
         Returns:
             types.SetDescrResponse: Ответ API.
@@ -323,14 +662,15 @@ class AsyncProxy6(AsyncAPIConnector):
                 params['old'] = old
             if ids:
                 params['ids'] = ','.join(ids)
-            resp = await self.make_request('setdescr', params)
-            return types.SetDescrResponse(**resp)
+            resp = await self._make_request('setdescr', params, timeout=timeout, deadline=deadline)
+            return self._parse(types.SetDescrResponse, resp)
 
     async def buy(
             self, count: int, period: int, country: str,
             version: types.ProxyVersion = types.ProxyVersion.IPV6,
             type: types.ProxyType = types.ProxyType.HTTPS,
-            descr: str | None = None, auto_prolong: bool = False
+            descr: str | None = None, auto_prolong: bool = False,
+            *, timeout: float | None = None, deadline: float | None = None
     ) -> types.BuyResponse:
         '''Используется для покупки прокси.
 
@@ -342,6 +682,8 @@ class AsyncProxy6(AsyncAPIConnector):
             type (types.ProxyType, optional): Тип прокси (протокол). Defaults to types.ProxyType.HTTPS.
             descr (str | None, optional): Технический комментарий для списка прокси, максимальная длина 50 символов. Указание данного параметра позволит вам делать выборку списка прокси про этому параметру через метод `getproxy`. Defaults to None.
             auto_prolong (bool, optional): При добавлении данного параметра, у купленных прокси будет включено автопродление. Defaults to False.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
 
         Returns:
             types.BuyResponse: Ответ API.
@@ -366,17 +708,20 @@ class AsyncProxy6(AsyncAPIConnector):
                 params['descr'] = descr
         if auto_prolong:
             params['auto_prolong'] = ''
-        resp = await self.make_request('buy', params)
-        return types.BuyResponse(**resp)
+        resp = await self._make_request('buy', params, timeout=timeout, deadline=deadline)
+        return self._parse(types.BuyResponse, resp)
 
     async def prolong(
-            self, period: int, ids: list[str]
+            self, period: int, ids: list[str],
+            *, timeout: float | None = None, deadline: float | None = None
     ) -> types.ProlongResponse:
         '''Используется для продления текущих прокси.
 
         Args:
             period (int):  Период продления - кол-во дней.
             ids (list[str]): Перечень внутренних номеров прокси в нашей системе.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
 
         Returns:
             types.ProlongResponse: Ответ API.
@@ -386,17 +731,20 @@ class AsyncProxy6(AsyncAPIConnector):
             'period': period,
             'ids': ','.join(ids)
         }
-        resp = await self.make_request('prolong', params)
-        return types.ProlongResponse(**resp)
+        resp = await self._make_request('prolong', params, timeout=timeout, deadline=deadline)
+        return self._parse(types.ProlongResponse, resp)
 
     async def delete(
-            self, ids: list[str] | None = None, descr: str | None = None
+            self, ids: list[str] | None = None, descr: str | None = None,
+            *, timeout: float | None = None, deadline: float | None = None
     ) -> types.DeleteResponse:
         '''Используется для удаления прокси.
 
         Args:
             ids (list[str] | None, optional): Перечень внутренних номеров прокси в нашей системе. Defaults to None.
             descr (str | None, optional): Технический комментарий, который вы указывали при покупке прокси, либо через метод `setdescr`. Defaults to None.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
 
         Returns:
             types.DeleteResponse: Ответ API.
@@ -408,7 +756,7 @@ class AsyncProxy6(AsyncAPIConnector):
             Обязательно должен присутствовать один из параметров, либо `ids`, либо `descr`.
         '''
         log.debug(f'Called with args: ({ids}, {descr})')
-        if not ids or not descr:
+        if not ids and not descr:
             raise TypeError(
                 'Обязательно должен быть указан один из аргументов: "ids" или "descr"'
             )
@@ -416,30 +764,41 @@ class AsyncProxy6(AsyncAPIConnector):
             params = {'ids': ','.join(ids)}
         else:
             params = {'descr': descr}
-        resp = await self.make_request('delete', params)
-        return types.DeleteResponse(**resp)
+        resp = await self._make_request('delete', params, timeout=timeout, deadline=deadline)
+        return self._parse(types.DeleteResponse, resp)
 
-    async def check(self, ids: str) -> types.CheckResponse:
+    async def check(
+            self, ids: str,
+            *, timeout: float | None = None, deadline: float | None = None, hedge: bool = False
+    ) -> types.CheckResponse:
         '''Используется для проверки валидности (работоспособности) прокси.
 
         Args:
             ids (str): Внутренний номер прокси в нашей системе.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
+            hedge (bool, optional): Отправить дублирующий запрос, если ответ задерживается дольше обычного. Defaults to False.
 
         Returns:
             types.CheckResponse: Ответ API.
         '''
         log.debug(f'Called with args: ({ids})')
-        resp = await self.make_request(
-            'check', {'ids': ids}
+        resp = await self._make_request(
+            'check', {'ids': ids}, timeout=timeout, deadline=deadline, hedge=hedge
         )
-        return types.CheckResponse(**resp)
+        return self._parse(types.CheckResponse, resp)
 
-    async def ipauth(self, ip: list[str] | None = None, delete: bool = False) -> types.IPAuthResponse:
+    async def ipauth(
+            self, ip: list[str] | None = None, delete: bool = False,
+            *, timeout: float | None = None, deadline: float | None = None
+    ) -> types.IPAuthResponse:
         '''Используется для привязки, либо удаления авторизации прокси по ip.
 
         Args:
             ip (list[str] | None): Список привязываемых ip-адресов. Defaults is None.
             delete (bool): Удалить привязку по IP? Defaults is False.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
 
         Returns:
             types.IPAuthResponse: Ответ API.
@@ -461,5 +820,5 @@ class AsyncProxy6(AsyncAPIConnector):
             params = {
                 'ip': 'delete'
             }
-        resp = await self.make_request('ipauth', params)
-        return types.IPAuthResponse(**resp)
+        resp = await self._make_request('ipauth', params, timeout=timeout, deadline=deadline)
+        return self._parse(types.IPAuthResponse, resp)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Async request scheduler.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, TypeVar
+
+from .. import errors
+
+
+log = logging.getLogger('proxy6')
+T = TypeVar('T')
+
+request_caller: ContextVar[str | None] = ContextVar('proxy6_request_caller', default=None)
+request_priority: ContextVar['RequestPriority | None'] = ContextVar('proxy6_request_priority', default=None)
+
+
+class RequestPriority(IntEnum):
+    WRITE = 0
+    READ = 1
+    BACKGROUND = 2
+
+
+METHOD_PRIORITIES = {
+    'buy': RequestPriority.WRITE,
+    'prolong': RequestPriority.WRITE,
+    'delete': RequestPriority.WRITE,
+    'settype': RequestPriority.WRITE,
+    'setdescr': RequestPriority.WRITE,
+    'ipauth': RequestPriority.WRITE,
+}
+
+
+def method_priority(method: str) -> RequestPriority:
+    '''Returns default priority class of API method.
+
+    The `request_priority` context variable overrides the method class,
+    so background jobs can lower the priority of everything they call.
+
+    Args:
+        method (str): API method.
+
+    Returns:
+        RequestPriority: Priority class.
+    '''
+    priority = request_priority.get()
+    if priority is not None:
+        return priority
+    return METHOD_PRIORITIES.get(method, RequestPriority.READ)
+
+
+class _Waiter:
+    __slots__ = ('future', 'caller', 'deadline', 'enqueued')
+
+    def __init__(self, future: asyncio.Future, caller: str, deadline: float | None) -> None:
+        self.future = future
+        self.caller = caller
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+
+
+class RequestScheduler:
+    '''Hands out rate limiter slots by priority class.
+
+    Within one class callers are served round-robin, so a single caller
+    with a big batch can't starve the others. Deadlines are absolute
+    `time.monotonic()` values: a call that can't start before its deadline
+    is dropped with `errors.DeadlineAPIError`.
+
+    The caller of a request is taken from the `caller` argument, then from
+    the `request_caller` context variable, then from the current task name.
+    '''
+
+    def __init__(self, delayer) -> None:
+        self.delayer = delayer
+        self._queues: dict[RequestPriority, OrderedDict[str, deque[_Waiter]]] = {
+            priority: OrderedDict() for priority in RequestPriority
+        }
+        self._dispatcher: asyncio.Task | None = None
+        self._dispatched = {priority: 0 for priority in RequestPriority}
+        self._dropped = {priority: 0 for priority in RequestPriority}
+        self._wait_total = {priority: 0.0 for priority in RequestPriority}
+        self._wait_max = {priority: 0.0 for priority in RequestPriority}
+
+    async def run(
+            self, factory: Callable[[], Awaitable[T]],
+            priority: RequestPriority = RequestPriority.READ,
+            deadline: float | None = None, caller: str | None = None
+    ) -> T:
+        '''Waits for request turn and runs it.
+
+        Args:
+            factory (Callable[[], Awaitable[T]]): Makes the request awaitable; not called if the request is dropped.
+            priority (RequestPriority, optional): Priority class. Defaults to RequestPriority.READ.
+            deadline (float | None, optional): Latest `time.monotonic()` to start at. Defaults to None.
+            caller (str | None, optional): Caller name for fairness. Defaults to None.
+
+        Raises:
+            errors.DeadlineAPIError: Request can't start before its deadline.
+
+        Returns:
+            T: Request result.
+        '''
+        record = await self.acquire(priority, deadline, caller)
+        try:
+            return await factory()
+        finally:
+            self.delayer.release(record)
+
+    async def acquire(
+            self, priority: RequestPriority = RequestPriority.READ,
+            deadline: float | None = None, caller: str | None = None
+    ) -> dict[str, float]:
+        '''Waits for request turn and takes a rate limiter slot.
+
+        Args:
+            priority (RequestPriority, optional): Priority class. Defaults to RequestPriority.READ.
+            deadline (float | None, optional): Latest `time.monotonic()` to start at. Defaults to None.
+            caller (str | None, optional): Caller name for fairness. Defaults to None.
+
+        Raises:
+            errors.DeadlineAPIError: Request can't start before its deadline.
+
+        Returns:
+            dict[str, float]: Rate limiter record, must be released with `delayer.release`.
+        '''
+        if deadline is not None and time.monotonic() >= deadline:
+            self._dropped[priority] += 1
+            raise errors.DeadlineAPIError('Истекло время ожидания очереди запросов.')
+        waiter = _Waiter(
+            asyncio.get_running_loop().create_future(),
+            caller or request_caller.get() or self._task_name(), deadline
+        )
+        self._queues[priority].setdefault(waiter.caller, deque()).append(waiter)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        timeout = None if deadline is None else deadline - time.monotonic()
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except BaseException as e:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self.delayer.cancel(waiter.future.result())
+            else:
+                waiter.future.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                self._dropped[priority] += 1
+                raise errors.DeadlineAPIError('Истекло время ожидания очереди запросов.') from None
+            raise
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        '''Returns queue depth and wait time stats per priority class.
+
+        Returns:
+            dict[str, dict[str, Any]]: Stats keyed by priority class name.
+        '''
+        result = {}
+        for priority in RequestPriority:
+            dispatched = self._dispatched[priority]
+            result[priority.name.lower()] = {
+                'depth': sum(
+                    1 for queue in self._queues[priority].values()
+                    for waiter in queue if not waiter.future.done()
+                ),
+                'dispatched': dispatched,
+                'dropped': self._dropped[priority],
+                'wait_avg': self._wait_total[priority] / dispatched if dispatched else 0.0,
+                'wait_max': self._wait_max[priority],
+            }
+        return result
+
+    async def _dispatch(self) -> None:
+        while self._has_waiters():
+            began = time.monotonic_ns()
+            record = await self.delayer.acquire()
+            record['acquire_started'] = began
+            waiter = self._pop()
+            if waiter is None:
+                self.delayer.cancel(record)
+                break
+            waiter.future.set_result(record)
+
+    def _has_waiters(self) -> bool:
+        return any(self._queues[priority] for priority in RequestPriority)
+
+    def _pop(self) -> _Waiter | None:
+        now = time.monotonic()
+        for priority in RequestPriority:
+            callers = self._queues[priority]
+            while callers:
+                caller, queue = next(iter(callers.items()))
+                waiter = queue.popleft()
+                if queue:
+                    callers.move_to_end(caller)
+                else:
+                    del callers[caller]
+                if waiter.future.done():
+                    continue
+                if waiter.deadline is not None and now >= waiter.deadline:
+                    self._dropped[priority] += 1
+                    waiter.future.set_exception(
+                        errors.DeadlineAPIError('Истекло время ожидания очереди запросов.')
+                    )
+                    continue
+                waited = now - waiter.enqueued
+                self._dispatched[priority] += 1
+                self._wait_total[priority] += waited
+                self._wait_max[priority] = max(self._wait_max[priority], waited)
+                return waiter
+        return None
+
+    @staticmethod
+    def _task_name() -> str:
+        task = asyncio.current_task()
+        return task.get_name() if task else 'default'
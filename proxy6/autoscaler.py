@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Capacity autoscaler.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+from enum import Enum
+from typing import Iterable
+
+from pydantic import BaseModel, Field
+
+from . import types
+from .async_.api import AsyncProxy6
+from .inventory import GroupKey, InventoryIndex
+
+
+log = logging.getLogger('proxy6')
+
+
+class CapacityTarget(BaseModel):
+    country: str = Field(..., description='Страна в формате ISO2')
+    count: int = Field(..., ge=0, description='Требуемое кол-во активных прокси')
+    version: types.ProxyVersion = Field(types.ProxyVersion.IPV6, description='Версия прокси')
+    type: types.ProxyType = Field(types.ProxyType.HTTPS, description='Тип прокси')
+    period: int = Field(30, gt=0, description='Период покупки и продления (кол-во дней)')
+
+    def key(self) -> GroupKey:
+        return self.country.lower(), self.version, self.type
+
+
+class CapacityActionKind(Enum):
+    BUY = 'buy'
+    PROLONG = 'prolong'
+    DELETE = 'delete'
+
+
+class CapacityAction(BaseModel):
+    kind: CapacityActionKind = Field(..., description='Действие')
+    target: CapacityTarget = Field(..., description='Цель, для которой выполняется действие')
+    count: int = Field(..., description='Кол-во прокси')
+    ids: list[str] = Field([], description='Номера прокси для продления и удаления')
+    cost: Decimal = Field(Decimal(0), description='Оценка стоимости')
+    done: bool = Field(False, description='Действие выполнено')
+    error: str | None = Field(None, description='Ошибка выполнения')
+
+
+class CapacityGap(BaseModel):
+    target: CapacityTarget = Field(..., description='Цель')
+    active: int = Field(..., description='Активных прокси вне окна продления')
+    expiring: int = Field(..., description='Прокси, заканчивающихся в окне продления')
+    available: int | None = Field(None, description='Доступно для покупки по getcount за вычетом покупок предыдущих целей')
+    missing: int = Field(0, description='Не хватает после запланированных действий')
+    surplus: int = Field(0, description='Лишних прокси')
+
+
+class CapacityReport(BaseModel):
+    gaps: list[CapacityGap] = Field([], description='Состояние целей')
+    actions: list[CapacityAction] = Field([], description='Запланированные действия')
+    budget: Decimal | None = Field(None, description='Доступный бюджет на момент планирования')
+
+    @property
+    def cost(self) -> Decimal:
+        return sum((action.cost for action in self.actions), Decimal(0))
+
+
+class CapacityReconciler:
+    '''Keeps a target number of active proxies per (country, version, type).
+
+    Proxies ending within `prolong_window` do not count as capacity; they
+    are prolonged first when a target is short, the rest of the gap is
+    bought if `getcount` reports enough proxies. Spending is capped by the
+    balance and, with `max_spend_rate`, by that amount per hour minus the
+    spend rate observed by `client.account`. Surplus is deleted, proxies
+    ending soonest first. Only groups that have a target are touched, and
+    with `descr` only proxies with that descr are counted; it is also set
+    on bought proxies.
+    '''
+    PROLONG_WINDOW = timedelta(days=3)
+    BATCH_SIZE = 100
+    INTERVAL = 300.0
+
+    def __init__(
+            self, client: AsyncProxy6, targets: Iterable[CapacityTarget],
+            descr: str | None = None, max_spend_rate: Decimal | None = None,
+            prolong_window: timedelta = PROLONG_WINDOW, batch_size: int = BATCH_SIZE,
+            delete_surplus: bool = True, interval: float = INTERVAL
+    ) -> None:
+        self.client = client
+        self.targets = list(targets)
+        keys = [target.key() for target in self.targets]
+        if len(set(keys)) != len(keys):
+            raise ValueError('Цели повторяются для одной страны, версии и типа.')
+        self.descr = descr
+        self.max_spend_rate = max_spend_rate
+        self.prolong_window = prolong_window
+        self.batch_size = batch_size
+        self.delete_surplus = delete_surplus
+        self.interval = interval
+        self.inventory = InventoryIndex()
+        self._task: asyncio.Task | None = None
+        self._stopped = asyncio.Event()
+
+    def budget(self) -> Decimal | None:
+        '''Returns amount that may be spent now.
+
+        Returns:
+            Decimal | None: Budget, or None if the balance is unknown and spending is not capped.
+        '''
+        budget = self.client.account.balance
+        if self.max_spend_rate is not None:
+            rate_left = max(self.max_spend_rate - self.client.account.spend_rate(), Decimal(0))
+            budget = rate_left if budget is None else min(budget, rate_left)
+        return budget
+
+    async def plan(self) -> CapacityReport:
+        '''Loads inventory and plans actions without executing them.
+
+        Returns:
+            CapacityReport: Gaps and planned actions.
+        '''
+        # Planned writes must not act on a cached list.
+        resp = await self.client.get_proxy(types.ProxyState.ACTIVE, self.descr, cached=False)
+        self.inventory = InventoryIndex.from_response(resp)
+        gaps: list[CapacityGap] = []
+        prolongs: list[tuple[CapacityTarget, list[str]]] = []
+        buys: list[tuple[CapacityTarget, int]] = []
+        deletes: list[tuple[CapacityTarget, list[str]]] = []
+        for target in self.targets:
+            group = self.inventory.group(*target.key())
+            expiring, live = [], []
+            for proxy in sorted(group, key=lambda p: p.date_end):
+                now = datetime.now(proxy.date_end.tzinfo)
+                (expiring if proxy.date_end - self.prolong_window <= now else live).append(proxy)
+            gap = CapacityGap(target=target, active=len(live), expiring=len(expiring))
+            gaps.append(gap)
+            need = target.count - len(live)
+            if need > 0:
+                prolong = [p.id for p in expiring[:need]]
+                if prolong:
+                    prolongs.append((target, prolong))
+                if need > len(prolong):
+                    buys.append((target, need - len(prolong)))
+                gap.missing = need
+            elif need < 0:
+                gap.surplus = -need
+                if self.delete_surplus:
+                    deletes.append((target, [p.id for p in live[:-need]]))
+
+        # Targets differing only by type buy from the same getcount pool.
+        pools = list(dict.fromkeys((target.country.lower(), target.version) for target, _ in buys))
+        counts = await asyncio.gather(*(
+            self.client.get_count(country, version) for country, version in pools
+        ))
+        pool_left = {pool: resp.count for pool, resp in zip(pools, counts)}
+        by_key = {gap.target.key(): gap for gap in gaps}
+        available_buys = []
+        for target, count in buys:
+            pool = target.country.lower(), target.version
+            by_key[target.key()].available = pool_left[pool]
+            count = min(count, pool_left[pool])
+            if count > 0:
+                pool_left[pool] -= count
+                available_buys.append((target, count))
+
+        spends = [(CapacityActionKind.PROLONG, t, len(ids), ids) for t, ids in prolongs]
+        spends += [(CapacityActionKind.BUY, t, count, []) for t, count in available_buys]
+        prices = await asyncio.gather(*(
+            self.client.get_price(count, target.period, target.version)
+            for _, target, count, _ in spends
+        ))
+        budget = self.budget()
+        left = budget
+        actions: list[CapacityAction] = []
+        for (kind, target, count, ids), price in zip(spends, prices):
+            if left is not None and price.price > left:
+                count = int(left / price.price_single) if price.price_single > 0 else 0
+            if count <= 0:
+                continue
+            cost = price.price_single * count
+            if left is not None:
+                left -= cost
+            by_key[target.key()].missing -= count
+            if kind == CapacityActionKind.PROLONG:
+                ids = ids[:count]
+                for chunk in self._chunks(ids):
+                    actions.append(CapacityAction(
+                        kind=kind, target=target, count=len(chunk), ids=chunk,
+                        cost=price.price_single * len(chunk)
+                    ))
+            else:
+                for start in range(0, count, self.batch_size):
+                    size = min(self.batch_size, count - start)
+                    actions.append(CapacityAction(
+                        kind=kind, target=target, count=size, cost=price.price_single * size
+                    ))
+        for target, ids in deletes:
+            for chunk in self._chunks(ids):
+                actions.append(CapacityAction(
+                    kind=CapacityActionKind.DELETE, target=target, count=len(chunk), ids=chunk
+                ))
+        return CapacityReport(gaps=gaps, actions=actions, budget=budget)
+
+    async def apply(self, report: CapacityReport) -> CapacityReport:
+        '''Executes planned actions concurrently and updates `inventory`.
+
+        Args:
+            report (CapacityReport): Plan from `plan`.
+
+        Returns:
+            CapacityReport: The same report with `done` and `error` filled.
+        '''
+        await asyncio.gather(*(
+            self._execute(action) for action in report.actions if not action.done
+        ))
+        return report
+
+    async def reconcile(self, dry_run: bool = False) -> CapacityReport:
+        '''Plans and, unless `dry_run`, executes actions.
+
+        Args:
+            dry_run (bool, optional): Only plan. Defaults to False.
+
+        Returns:
+            CapacityReport: Report.
+        '''
+        report = await self.plan()
+        if not dry_run:
+            await self.apply(report)
+        return report
+
+    def start(self) -> asyncio.Task:
+        '''Starts reconciling in background task.
+
+        Returns:
+            asyncio.Task: Reconcile task.
+        '''
+        if self._task is None or self._task.done():
+            self._stopped.clear()
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        '''Stops background reconciling.
+        '''
+        self._stopped.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def run(self) -> None:
+        '''Reconciles every `interval` seconds until `stop` is called.
+        '''
+        while not self._stopped.is_set():
+            try:
+                report = await self.reconcile()
+                for action in report.actions:
+                    if action.error:
+                        log.warning(f'Capacity {action.kind.value} {action.target.key()} failed: {action.error}')
+            except Exception:
+                log.exception('Capacity reconcile failed')
+            try:
+                await asyncio.wait_for(self._stopped.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, action: CapacityAction) -> None:
+        target = action.target
+        try:
+            if action.kind == CapacityActionKind.BUY:
+                resp = await self.client.buy(
+                    action.count, target.period, target.country,
+                    target.version, target.type, self.descr
+                )
+                self.inventory.update(resp)
+            elif action.kind == CapacityActionKind.PROLONG:
+                self.inventory.update(await self.client.prolong(target.period, action.ids))
+            else:
+                await self.client.delete(action.ids)
+                for id in action.ids:
+                    self.inventory.remove(id)
+        except Exception as e:
+            action.error = repr(e)
+            return
+        action.done = True
+
+    def _chunks(self, ids: list[str]) -> list[list[str]]:
+        return [ids[i:i + self.batch_size] for i in range(0, len(ids), self.batch_size)]
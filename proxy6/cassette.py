@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Record/replay transport.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import json
+import re
+import threading
+import time
+from collections import defaultdict, deque
+
+import httpx
+
+
+APIKEY_RE = re.compile(r'(/api/)[^/]+(/)')
+SKIP_HEADERS = frozenset({'content-encoding', 'content-length', 'transfer-encoding'})
+
+
+class CassetteMissError(LookupError):
+    pass
+
+
+def redact_url(url: httpx.URL | str) -> str:
+    '''Replaces API key in URL path, so cassettes are safe to share.
+
+    Args:
+        url (httpx.URL | str): Request URL.
+
+    Returns:
+        str: URL without API key.
+    '''
+    return APIKEY_RE.sub(r'\1{apikey}\2', str(url), count=1)
+
+
+class Cassette:
+    '''Recorded request/response pairs with timing.
+    '''
+    VERSION = 1
+
+    def __init__(self, path: str | None = None, interactions: list[dict] | None = None) -> None:
+        self.path = path
+        self.interactions: list[dict] = interactions if interactions is not None else []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> 'Cassette':
+        '''Loads cassette from JSON file.
+
+        Args:
+            path (str): Cassette path.
+
+        Returns:
+            Cassette: Loaded cassette.
+        '''
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(path, data['interactions'])
+
+    def save(self, path: str | None = None) -> None:
+        '''Saves cassette to JSON file.
+
+        Args:
+            path (str | None, optional): Cassette path. Defaults to the loaded path.
+        '''
+        path = path or self.path
+        if path is None:
+            raise ValueError('Не указан путь для сохранения кассеты.')
+        with self._lock:
+            data = {'version': self.VERSION, 'interactions': list(self.interactions)}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+    def append(self, request: httpx.Request, response: httpx.Response, content: bytes, started: float, elapsed: float) -> None:
+        with self._lock:
+            self.interactions.append({
+                'method': request.method,
+                'url': redact_url(request.url),
+                'status': response.status_code,
+                'headers': [
+                    [k, v] for k, v in response.headers.items() if k.lower() not in SKIP_HEADERS
+                ],
+                'body': content.decode('utf-8', 'replace'),
+                'started': started,
+                'elapsed': elapsed,
+            })
+
+
+class RecordingTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    '''Passes requests to the real transport and records them into cassette.
+    '''
+
+    def __init__(
+            self, cassette: Cassette,
+            transport: httpx.BaseTransport | None = None,
+            async_transport: httpx.AsyncBaseTransport | None = None
+    ) -> None:
+        self.cassette = cassette
+        self._transport = transport
+        self._async_transport = async_transport
+        self._owns_transport = transport is None
+        self._owns_async_transport = async_transport is None
+        self._origin = time.monotonic()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self._transport is None:
+            self._transport = httpx.HTTPTransport()
+        started = time.monotonic()
+        response = self._transport.handle_request(request)
+        try:
+            content = response.read()
+        finally:
+            response.close()
+        return self._record(request, response, content, started)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._async_transport is None:
+            self._async_transport = httpx.AsyncHTTPTransport()
+        started = time.monotonic()
+        response = await self._async_transport.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        return self._record(request, response, content, started)
+
+    def close(self) -> None:
+        # Clients close their transport on exit. A default transport is
+        # recreated on the next request, a passed one is left to its owner.
+        if self._owns_transport and self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def aclose(self) -> None:
+        if self._owns_async_transport and self._async_transport is not None:
+            await self._async_transport.aclose()
+            self._async_transport = None
+
+    def _record(self, request: httpx.Request, response: httpx.Response, content: bytes, started: float) -> httpx.Response:
+        self.cassette.append(
+            request, response, content,
+            started - self._origin, time.monotonic() - started
+        )
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in SKIP_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=content)
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    '''Answers requests from cassette without network.
+
+    Requests are matched by method and URL (API key redacted); repeated
+    requests get recorded answers in recording order. Each answer is
+    delayed by its recorded latency divided by `speed`, `speed=None`
+    disables delays.
+    '''
+
+    def __init__(self, cassette: Cassette, speed: float | None = 1.0) -> None:
+        if speed is not None and speed <= 0:
+            raise ValueError('Аргумент "speed" должен быть больше 0.')
+        self.cassette = cassette
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._queues: dict[tuple[str, str], deque[dict]] = defaultdict(deque)
+        for interaction in cassette.interactions:
+            self._queues[(interaction['method'], interaction['url'])].append(interaction)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        interaction = self._next(request)
+        if self.speed:
+            time.sleep(interaction['elapsed'] / self.speed)
+        return self._response(interaction)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        interaction = self._next(request)
+        if self.speed:
+            await asyncio.sleep(interaction['elapsed'] / self.speed)
+        return self._response(interaction)
+
+    def remaining(self) -> int:
+        '''Returns number of recorded answers not replayed yet.
+
+        Returns:
+            int: Remaining answers.
+        '''
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def _next(self, request: httpx.Request) -> dict:
+        key = (request.method, redact_url(request.url))
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                raise CassetteMissError(f'Нет записанного ответа для {key[0]} {key[1]}')
+            return queue.popleft()
+
+    @staticmethod
+    def _response(interaction: dict) -> httpx.Response:
+        return httpx.Response(
+            interaction['status'],
+            headers=[tuple(h) for h in interaction['headers']],
+            content=interaction['body'].encode('utf-8')
+        )
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Command line interface.
+#  Created by LulzLoL231 at 19/10/26
+#
+# Heavy modules are imported inside the commands, so parsing arguments and
+# `--help` stay fast. A command imports asyncio, httpx and the client, but
+# not pydantic: the response models are loaded once the first response
+# arrives (see `proxy6.types`). benchmarks/import_time.py guards both.
+import argparse
+import asyncio
+import os
+import sys
+from typing import Sequence
+
+
+ENV_API_KEY = 'PROXY6_API_KEY'
+CHUNK_SIZE = 100
+
+
+def _chunks(ids: Sequence[str], size: int) -> list[list[str]]:
+    return [list(ids[i:i + size]) for i in range(0, len(ids), size)]
+
+
+def _is_loopback(host: str) -> bool:
+    import ipaddress
+
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _out(line: str) -> None:
+    sys.stdout.write(line + '\n')
+    sys.stdout.flush()
+
+
+async def _gather_chunks(func, ids: Sequence[str], chunk_size: int, **kwargs) -> int:
+    tasks = [asyncio.create_task(func(ids=chunk, **kwargs)) for chunk in _chunks(ids, chunk_size)]
+    total = 0
+    for task in asyncio.as_completed(tasks):
+        resp = await task
+        total += getattr(resp, 'count', 0)
+    return total
+
+
+async def cmd_list(client, args) -> int:
+    from . import types
+
+    resp = await client.get_proxy(types.ProxyState(args.state), args.descr)
+    for proxy in resp.list.values():
+        _out('\t'.join((
+            proxy.id, proxy.get_uri(), proxy.country or '',
+            proxy.date_end.strftime('%Y-%m-%d %H:%M:%S'),
+            'active' if proxy.active else 'inactive', proxy.descr or ''
+        )))
+    return 0
+
+
+async def cmd_check(client, args) -> int:
+    failed = 0
+
+    async def check(id: str) -> tuple[str, bool]:
+        return id, (await client.check(id)).proxy_status
+
+    for task in asyncio.as_completed([check(id) for id in args.ids]):
+        id, status = await task
+        failed += not status
+        _out(f'{id}\t{"ok" if status else "fail"}')
+    return 1 if failed else 0
+
+
+async def cmd_prolong(client, args) -> int:
+    results = [
+        client.prolong(args.period, chunk)
+        for chunk in _chunks(args.ids, args.chunk_size)
+    ]
+    for task in asyncio.as_completed(results):
+        resp = await task
+        for info in resp.list.values():
+            _out(f'{info.id}\t{info.date_end:%Y-%m-%d %H:%M:%S}')
+    return 0
+
+
+async def cmd_delete(client, args) -> int:
+    if args.descr:
+        count = (await client.delete(descr=args.descr)).count
+    else:
+        count = await _gather_chunks(client.delete, args.ids, args.chunk_size)
+    _out(f'deleted\t{count}')
+    return 0
+
+
+async def cmd_set_type(client, args) -> int:
+    from . import types
+    from .planner import SetTypePlanner
+
+    planner = SetTypePlanner(client, chunk_size=args.chunk_size)
+    plan = await planner.convert(args.ids, types.ProxyType(args.type))
+    _out(f'updated\t{plan.changed}')
+    _out(f'unchanged\t{len(plan.unchanged)}')
+    for id in plan.unknown:
+        _out(f'{id}\tnot found')
+    for batch in plan.batches:
+        if batch.error:
+            _out(f'{",".join(batch.ids)}\t{batch.error}')
+    return 1 if plan.unknown or any(batch.error for batch in plan.batches) else 0
+
+
+async def cmd_buy(client, args) -> int:
+    from . import types
+
+    resp = await client.buy(
+        args.count, args.period, args.country,
+        types.ProxyVersion(args.proxy_version), types.ProxyType(args.type),
+        args.descr, args.auto_prolong
+    )
+    for proxy in resp.list.values():
+        _out(f'{proxy.id}\t{proxy.get_uri()}')
+    return 0
+
+
+def _pull(chunks, loop: asyncio.AbstractEventLoop):
+    # Runs in the export thread: takes body chunks from the event loop one by one.
+    while True:
+        chunk = asyncio.run_coroutine_threadsafe(anext(chunks, None), loop).result()
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def cmd_export(client, args) -> int:
+    from . import types
+    from .export import ExportFormat, export_proxies, iter_raw_proxies
+
+    # The body is parsed and written in a thread while the client downloads
+    # it, so memory doesn't grow with the inventory.
+    params = {'state': args.state}
+    if args.descr:
+        params['descr'] = args.descr
+    kwargs = dict(
+        columns=args.columns.split(',') if args.columns else None,
+        country=args.country, type=types.ProxyType(args.type) if args.type else None
+    )
+    loop = asyncio.get_running_loop()
+    header: dict = {}
+    async with client.stream('getproxy', params) as chunks:
+        proxies = iter_raw_proxies(_pull(chunks, loop), header)
+        if args.output and args.output != '-':
+            with open(args.output, 'w', encoding='utf-8', newline='') as f:
+                await asyncio.to_thread(export_proxies, proxies, f, ExportFormat(args.format), **kwargs)
+        else:
+            await asyncio.to_thread(export_proxies, proxies, sys.stdout, ExportFormat(args.format), **kwargs)
+    client.account.update(header)
+    return 0
+
+
+async def cmd_gateway(client, args) -> int:
+    from . import types
+    from .gateway import ProxyGateway, RotationStrategy
+
+    gateway = ProxyGateway(
+        client, host=args.host, port=args.port,
+        rotation=RotationStrategy(args.rotation), sticky_ttl=args.sticky_ttl,
+        password=args.password, pool_size=args.pool_size,
+        state=types.ProxyState(args.state), descr=args.descr,
+        refresh_interval=args.refresh_interval
+    )
+    await gateway.start()
+    _out(f'listening\t{args.host}:{gateway.port}\t{len(gateway.upstreams)} upstreams')
+    await gateway.serve_forever()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='proxy6', description='Proxy6.net API client')
+    parser.add_argument('-k', '--key', default=os.environ.get(ENV_API_KEY), help=f'API key, defaults to ${ENV_API_KEY}')
+    parser.add_argument('-t', '--timeout', type=float, default=None, help='request timeout, seconds')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    states = ('all', 'active', 'expiring', 'expired')
+    proxy_types = ('http', 'socks')
+
+    p = sub.add_parser('list', help='list purchased proxies')
+    p.add_argument('--state', choices=states, default='all')
+    p.add_argument('--descr')
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser('check', help='check proxies validity')
+    p.add_argument('ids', nargs='+')
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser('prolong', help='prolong proxies')
+    p.add_argument('-p', '--period', type=int, required=True, help='days')
+    p.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    p.add_argument('ids', nargs='+')
+    p.set_defaults(func=cmd_prolong)
+
+    p = sub.add_parser('delete', help='delete proxies by IDs or descr')
+    p.add_argument('--descr')
+    p.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    p.add_argument('ids', nargs='*')
+    p.set_defaults(func=cmd_delete)
+
+    p = sub.add_parser('set-type', help='change proxies protocol')
+    p.add_argument('--type', choices=proxy_types, required=True)
+    p.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    p.add_argument('ids', nargs='+')
+    p.set_defaults(func=cmd_set_type)
+
+    p = sub.add_parser('buy', help='buy proxies')
+    p.add_argument('-c', '--count', type=int, required=True)
+    p.add_argument('-p', '--period', type=int, required=True, help='days')
+    p.add_argument('--country', required=True, help='ISO2 code')
+    p.add_argument('-V', '--proxy-version', type=int, choices=(3, 4, 6), default=6)
+    p.add_argument('--type', choices=proxy_types, default='http')
+    p.add_argument('--descr')
+    p.add_argument('--auto-prolong', action='store_true')
+    p.set_defaults(func=cmd_buy)
+
+    p = sub.add_parser('export', help='export proxies to text, uri, csv or jsonl')
+    p.add_argument('-f', '--format', choices=('text', 'uri', 'csv', 'jsonl'), default='text')
+    p.add_argument('-o', '--output', help='output file, defaults to stdout')
+    p.add_argument('--columns', help='comma separated columns for csv and jsonl')
+    p.add_argument('--state', choices=states, default='all')
+    p.add_argument('--descr')
+    p.add_argument('--country', action='append')
+    p.add_argument('--type', choices=proxy_types)
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser('gateway', help='run local HTTP CONNECT and SOCKS5 proxy over purchased proxies')
+    p.add_argument('--host', default='127.0.0.1', help='other than loopback requires --password')
+    p.add_argument('--port', type=int, default=8080)
+    p.add_argument('--rotation', choices=('round_robin', 'random', 'least_connections'), default='round_robin')
+    p.add_argument('--sticky-ttl', type=float, default=600.0, help='seconds a username keeps its upstream')
+    p.add_argument('--password', help='password clients must send')
+    p.add_argument('--pool-size', type=int, default=0, help='warm connections per upstream')
+    p.add_argument('--state', choices=states, default='active')
+    p.add_argument('--descr')
+    p.add_argument('--refresh-interval', type=float, default=300.0, help='max seconds between inventory reloads')
+    p.set_defaults(func=cmd_gateway)
+    return parser
+
+
+async def run(args: argparse.Namespace) -> int:
+    from . import errors
+    from .async_.api import AsyncProxy6
+
+    try:
+        async with AsyncProxy6(args.key, args.timeout) as client:
+            return await args.func(client, args)
+    except (errors.BaseAPIError, errors.RPSAPIError, errors.UnexpectedAPIError, errors.DeadlineAPIError) as e:
+        print(f'proxy6: {type(e).__name__}: {e.args[-1] if e.args else e}', file=sys.stderr)
+        return 1
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.key:
+        parser.error(f'API key is required: pass --key or set ${ENV_API_KEY}')
+    if args.command == 'delete' and not (args.ids or args.descr):
+        parser.error('delete: pass IDs or --descr')
+    if args.command == 'gateway' and not args.password and not _is_loopback(args.host):
+        parser.error('gateway: --password is required to listen on a non-loopback address')
+    try:
+        return asyncio.run(run(args))
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        return 0
@@ -67,3 +67,95 @@ class NotFoundAPIError(BaseAPIError):
 
 class PriceAPIError(BaseAPIError):
     pass
+
+
+class DeadlineAPIError(Exception):
+    pass
+
+
+def raise_for_response(resp: dict) -> None:
+    '''Raises the error matching `error_id` of an API error response.
+
+    Args:
+        resp (dict): API response.
+
+    Raises:
+        UnknownAPIError: API unknown error.
+        KeyAPIError: API unauthorized error.
+        MethodAPIError: API method unexists.
+        CountAPIError: API count error.
+        PeriodAPIError: API period error.
+        CountryAPIError: API country error.
+        IDsAPIError: API IDs error.
+        DescrAPIError: API descr error.
+        TypeAPIError: API type error.
+        ActiveProxyAllowAPIError: API active proxy allow error.
+        NoMoneyAPIError: API no money error.
+        NotFoundAPIError: API not found error.
+        PriceAPIError: API price error.
+        UnexpectedAPIError: API unexpected error.
+    '''
+    if resp.get('error'):
+        match resp.get('error_id'):
+            case 30:
+                raise UnknownAPIError(
+                    resp, resp.get('error', 'Неизвестная ошибка')
+                )
+            case 100:
+                raise KeyAPIError(
+                    resp, 'Ошибка авторизации, неверный ключ'
+                )
+            case 110:
+                raise MethodAPIError(
+                    resp, 'Ошибочный метод'
+                )
+            case 200:
+                raise CountAPIError(
+                    resp, 'Ошибка кол-ва прокси, неверно указано кол-во, либо отсутствует'
+                )
+            case 210:
+                raise PeriodAPIError(
+                    resp, 'Ошибка периода, неверно указано кол-во (дней), либо отсутствует'
+                )
+            case 220:
+                raise CountryAPIError(
+                    resp,
+                    'Ошибка страны, неверно указана страна (страны указываются в формате iso2), либо отсутствует'
+                )
+            case 230:
+                raise IDsAPIError(
+                    resp, 'Ошибка списка номеров прокси. Номера прокси должны быть указаны через запятую'
+                )
+            case 250:
+                raise DescrAPIError(
+                    resp, 'Ошибка технического комментария, неверно указан, либо отсутствует'
+                )
+            case 260:
+                raise TypeAPIError(
+                    resp, 'Ошибка типа (протокола) прокси, неверно указан, либо отсутствует'
+                )
+            case 300:
+                raise ActiveProxyAllowAPIError(
+                    resp,
+                    'Ошибка кол-ва прокси. Возникает при попытке покупки большего кол-ва прокси, чем доступно на сервисе'
+                )
+            case 400:
+                raise NoMoneyAPIError(
+                    resp,
+                    'Ошибка баланса. На вашем балансе отсутствуют средства, либо их не хватает для покупки запрашиваемого кол-ва прокси'
+                )
+            case 404:
+                raise NotFoundAPIError(
+                    resp, 'Ошибка поиска. Возникает когда запрашиваемый элемент не найден'
+                )
+            case 410:
+                raise PriceAPIError(
+                    resp, 'Ошибка расчета стоимости. Итоговая стоимость меньше, либо равна нулю'
+                )
+            case _:
+                raise UnexpectedAPIError(
+                    resp, resp.get(
+                        'error',
+                        'Неожиданная ошибка API'
+                    )
+                )
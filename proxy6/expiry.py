@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Expiry scheduler.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import heapq
+import inspect
+import itertools
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from pydantic import BaseModel, Field
+
+from . import types
+
+
+log = logging.getLogger('proxy6')
+
+DEFAULT_LEADS = {
+    types.ProxyState.EXPIRING: timedelta(days=3),
+    types.ProxyState.EXPIRED: timedelta(0),
+}
+
+
+class ExpiryEvent(BaseModel):
+    id: str = Field(..., description='Внутренний номер прокси')
+    state: types.ProxyState = Field(..., description='Состояние, в которое перешел прокси')
+    date_end: datetime = Field(..., description='Дата окончания срока действия прокси')
+    fire_at: datetime = Field(..., description='Запланированное время события')
+
+
+class ExpiryScheduler:
+    '''Fires callbacks when proxies cross into EXPIRING or EXPIRED.
+
+    Timers live in a min-heap with lazy deletion: insert, update and cancel
+    are O(log n), stale entries are skipped on pop and the heap is compacted
+    once they make up more than half of it. Events that are already due
+    when a proxy is scheduled fire on the next check.
+    '''
+
+    def __init__(self, leads: dict[types.ProxyState, timedelta] | None = None) -> None:
+        self.leads = dict(DEFAULT_LEADS if leads is None else leads)
+        self._heap: list[list] = []
+        self._entries: dict[str, list[list]] = {}
+        self._date_end: dict[str, datetime] = {}
+        self._seq = itertools.count()
+        self._stale = 0
+        self._callbacks: list[Callable[[ExpiryEvent], Any]] = []
+        self._changed = asyncio.Event()
+        self._tasks: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._date_end)
+
+    def subscribe(self, callback: Callable[[ExpiryEvent], Any]) -> Callable[[], None]:
+        '''Registers event callback, sync or async.
+
+        Args:
+            callback (Callable[[ExpiryEvent], Any]): Callback.
+
+        Returns:
+            Callable[[], None]: Unsubscribe function.
+        '''
+        self._callbacks.append(callback)
+
+        def unsubscribe() -> None:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+        return unsubscribe
+
+    def schedule(self, id: str, date_end: datetime) -> None:
+        '''Adds proxy or moves its `date_end`.
+
+        Args:
+            id (str): Proxy ID.
+            date_end (datetime): Proxy expiry date.
+        '''
+        if self._date_end.get(id) == date_end:
+            return
+        self._invalidate(id)
+        self._date_end[id] = date_end
+        entries = []
+        for state, lead in self.leads.items():
+            entry = [(date_end - lead).timestamp(), next(self._seq), id, state, True]
+            heapq.heappush(self._heap, entry)
+            entries.append(entry)
+        self._entries[id] = entries
+        self._changed.set()
+
+    def cancel(self, id: str) -> None:
+        '''Removes proxy timers.
+
+        Args:
+            id (str): Proxy ID.
+        '''
+        self._invalidate(id)
+        self._date_end.pop(id, None)
+
+    def update_from(
+            self, resp: types.GetProxyResponse | types.BuyResponse | types.ProlongResponse,
+            full: bool | None = None
+    ) -> None:
+        '''Updates timers from API response.
+
+        Args:
+            resp (types.GetProxyResponse | types.BuyResponse | types.ProlongResponse): API response.
+            full (bool | None, optional): Response lists all proxies, so missing ones are cancelled. Defaults to True for `GetProxyResponse` and False otherwise.
+        '''
+        if full is None:
+            full = isinstance(resp, types.GetProxyResponse)
+        for id, info in resp.list.items():
+            self.schedule(info.id or id, info.date_end)
+        if full:
+            for id in set(self._date_end) - {info.id or id for id, info in resp.list.items()}:
+                self.cancel(id)
+
+    def next_fire(self) -> float | None:
+        '''Returns the nearest timer as a UNIX timestamp.
+
+        Returns:
+            float | None: Timestamp, or None if nothing is scheduled.
+        '''
+        while self._heap and not self._heap[0][4]:
+            heapq.heappop(self._heap)
+            self._stale -= 1
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float | None = None) -> list[ExpiryEvent]:
+        '''Removes and returns due events.
+
+        Args:
+            now (float | None, optional): Current UNIX timestamp. Defaults to now.
+
+        Returns:
+            list[ExpiryEvent]: Due events in firing order.
+        '''
+        now = time.time() if now is None else now
+        events = []
+        while self._heap and self._heap[0][0] <= now:
+            when, _, id, state, valid = heapq.heappop(self._heap)
+            if not valid:
+                self._stale -= 1
+                continue
+            self._entries[id] = [e for e in self._entries[id] if e[3] != state]
+            events.append(ExpiryEvent(
+                id=id, state=state, date_end=self._date_end[id],
+                fire_at=datetime.fromtimestamp(when)
+            ))
+        return events
+
+    def fire_due(self, now: float | None = None) -> list[ExpiryEvent]:
+        '''Fires callbacks for due events. Coroutine callbacks are scheduled on the running loop,
+        without one they are dropped with an error.
+
+        Args:
+            now (float | None, optional): Current UNIX timestamp. Defaults to now.
+
+        Returns:
+            list[ExpiryEvent]: Fired events.
+        '''
+        events = self.pop_due(now)
+        for event in events:
+            for callback in list(self._callbacks):
+                try:
+                    result = callback(event)
+                    if inspect.isawaitable(result):
+                        self._spawn(result)
+                except Exception:
+                    log.exception('Expiry callback failed')
+        return events
+
+    async def run(self) -> None:
+        '''Fires callbacks on time until cancelled. Coroutine callbacks are awaited.
+        '''
+        while True:
+            self._changed.clear()
+            next_fire = self.next_fire()
+            timeout = None if next_fire is None else max(next_fire - time.time(), 0)
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+                continue
+            except asyncio.TimeoutError:
+                pass
+            for event in self.pop_due():
+                for callback in list(self._callbacks):
+                    try:
+                        result = callback(event)
+                        if inspect.isawaitable(result):
+                            await result
+                    except Exception:
+                        log.exception('Expiry callback failed')
+
+    def _spawn(self, result: Any) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            if inspect.iscoroutine(result):
+                result.close()
+            log.error('Expiry callback returned a coroutine outside of an event loop')
+            return
+        # The loop keeps only weak references to tasks.
+        task = asyncio.ensure_future(result, loop=loop)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _invalidate(self, id: str) -> None:
+        for entry in self._entries.pop(id, ()):
+            entry[4] = False
+            self._stale += 1
+        if self._stale > len(self._heap) // 2 and self._stale > 64:
+            self._heap = [e for e in self._heap if e[4]]
+            heapq.heapify(self._heap)
+            self._stale = 0
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Inventory export.
+#  Created by LulzLoL231 at 19/10/26
+#
+import codecs
+import csv
+import io
+import json
+import socket
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import IO, Any, Iterable, Iterator
+
+from . import types
+from . import errors
+
+
+COLUMNS = (
+    'id', 'ip', 'host', 'port', 'user', 'pass', 'version', 'type',
+    'country', 'date', 'date_end', 'descr', 'active'
+)
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class ExportFormat(Enum):
+    TEXT = 'text'
+    URI = 'uri'
+    CSV = 'csv'
+    JSONL = 'jsonl'
+
+
+class _ChunkReader:
+    '''Text buffer over an iterable of byte or str chunks.
+    '''
+    def __init__(self, chunks: Iterable[bytes | str]) -> None:
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        for chunk in self._chunks:
+            if isinstance(chunk, bytes):
+                chunk = self._decoder.decode(chunk)
+            if chunk:
+                # Drop the consumed part, so the buffer holds one entry at most.
+                self.buf = self.buf[self.pos:] + chunk
+                self.pos = 0
+                return True
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise ValueError('Неожиданный конец JSON')
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f'Ожидался символ {char!r} в позиции {self.pos}')
+        self.pos += 1
+
+    def value(self, decoder: json.JSONDecoder) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may be cut in half.
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_raw_proxies(chunks: Iterable[bytes | str], header: dict | None = None) -> Iterator[dict]:
+    '''Parses `getproxy` JSON body incrementally and yields raw proxy entries.
+
+    Only one entry is held in memory at a time, so the body may be fed
+    straight from `httpx.Response.iter_bytes()` or a file.
+
+    Args:
+        chunks (Iterable[bytes | str]): Response body chunks.
+        header (dict | None, optional): Filled with the other response fields, like `balance`, for `AccountState.update`. Defaults to None.
+
+    Raises:
+        errors.BaseAPIError: API returned an error, mapped by `error_id` as in the clients.
+        errors.UnexpectedAPIError: API returned an unknown error.
+        ValueError: Malformed JSON.
+
+    Yields:
+        dict: Raw proxy entry as returned by API.
+    '''
+    decoder = json.JSONDecoder()
+    reader = _ChunkReader(chunks)
+    if header is None:
+        header = {}
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value(decoder)
+        reader.expect(':')
+        if key == 'list' and header.get('error'):
+            break
+        if key == 'list' and reader.peek() in '{[':
+            is_object = reader.peek() == '{'
+            reader.pos += 1
+            if reader.peek() != ('}' if is_object else ']'):
+                while True:
+                    if is_object:
+                        reader.value(decoder)
+                        reader.expect(':')
+                    yield reader.value(decoder)
+                    if reader.peek() != ',':
+                        break
+                    reader.pos += 1
+            reader.expect('}' if is_object else ']')
+        else:
+            header[key] = reader.value(decoder)
+        if reader.peek() != ',':
+            break
+        reader.pos += 1
+    # `error_id` may follow `error`, so the error header is read in full first.
+    errors.raise_for_response(header)
+    reader.expect('}')
+
+
+def _raw_from_model(proxy: types.ProxyInfo) -> dict:
+    return {
+        'id': proxy.id, 'ip': str(proxy.ip), 'host': proxy.host,
+        'port': proxy.port, 'user': proxy.user, 'pass': proxy.passwd,
+        'version': proxy.version.value, 'type': proxy.type.value,
+        'country': proxy.country, 'date': proxy.date.strftime(DATE_FORMAT),
+        'date_end': proxy.date_end.strftime(DATE_FORMAT), 'descr': proxy.descr,
+        'active': proxy.active
+    }
+
+
+def _is_active(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+class ProxyExporter:
+    '''Writes proxy inventory in bulk with constant memory.
+
+    Rows are formatted straight from raw API entries (models are converted
+    on the fly) and written in batches of `batch_size` rows.
+    '''
+    BATCH_SIZE = 1000
+    EXPIRING_WINDOW = timedelta(days=3)
+
+    def __init__(
+            self, format: ExportFormat = ExportFormat.TEXT,
+            columns: Iterable[str] | None = None,
+            country: str | Iterable[str] | None = None,
+            type: types.ProxyType | None = None,
+            state: types.ProxyState = types.ProxyState.ALL,
+            batch_size: int = BATCH_SIZE
+    ) -> None:
+        self.format = format
+        self.columns = tuple(columns) if columns else COLUMNS
+        unknown = set(self.columns) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f'Неизвестные колонки: {", ".join(sorted(unknown))}')
+        if isinstance(country, str):
+            country = [country]
+        self.countries = {c.lower() for c in country} if country else None
+        self.type = type
+        self.state = state
+        self.batch_size = batch_size
+        self.rows = 0
+
+    def export(self, source: Any, fp: IO[str] | socket.socket) -> int:
+        '''Writes proxies to file or socket.
+
+        Args:
+            source (Any): `types.GetProxyResponse`, raw `getproxy` response, or iterable of `types.ProxyInfo` / raw entries (see `iter_raw_proxies`).
+            fp (IO[str] | socket.socket): Text file or connected socket.
+
+        Returns:
+            int: Number of written rows.
+        '''
+        if isinstance(fp, socket.socket):
+            with fp.makefile('w', encoding='utf-8', newline='') as sock_fp:
+                return self._export(source, sock_fp)
+        return self._export(source, fp)
+
+    def _export(self, source: Any, fp: IO[str]) -> int:
+        buf = io.StringIO()
+        writer = csv.writer(buf) if self.format == ExportFormat.CSV else None
+        if writer:
+            writer.writerow(self.columns)
+        pending = 0
+        self.rows = 0
+        for row in self._filter(self._iter_source(source)):
+            if writer:
+                writer.writerow(['' if row.get(c) is None else row.get(c) for c in self.columns])
+            else:
+                buf.write(self._format_row(row))
+            pending += 1
+            self.rows += 1
+            if pending >= self.batch_size:
+                fp.write(buf.getvalue())
+                buf.seek(0)
+                buf.truncate()
+                pending = 0
+        fp.write(buf.getvalue())
+        fp.flush()
+        return self.rows
+
+    def _format_row(self, row: dict) -> str:
+        match self.format:
+            case ExportFormat.TEXT:
+                return f'{row["user"]}:{row["pass"]}@{row["host"]}:{row["port"]}\n'
+            case ExportFormat.URI:
+                scheme = 'socks5' if row['type'] == types.ProxyType.SOCKS5.value else 'https'
+                return f'{scheme}://{row["user"]}:{row["pass"]}@{row["host"]}:{row["port"]}\n'
+            case ExportFormat.JSONL:
+                return json.dumps({c: row.get(c) for c in self.columns}, ensure_ascii=False) + '\n'
+        raise ValueError(f'Неизвестный формат: {self.format}')
+
+    @staticmethod
+    def _iter_source(source: Any) -> Iterator[dict]:
+        if isinstance(source, (types.GetProxyResponse, types.BuyResponse)):
+            source = source.list.values()
+        elif isinstance(source, dict):
+            source = source.get('list') or {}
+            if isinstance(source, dict):
+                source = source.values()
+        for item in source:
+            yield _raw_from_model(item) if isinstance(item, types.ProxyInfo) else item
+
+    def _filter(self, rows: Iterator[dict]) -> Iterator[dict]:
+        now = datetime.now()
+        for row in rows:
+            if self.countries is not None and (row.get('country') or '').lower() not in self.countries:
+                continue
+            if self.type is not None and row.get('type') != self.type.value:
+                continue
+            if self.state != types.ProxyState.ALL:
+                active = _is_active(row.get('active'))
+                date_end = datetime.fromisoformat(str(row['date_end']))
+                match self.state:
+                    case types.ProxyState.ACTIVE:
+                        matches = active and date_end > now
+                    case types.ProxyState.EXPIRED:
+                        matches = not active or date_end <= now
+                    case _:
+                        matches = active and now < date_end <= now + self.EXPIRING_WINDOW
+                if not matches:
+                    continue
+            yield row
+
+
+def export_proxies(
+        source: Any, fp: IO[str] | socket.socket,
+        format: ExportFormat = ExportFormat.TEXT, **kwargs: Any
+) -> int:
+    '''Writes proxies to file or socket, see `ProxyExporter`.
+
+    Args:
+        source (Any): Proxies source, see `ProxyExporter.export`.
+        fp (IO[str] | socket.socket): Text file or connected socket.
+        format (ExportFormat, optional): Output format. Defaults to ExportFormat.TEXT.
+        **kwargs: `ProxyExporter` options: columns, country, type, state, batch_size.
+
+    Returns:
+        int: Number of written rows.
+    '''
+    return ProxyExporter(format, **kwargs).export(source, fp)
@@ -0,0 +1,491 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Local forward-proxy gateway.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import base64
+import itertools
+import logging
+import random
+import struct
+import time
+from collections import deque
+from enum import Enum
+from typing import Iterable
+
+from pydantic import BaseModel, Field
+
+from . import types
+from .handshake import (
+    SOCKS_AUTH_NONE, SOCKS_AUTH_UNACCEPTABLE, SOCKS_AUTH_USERPASS, SOCKS_CMD_CONNECT,
+    SOCKS_REP_ATYP_NOT_SUPPORTED, SOCKS_REP_COMMAND_NOT_SUPPORTED, SOCKS_REP_FAILURE,
+    SOCKS_REP_SUCCEEDED, SOCKS_VERSION, GatewayError, format_host, http_handshake,
+    read_head, read_socks_address, socks_address, socks_handshake
+)
+from .watcher import InventoryWatcher, ProxyEvent, is_expired
+
+
+log = logging.getLogger('proxy6')
+
+MAX_HEAD_SIZE = 64 * 1024
+BUFFER_SIZE = 64 * 1024
+
+
+class RotationStrategy(Enum):
+    ROUND_ROBIN = 'round_robin'
+    RANDOM = 'random'
+    LEAST_CONNECTIONS = 'least_connections'
+
+
+class UpstreamStats(BaseModel):
+    id: str = Field(..., description='Внутренний номер прокси')
+    address: str = Field(..., description='Адрес прокси host:port')
+    type: types.ProxyType = Field(..., description='Тип прокси')
+    connections: int = Field(0, description='Всего туннелей через прокси')
+    active: int = Field(0, description='Открытых туннелей')
+    bytes_sent: int = Field(0, description='Отправлено байт клиентом')
+    bytes_received: int = Field(0, description='Получено байт клиентом')
+    errors: int = Field(0, description='Ошибок подключения к прокси')
+    last_error: str | None = Field(None, description='Последняя ошибка')
+
+
+class Upstream:
+    '''Purchased proxy with counters and a pool of warm TCP connections.
+
+    Pooled connections are opened to the proxy itself before any client
+    needs them; the tunnel handshake is done once the target is known, so
+    a pooled connection is used for exactly one tunnel.
+    '''
+
+    def __init__(self, proxy: types.ProxyInfo, pool_size: int = 0, idle_timeout: float = 30.0) -> None:
+        self.proxy = proxy
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.stats = UpstreamStats(
+            id=proxy.id, address=f'{proxy.host}:{proxy.port}', type=proxy.type
+        )
+        self.cooldown_until = 0.0
+        self._pool: deque[tuple[float, asyncio.StreamReader, asyncio.StreamWriter]] = deque()
+        self._filling = False
+        self._closed = False
+
+    @property
+    def id(self) -> str:
+        return self.proxy.id
+
+    def available(self, now: float) -> bool:
+        return not self._closed and self.cooldown_until <= now
+
+    async def open(self, connect_timeout: float) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        '''Returns a warm connection from the pool, or opens a new one.
+        '''
+        now = time.monotonic()
+        conn = None
+        while self._pool:
+            created, reader, writer = self._pool.popleft()
+            if now - created < self.idle_timeout and not reader.at_eof() and not writer.is_closing():
+                conn = reader, writer
+                break
+            writer.close()
+        if conn is None:
+            conn = await asyncio.wait_for(
+                asyncio.open_connection(self.proxy.host, self.proxy.port), connect_timeout
+            )
+        self.fill(connect_timeout)
+        return conn
+
+    def fill(self, connect_timeout: float) -> None:
+        '''Tops the pool up in background.
+        '''
+        if self.pool_size and not self._filling and not self._closed and len(self._pool) < self.pool_size:
+            self._filling = True
+            asyncio.ensure_future(self._fill(connect_timeout))
+
+    def close(self) -> None:
+        self._closed = True
+        while self._pool:
+            self._pool.popleft()[2].close()
+
+    async def _fill(self, connect_timeout: float) -> None:
+        try:
+            while not self._closed and len(self._pool) < self.pool_size:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.proxy.host, self.proxy.port), connect_timeout
+                )
+                if self._closed:
+                    writer.close()
+                    return
+                self._pool.append((time.monotonic(), reader, writer))
+        except (OSError, asyncio.TimeoutError) as e:
+            log.debug(f'Pool fill for {self.stats.address} failed: {e!r}')
+        finally:
+            self._filling = False
+
+
+class ProxyGateway:
+    '''Local HTTP CONNECT and SOCKS5 server that tunnels through purchased proxies.
+
+    Both protocols are served on one port, the first byte of a connection
+    tells them apart. Each tunnel goes through an upstream picked by the
+    rotation strategy. Clients that send a username (Basic
+    `Proxy-Authorization` or SOCKS5 username/password) get a sticky
+    session: the same username keeps its upstream until `sticky_ttl`
+    seconds pass without use. If `password` is set, clients must send it.
+
+    Upstreams that fail to connect are skipped for `failure_cooldown`
+    seconds and the tunnel is retried on another one. With `client` the
+    inventory is reloaded in background; `update` swaps it by hand and
+    keeps counters of upstreams that stay.
+    '''
+    CONNECT_TIMEOUT = 10.0
+    STICKY_TTL = 600.0
+    FAILURE_COOLDOWN = 30.0
+    RETRIES = 2
+
+    def __init__(
+            self, client=None, proxies: Iterable[types.ProxyInfo] | None = None,
+            host: str = '127.0.0.1', port: int = 8080,
+            rotation: RotationStrategy = RotationStrategy.ROUND_ROBIN,
+            sticky_ttl: float = STICKY_TTL, password: str | None = None,
+            pool_size: int = 0, idle_timeout: float = 30.0,
+            connect_timeout: float = CONNECT_TIMEOUT,
+            failure_cooldown: float = FAILURE_COOLDOWN, retries: int = RETRIES,
+            state: types.ProxyState = types.ProxyState.ACTIVE, descr: str | None = None,
+            refresh_interval: float = InventoryWatcher.MAX_INTERVAL
+    ) -> None:
+        if client is None and proxies is None:
+            raise ValueError('Нужно указать "client" или "proxies".')
+        self.client = client
+        self.host = host
+        self.port = port
+        self.rotation = rotation
+        self.sticky_ttl = sticky_ttl
+        self.password = password
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.failure_cooldown = failure_cooldown
+        self.retries = retries
+        self.watcher = InventoryWatcher(
+            client, state, descr, max_interval=refresh_interval
+        ) if client is not None else None
+        self.upstreams: dict[str, Upstream] = {}
+        self._order: list[Upstream] = []
+        self._cursor = itertools.count()
+        self._sessions: dict[str, tuple[str, float]] = {}
+        self._server: asyncio.AbstractServer | None = None
+        self._unsubscribe = None
+        self._update_pending = False
+        if proxies is not None:
+            self.update(proxies)
+
+    async def __aenter__(self) -> 'ProxyGateway':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def update(self, proxies: Iterable[types.ProxyInfo]) -> None:
+        '''Replaces upstream set. Expired and inactive proxies are skipped.
+
+        Args:
+            proxies (Iterable[types.ProxyInfo]): Proxies.
+        '''
+        current = {}
+        for proxy in proxies:
+            if is_expired(proxy):
+                continue
+            upstream = self.upstreams.get(proxy.id)
+            if upstream is not None and upstream.proxy == proxy:
+                current[proxy.id] = upstream
+                continue
+            if upstream is not None:
+                upstream.close()
+            current[proxy.id] = Upstream(proxy, self.pool_size, self.idle_timeout)
+            if upstream is not None:
+                # Open tunnels keep updating the same counters.
+                stats = current[proxy.id].stats
+                upstream.stats.address, upstream.stats.type = stats.address, stats.type
+                current[proxy.id].stats = upstream.stats
+        for id, upstream in self.upstreams.items():
+            if id not in current:
+                upstream.close()
+        self.upstreams = current
+        self._order = list(current.values())
+        self._sessions = {
+            key: session for key, session in self._sessions.items() if session[0] in current
+        }
+        if self._server is not None:
+            for upstream in self._order:
+                upstream.fill(self.connect_timeout)
+        log.info(f'Gateway inventory: {len(current)} upstreams')
+
+    def _inventory_changed(self, event: ProxyEvent) -> None:
+        # A poll emits one event per change with the inventory already
+        # replaced, so the whole batch is applied with a single `update`.
+        if not self._update_pending:
+            self._update_pending = True
+            asyncio.get_running_loop().call_soon(self._apply_inventory)
+
+    def _apply_inventory(self) -> None:
+        self._update_pending = False
+        if self._unsubscribe is not None:
+            self.update(self.watcher.inventory.values())
+
+    def stats(self) -> dict[str, UpstreamStats]:
+        '''Returns per-upstream counters.
+
+        Returns:
+            dict[str, UpstreamStats]: Counters by proxy ID.
+        '''
+        return {id: upstream.stats.model_copy() for id, upstream in self.upstreams.items()}
+
+    async def start(self) -> None:
+        '''Loads inventory if needed and starts listening.
+        '''
+        if self.watcher is not None:
+            await self.watcher.poll()
+            self.update(self.watcher.inventory.values())
+            self._unsubscribe = self.watcher.subscribe(self._inventory_changed)
+            self.watcher.start()
+        self._server = await asyncio.start_server(
+            self._handle, self.host, self.port, limit=MAX_HEAD_SIZE
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        for upstream in self._order:
+            upstream.fill(self.connect_timeout)
+        log.info(f'Gateway listening on {format_host(self.host)}:{self.port}')
+
+    async def serve_forever(self) -> None:
+        '''Starts the gateway if needed and serves until cancelled.
+        '''
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        '''Stops listening, inventory reload and pooled connections.
+        '''
+        if self.watcher is not None:
+            if self._unsubscribe is not None:
+                self._unsubscribe()
+                self._unsubscribe = None
+            await self.watcher.stop()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for upstream in self.upstreams.values():
+            upstream.close()
+
+    def pick(self, session: str | None = None, exclude: set[str] = frozenset()) -> Upstream:
+        '''Chooses upstream for a new tunnel.
+
+        Args:
+            session (str | None, optional): Sticky session key. Defaults to None.
+            exclude (set[str], optional): Upstream IDs to skip. Defaults to empty.
+
+        Returns:
+            Upstream: Chosen upstream.
+        '''
+        now = time.monotonic()
+        if session is not None:
+            bound = self._sessions.get(session)
+            if bound is not None and bound[1] > now and bound[0] not in exclude:
+                upstream = self.upstreams.get(bound[0])
+                if upstream is not None and upstream.available(now):
+                    self._sessions[session] = (upstream.id, now + self.sticky_ttl)
+                    return upstream
+        candidates = [u for u in self._order if u.id not in exclude and u.available(now)]
+        if not candidates:
+            candidates = [u for u in self._order if u.id not in exclude]
+        if not candidates:
+            raise GatewayError('No upstream proxies available')
+        if self.rotation == RotationStrategy.RANDOM:
+            upstream = random.choice(candidates)
+        elif self.rotation == RotationStrategy.LEAST_CONNECTIONS:
+            upstream = min(candidates, key=lambda u: u.stats.active)
+        else:
+            upstream = candidates[next(self._cursor) % len(candidates)]
+        if session is not None:
+            self._sessions[session] = (upstream.id, now + self.sticky_ttl)
+        return upstream
+
+    async def connect(
+            self, host: str, port: int, session: str | None = None
+    ) -> tuple[Upstream, asyncio.StreamReader, asyncio.StreamWriter]:
+        '''Opens a tunnel to target through an upstream, retrying on others.
+
+        Args:
+            host (str): Target host.
+            port (int): Target port.
+            session (str | None, optional): Sticky session key. Defaults to None.
+
+        Returns:
+            tuple[Upstream, asyncio.StreamReader, asyncio.StreamWriter]: Upstream and tunnel streams.
+        '''
+        tried: set[str] = set()
+        error: Exception | None = None
+        for _ in range(self.retries + 1):
+            try:
+                upstream = self.pick(session, tried)
+            except GatewayError:
+                break
+            tried.add(upstream.id)
+            writer = None
+            try:
+                reader, writer = await upstream.open(self.connect_timeout)
+                handshake = http_handshake if upstream.proxy.type == types.ProxyType.HTTPS else socks_handshake
+                await asyncio.wait_for(
+                    handshake(reader, writer, upstream.proxy, host, port), self.connect_timeout
+                )
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, GatewayError) as e:
+                if writer is not None:
+                    writer.close()
+                error = e
+                upstream.stats.errors += 1
+                upstream.stats.last_error = repr(e)
+                upstream.cooldown_until = time.monotonic() + self.failure_cooldown
+                log.warning(f'Upstream {upstream.stats.address} failed: {e!r}')
+                continue
+            return upstream, reader, writer
+        raise GatewayError(f'Could not connect to {host}:{port}: {error!r}')
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            first = await reader.readexactly(1)
+            if first[0] == SOCKS_VERSION:
+                await self._handle_socks(reader, writer)
+            else:
+                await self._handle_http(first, reader, writer)
+        except (OSError, asyncio.IncompleteReadError, GatewayError) as e:
+            log.debug(f'Gateway client error: {e!r}')
+        finally:
+            writer.close()
+
+    async def _handle_http(self, first: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        head = first + await read_head(reader)
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split(' ')
+        if len(parts) != 3 or parts[0].upper() != 'CONNECT':
+            writer.write(b'HTTP/1.1 405 Method Not Allowed\r\nAllow: CONNECT\r\nContent-Length: 0\r\n\r\n')
+            await writer.drain()
+            return
+        credentials = None
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'proxy-authorization':
+                scheme, _, token = value.strip().partition(' ')
+                if scheme.lower() == 'basic':
+                    try:
+                        credentials = base64.b64decode(token).decode().partition(':')[::2]
+                    except ValueError:
+                        pass
+                break
+        if self.password is not None and (credentials is None or credentials[1] != self.password):
+            writer.write(
+                b'HTTP/1.1 407 Proxy Authentication Required\r\n'
+                b'Proxy-Authenticate: Basic realm="proxy6"\r\nContent-Length: 0\r\n\r\n'
+            )
+            await writer.drain()
+            return
+        session = (credentials[0] or None) if credentials is not None else None
+        host, _, port = parts[1].rpartition(':')
+        host = host.strip('[]')
+        try:
+            upstream, up_reader, up_writer = await self.connect(host, int(port), session)
+        except (GatewayError, ValueError) as e:
+            log.info(f'Gateway CONNECT {parts[1]} failed: {e}')
+            writer.write(b'HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n')
+            await writer.drain()
+            return
+        writer.write(b'HTTP/1.1 200 Connection established\r\n\r\n')
+        await writer.drain()
+        await self._pipe(upstream, reader, writer, up_reader, up_writer)
+
+    async def _handle_socks(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        methods = await reader.readexactly((await reader.readexactly(1))[0])
+        session = None
+        if SOCKS_AUTH_USERPASS in methods:
+            writer.write(bytes((SOCKS_VERSION, SOCKS_AUTH_USERPASS)))
+            await writer.drain()
+            _, length = await reader.readexactly(2)
+            user = (await reader.readexactly(length)).decode()
+            passwd = (await reader.readexactly((await reader.readexactly(1))[0])).decode()
+            ok = self.password is None or passwd == self.password
+            writer.write(bytes((1, 0 if ok else 1)))
+            await writer.drain()
+            if not ok:
+                return
+            session = user or None
+        elif SOCKS_AUTH_NONE in methods and self.password is None:
+            writer.write(bytes((SOCKS_VERSION, SOCKS_AUTH_NONE)))
+            await writer.drain()
+        else:
+            writer.write(bytes((SOCKS_VERSION, SOCKS_AUTH_UNACCEPTABLE)))
+            await writer.drain()
+            return
+        _, cmd, _, atyp = await reader.readexactly(4)
+        if cmd != SOCKS_CMD_CONNECT:
+            await self._socks_reply(writer, SOCKS_REP_COMMAND_NOT_SUPPORTED)
+            return
+        try:
+            host = await read_socks_address(reader, atyp)
+        except GatewayError:
+            await self._socks_reply(writer, SOCKS_REP_ATYP_NOT_SUPPORTED)
+            return
+        port = struct.unpack('!H', await reader.readexactly(2))[0]
+        try:
+            upstream, up_reader, up_writer = await self.connect(host, port, session)
+        except GatewayError as e:
+            log.info(f'Gateway SOCKS5 {host}:{port} failed: {e}')
+            await self._socks_reply(writer, SOCKS_REP_FAILURE)
+            return
+        await self._socks_reply(writer, SOCKS_REP_SUCCEEDED)
+        await self._pipe(upstream, reader, writer, up_reader, up_writer)
+
+    @staticmethod
+    async def _socks_reply(writer: asyncio.StreamWriter, rep: int) -> None:
+        writer.write(bytes((SOCKS_VERSION, rep, 0)) + socks_address('0.0.0.0', 0))
+        await writer.drain()
+
+    async def _pipe(
+            self, upstream: Upstream,
+            reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+            up_reader: asyncio.StreamReader, up_writer: asyncio.StreamWriter
+    ) -> None:
+        stats = upstream.stats
+        stats.connections += 1
+        stats.active += 1
+
+        async def copy(src: asyncio.StreamReader, dst: asyncio.StreamWriter, field: str) -> None:
+            try:
+                while True:
+                    data = await src.read(BUFFER_SIZE)
+                    if not data:
+                        break
+                    setattr(stats, field, getattr(stats, field) + len(data))
+                    dst.write(data)
+                    await dst.drain()
+            except OSError:
+                pass
+            finally:
+                if dst.can_write_eof() and not dst.is_closing():
+                    try:
+                        dst.write_eof()
+                    except OSError:
+                        pass
+
+        try:
+            await asyncio.gather(
+                copy(reader, up_writer, 'bytes_sent'),
+                copy(up_reader, writer, 'bytes_received')
+            )
+        finally:
+            stats.active -= 1
+            up_writer.close()
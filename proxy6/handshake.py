@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Upstream proxy handshakes.
+#  Created by LulzLoL231 at 19/10/26
+#
+# HTTP CONNECT and SOCKS5 client handshakes with a purchased proxy, shared
+# by `proxy6.gateway`, which tunnels client connections through it, and
+# `proxy6.routing`, which times them.
+import asyncio
+import base64
+import ipaddress
+import struct
+
+from . import types
+
+
+SOCKS_VERSION = 5
+SOCKS_AUTH_NONE = 0
+SOCKS_AUTH_USERPASS = 2
+SOCKS_AUTH_UNACCEPTABLE = 0xFF
+SOCKS_CMD_CONNECT = 1
+SOCKS_ATYP_IPV4 = 1
+SOCKS_ATYP_DOMAIN = 3
+SOCKS_ATYP_IPV6 = 4
+SOCKS_REP_SUCCEEDED = 0
+SOCKS_REP_FAILURE = 1
+SOCKS_REP_COMMAND_NOT_SUPPORTED = 7
+SOCKS_REP_ATYP_NOT_SUPPORTED = 8
+
+
+class GatewayError(Exception):
+    pass
+
+
+def format_host(host: str) -> str:
+    '''Returns host for `host:port`, with IPv6 addresses in brackets.
+    '''
+    return f'[{host}]' if ':' in host else host
+
+
+def socks_address(host: str, port: int) -> bytes:
+    '''Encodes SOCKS5 ATYP, address and port.
+    '''
+    try:
+        ip = ipaddress.ip_address(host)
+    except ValueError:
+        encoded = host.encode('idna')
+        return bytes((SOCKS_ATYP_DOMAIN, len(encoded))) + encoded + struct.pack('!H', port)
+    atyp = SOCKS_ATYP_IPV4 if ip.version == 4 else SOCKS_ATYP_IPV6
+    return bytes((atyp,)) + ip.packed + struct.pack('!H', port)
+
+
+async def read_socks_address(reader: asyncio.StreamReader, atyp: int) -> str:
+    '''Reads SOCKS5 address of type `atyp`.
+
+    Raises:
+        GatewayError: Unsupported address type.
+    '''
+    if atyp == SOCKS_ATYP_IPV4:
+        return str(ipaddress.IPv4Address(await reader.readexactly(4)))
+    if atyp == SOCKS_ATYP_IPV6:
+        return str(ipaddress.IPv6Address(await reader.readexactly(16)))
+    if atyp == SOCKS_ATYP_DOMAIN:
+        length = (await reader.readexactly(1))[0]
+        return (await reader.readexactly(length)).decode('idna')
+    raise GatewayError(f'Unsupported SOCKS address type {atyp}')
+
+
+async def read_head(reader: asyncio.StreamReader) -> bytes:
+    '''Reads HTTP head up to the empty line.
+
+    Raises:
+        GatewayError: Head is longer than the reader limit.
+    '''
+    try:
+        return await reader.readuntil(b'\r\n\r\n')
+    except asyncio.LimitOverrunError:
+        raise GatewayError('Request head is too large')
+
+
+async def http_handshake(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+        proxy: types.ProxyInfo, host: str, port: int
+) -> None:
+    '''Opens tunnel to `host:port` through HTTP proxy with CONNECT.
+
+    Args:
+        reader (asyncio.StreamReader): Connection to the proxy.
+        writer (asyncio.StreamWriter): Connection to the proxy.
+        proxy (types.ProxyInfo): Proxy, for its credentials.
+        host (str): Target host.
+        port (int): Target port.
+
+    Raises:
+        GatewayError: Proxy refused the tunnel.
+    '''
+    target = f'{format_host(host)}:{port}'
+    token = base64.b64encode(f'{proxy.user}:{proxy.passwd}'.encode()).decode()
+    writer.write(
+        f'CONNECT {target} HTTP/1.1\r\nHost: {target}\r\n'
+        f'Proxy-Authorization: Basic {token}\r\n\r\n'.encode()
+    )
+    await writer.drain()
+    head = await read_head(reader)
+    status = head.split(b'\r\n', 1)[0].split(b' ', 2)
+    if len(status) < 2 or status[1] != b'200':
+        raise GatewayError(f'Upstream CONNECT failed: {head.splitlines()[0].decode(errors="replace")}')
+
+
+async def socks_handshake(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+        proxy: types.ProxyInfo, host: str, port: int
+) -> None:
+    '''Opens tunnel to `host:port` through SOCKS5 proxy with username/password auth.
+
+    Args:
+        reader (asyncio.StreamReader): Connection to the proxy.
+        writer (asyncio.StreamWriter): Connection to the proxy.
+        proxy (types.ProxyInfo): Proxy, for its credentials.
+        host (str): Target host.
+        port (int): Target port.
+
+    Raises:
+        GatewayError: Proxy refused the auth or the tunnel.
+    '''
+    writer.write(bytes((SOCKS_VERSION, 1, SOCKS_AUTH_USERPASS)))
+    await writer.drain()
+    version, method = await reader.readexactly(2)
+    if version != SOCKS_VERSION or method != SOCKS_AUTH_USERPASS:
+        raise GatewayError('Upstream SOCKS5 refused username/password auth')
+    user, passwd = proxy.user.encode(), proxy.passwd.encode()
+    writer.write(bytes((1, len(user))) + user + bytes((len(passwd),)) + passwd)
+    await writer.drain()
+    _, status = await reader.readexactly(2)
+    if status != 0:
+        raise GatewayError('Upstream SOCKS5 auth failed')
+    writer.write(bytes((SOCKS_VERSION, SOCKS_CMD_CONNECT, 0)) + socks_address(host, port))
+    await writer.drain()
+    version, rep, _, atyp = await reader.readexactly(4)
+    if rep != SOCKS_REP_SUCCEEDED:
+        raise GatewayError(f'Upstream SOCKS5 CONNECT failed with code {rep}')
+    await read_socks_address(reader, atyp)
+    await reader.readexactly(2)
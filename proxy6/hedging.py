@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Hedged requests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import threading
+from collections import deque
+
+
+HEDGE_METHODS = frozenset({'getprice', 'getcount', 'getcountry', 'getproxy', 'check'})
+
+
+class LatencyTracker:
+    '''Keeps recent latencies per API method to pick hedge delays.
+
+    A hedge is sent once the primary request is slower than the configured
+    percentile of recent successful requests of the same method.
+    '''
+    SAMPLES = 100
+    MIN_SAMPLES = 10
+    DEFAULT_DELAY = 1.0
+
+    def __init__(
+            self, percentile: float = 0.95,
+            default_delay: float = DEFAULT_DELAY, samples: int = SAMPLES
+    ) -> None:
+        if not 0 < percentile < 1:
+            raise ValueError('Аргумент "percentile" должен быть в интервале (0, 1).')
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.samples = samples
+        self._lock = threading.Lock()
+        self._latencies: dict[str, deque[float]] = {}
+
+    def record(self, method: str, seconds: float) -> None:
+        '''Saves latency of successful request.
+
+        Args:
+            method (str): API method.
+            seconds (float): Request latency.
+        '''
+        with self._lock:
+            self._latencies.setdefault(method, deque(maxlen=self.samples)).append(seconds)
+
+    def hedge_delay(self, method: str) -> float:
+        '''Returns how long to wait for the primary request before hedging.
+
+        Args:
+            method (str): API method.
+
+        Returns:
+            float: Delay in seconds.
+        '''
+        with self._lock:
+            latencies = sorted(self._latencies.get(method, ()))
+        if len(latencies) < self.MIN_SAMPLES:
+            return self.default_delay
+        return latencies[min(int(len(latencies) * self.percentile), len(latencies) - 1)]
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Indexed proxy inventory.
+#  Created by LulzLoL231 at 19/10/26
+#
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from . import types
+
+
+GroupKey = tuple[str, types.ProxyVersion, types.ProxyType]
+
+
+def group_key(proxy: types.ProxyInfo) -> GroupKey:
+    '''Returns (country, version, type) key of proxy.
+
+    Args:
+        proxy (types.ProxyInfo): Proxy.
+
+    Returns:
+        GroupKey: Lowercase ISO2 country, version and type.
+    '''
+    return (proxy.country or '').lower(), proxy.version, proxy.type
+
+
+class InventoryIndex:
+    '''Proxies indexed by ID, (country, version, type), type and descr.
+
+    Index updates are O(1) per proxy, so the index can follow API
+    responses instead of being rebuilt from every `getproxy` call.
+    '''
+
+    def __init__(self, proxies: Iterable[types.ProxyInfo] = ()) -> None:
+        self.by_id: dict[str, types.ProxyInfo] = {}
+        self._groups: dict[GroupKey, set[str]] = defaultdict(set)
+        self._types: dict[types.ProxyType, set[str]] = defaultdict(set)
+        self._descrs: dict[str | None, set[str]] = defaultdict(set)
+        for proxy in proxies:
+            self.add(proxy)
+
+    @classmethod
+    def from_response(cls, resp: types.GetProxyResponse) -> 'InventoryIndex':
+        return cls(resp.list.values())
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self.by_id
+
+    def __iter__(self) -> Iterator[types.ProxyInfo]:
+        return iter(list(self.by_id.values()))
+
+    def get(self, id: str) -> types.ProxyInfo | None:
+        return self.by_id.get(id)
+
+    def add(self, proxy: types.ProxyInfo) -> None:
+        '''Adds or replaces proxy.
+
+        Args:
+            proxy (types.ProxyInfo): Proxy.
+        '''
+        self.remove(proxy.id)
+        self.by_id[proxy.id] = proxy
+        self._groups[group_key(proxy)].add(proxy.id)
+        self._types[proxy.type].add(proxy.id)
+        self._descrs[proxy.descr or None].add(proxy.id)
+
+    def remove(self, id: str) -> types.ProxyInfo | None:
+        '''Removes proxy.
+
+        Args:
+            id (str): Proxy ID.
+
+        Returns:
+            types.ProxyInfo | None: Removed proxy, or None if it was not indexed.
+        '''
+        proxy = self.by_id.pop(id, None)
+        if proxy is not None:
+            self._discard(self._groups, group_key(proxy), id)
+            self._discard(self._types, proxy.type, id)
+            self._discard(self._descrs, proxy.descr or None, id)
+        return proxy
+
+    def patch(self, id: str, **fields) -> types.ProxyInfo | None:
+        '''Replaces proxy with a copy with changed fields; shared models are not modified.
+
+        Args:
+            id (str): Proxy ID.
+            **fields: New field values.
+
+        Returns:
+            types.ProxyInfo | None: New proxy, or None if it was not indexed.
+        '''
+        proxy = self.by_id.get(id)
+        if proxy is None:
+            return None
+        proxy = proxy.model_copy(update=fields)
+        self.add(proxy)
+        return proxy
+
+    def update(
+            self, resp: types.GetProxyResponse | types.BuyResponse | types.ProlongResponse,
+            full: bool | None = None
+    ) -> None:
+        '''Applies API response.
+
+        Args:
+            resp (types.GetProxyResponse | types.BuyResponse | types.ProlongResponse): API response.
+            full (bool | None, optional): Response lists all proxies, so missing ones are removed. Defaults to True for `GetProxyResponse` and False otherwise.
+        '''
+        if full is None:
+            full = isinstance(resp, types.GetProxyResponse)
+        if isinstance(resp, types.ProlongResponse):
+            for info in resp.list.values():
+                self.patch(info.id, date_end=info.date_end)
+            return
+        for proxy in resp.list.values():
+            self.add(proxy)
+        if full:
+            for id in set(self.by_id) - {proxy.id for proxy in resp.list.values()}:
+                self.remove(id)
+
+    def group(
+            self, country: str, version: types.ProxyVersion, type: types.ProxyType
+    ) -> list[types.ProxyInfo]:
+        return [self.by_id[id] for id in self._groups.get((country.lower(), version, type), ())]
+
+    def groups(self) -> dict[GroupKey, int]:
+        '''Returns proxy count per (country, version, type).
+
+        Returns:
+            dict[GroupKey, int]: Counts.
+        '''
+        return {key: len(ids) for key, ids in self._groups.items()}
+
+    def with_type(self, type: types.ProxyType) -> list[types.ProxyInfo]:
+        return [self.by_id[id] for id in self._types.get(type, ())]
+
+    def with_descr(self, descr: str | None) -> list[types.ProxyInfo]:
+        return [self.by_id[id] for id in self._descrs.get(descr or None, ())]
+
+    def descrs(self) -> dict[str | None, int]:
+        '''Returns proxy count per descr.
+
+        Returns:
+            dict[str | None, int]: Counts, None for proxies without descr.
+        '''
+        return {descr: len(ids) for descr, ids in self._descrs.items()}
+
+    def ending_before(self, when: datetime) -> list[types.ProxyInfo]:
+        '''Returns proxies with `date_end` before `when`, soonest first.
+
+        Args:
+            when (datetime): Time limit.
+
+        Returns:
+            list[types.ProxyInfo]: Proxies.
+        '''
+        return sorted(
+            (p for p in self.by_id.values() if p.date_end < when),
+            key=lambda p: p.date_end
+        )
+
+    @staticmethod
+    def _discard(index: dict, key, id: str) -> None:
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(id)
+            if not ids:
+                del index[key]
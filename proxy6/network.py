@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: DNS cache and connection warm-up helpers.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import ipaddress
+import logging
+import socket
+import threading
+import time
+from typing import Any
+
+import httpcore
+import httpx
+
+from . import tracing
+
+
+log = logging.getLogger('proxy6')
+
+
+class DNSCache:
+    '''Resolved addresses with TTL.
+
+    `getaddrinfo` does not return record TTLs, so every entry lives `ttl`
+    seconds. An expired entry is still served for `stale_ttl` seconds
+    while it is refreshed (in background for async lookups), and when
+    the resolver fails. Literal IP addresses are not cached.
+    '''
+    TTL = 300.0
+    STALE_TTL = 3600.0
+
+    def __init__(self, ttl: float = TTL, stale_ttl: float = STALE_TTL) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: dict[tuple[str, int], tuple[float, list[str]]] = {}
+        self._refreshing: set[tuple[str, int]] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+
+    def get(self, host: str, port: int) -> tuple[list[str], bool] | None:
+        '''Returns cached addresses and whether they are still fresh.
+
+        Args:
+            host (str): Host name.
+            port (int): Port.
+
+        Returns:
+            tuple[list[str], bool] | None: Addresses and freshness, or None if nothing usable is cached.
+        '''
+        with self._lock:
+            entry = self._entries.get((host, port))
+        if entry is None:
+            return None
+        age = time.monotonic() - entry[0]
+        if age > self.ttl + self.stale_ttl:
+            return None
+        return entry[1], age <= self.ttl
+
+    def put(self, host: str, port: int, addresses: list[str]) -> None:
+        with self._lock:
+            self._entries[(host, port)] = (time.monotonic(), addresses)
+            self._refreshing.discard((host, port))
+
+    def invalidate(self, host: str, port: int) -> None:
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def resolve(self, host: str, port: int) -> list[str]:
+        '''Resolves host, using the cache.
+
+        Args:
+            host (str): Host name.
+            port (int): Port.
+
+        Returns:
+            list[str]: Addresses.
+        '''
+        if _is_ip(host):
+            return [host]
+        cached = self.get(host, port)
+        if cached is not None and cached[1]:
+            return cached[0]
+        tracing.mark_current('dns.started')
+        try:
+            addresses = _addresses(socket.getaddrinfo(host, port, type=socket.SOCK_STREAM))
+        except OSError:
+            if cached is not None:
+                log.warning(f'Resolving {host} failed, using stale addresses')
+                return cached[0]
+            raise
+        finally:
+            tracing.mark_current('dns.complete')
+        self.put(host, port, addresses)
+        return addresses
+
+    async def aresolve(self, host: str, port: int) -> list[str]:
+        '''Resolves host, using the cache; stale entries are refreshed in background.
+
+        Args:
+            host (str): Host name.
+            port (int): Port.
+
+        Returns:
+            list[str]: Addresses.
+        '''
+        if _is_ip(host):
+            return [host]
+        cached = self.get(host, port)
+        if cached is not None:
+            if not cached[1]:
+                with self._lock:
+                    refresh = (host, port) not in self._refreshing
+                    self._refreshing.add((host, port))
+                if refresh:
+                    # The loop keeps only weak references to tasks.
+                    task = asyncio.ensure_future(self._refresh(host, port))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+            return cached[0]
+        tracing.mark_current('dns.started')
+        try:
+            addresses = await self._lookup(host, port)
+        finally:
+            tracing.mark_current('dns.complete')
+        self.put(host, port, addresses)
+        return addresses
+
+    async def _lookup(self, host: str, port: int) -> list[str]:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        return _addresses(infos)
+
+    async def _refresh(self, host: str, port: int) -> None:
+        try:
+            self.put(host, port, await self._lookup(host, port))
+        except OSError as e:
+            log.warning(f'Refreshing {host} failed: {e!r}')
+            with self._lock:
+                self._refreshing.discard((host, port))
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+def _addresses(infos: list) -> list[str]:
+    addresses = []
+    for info in infos:
+        address = info[4][0]
+        if address not in addresses:
+            addresses.append(address)
+    return addresses
+
+
+class CachingNetworkBackend(httpcore.NetworkBackend):
+    '''httpcore backend that resolves hosts through `DNSCache`.
+
+    The connection is made to an IP address, TLS still uses the original
+    host name for SNI and certificate checks.
+    '''
+
+    def __init__(self, cache: DNSCache, backend: httpcore.NetworkBackend | None = None) -> None:
+        self.cache = cache
+        self.backend = backend or httpcore.SyncBackend()
+
+    def connect_tcp(self, host: str, port: int, timeout: float | None = None, local_address: str | None = None, socket_options: Any = None) -> httpcore.NetworkStream:
+        error: Exception | None = None
+        for address in self.cache.resolve(host, port):
+            try:
+                return self.backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        self.cache.invalidate(host, port)
+        raise error or httpcore.ConnectError(f'Не найдено ни одного адреса для {host}.')
+
+    def connect_unix_socket(self, path: str, timeout: float | None = None, socket_options: Any = None) -> httpcore.NetworkStream:
+        return self.backend.connect_unix_socket(path, timeout, socket_options)
+
+    def sleep(self, seconds: float) -> None:
+        self.backend.sleep(seconds)
+
+
+class AsyncCachingNetworkBackend(httpcore.AsyncNetworkBackend):
+    '''Async counterpart of `CachingNetworkBackend`.
+    '''
+
+    def __init__(self, cache: DNSCache, backend: httpcore.AsyncNetworkBackend | None = None) -> None:
+        self.cache = cache
+        self.backend = backend or httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host: str, port: int, timeout: float | None = None, local_address: str | None = None, socket_options: Any = None) -> httpcore.AsyncNetworkStream:
+        error: Exception | None = None
+        for address in await self.cache.aresolve(host, port):
+            try:
+                return await self.backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        self.cache.invalidate(host, port)
+        raise error or httpcore.ConnectError(f'Не найдено ни одного адреса для {host}.')
+
+    async def connect_unix_socket(self, path: str, timeout: float | None = None, socket_options: Any = None) -> httpcore.AsyncNetworkStream:
+        return await self.backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self.backend.sleep(seconds)
+
+
+def install_dns_cache(transport: httpx.BaseTransport | httpx.AsyncBaseTransport, cache: DNSCache) -> bool:
+    '''Puts DNS cache in front of the httpcore pool of an httpx transport.
+
+    httpx does not expose the network backend, so this relies on private
+    attributes: `_pool` of `HTTPTransport`/`AsyncHTTPTransport` and
+    `_network_backend` of the httpcore pool (httpx 0.23+, httpcore 0.16+).
+    When either is missing or has another type, e.g. after an upgrade or
+    with a custom transport, the transport is left as is and requests
+    resolve hosts without the cache.
+
+    Args:
+        transport (httpx.BaseTransport | httpx.AsyncBaseTransport): Transport.
+        cache (DNSCache): Cache.
+
+    Returns:
+        bool: Cache was installed.
+    '''
+    if not isinstance(transport, (httpx.HTTPTransport, httpx.AsyncHTTPTransport)):
+        return False
+    pool = getattr(transport, '_pool', None)
+    if isinstance(pool, httpcore.AsyncConnectionPool):
+        backend_type, caching_type = httpcore.AsyncNetworkBackend, AsyncCachingNetworkBackend
+    elif isinstance(pool, httpcore.ConnectionPool):
+        backend_type, caching_type = httpcore.NetworkBackend, CachingNetworkBackend
+    else:
+        log.warning(f'DNS cache is not installed: unknown connection pool {type(pool).__name__}')
+        return False
+    backend = getattr(pool, '_network_backend', None)
+    if isinstance(backend, caching_type):
+        return True
+    if not isinstance(backend, backend_type):
+        log.warning(f'DNS cache is not installed: unknown network backend {type(backend).__name__}')
+        return False
+    pool._network_backend = caching_type(cache, backend)
+    return True
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Idempotent purchases.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from enum import Enum
+
+import httpx
+from pydantic import BaseModel, Field
+
+from . import errors, types
+from .async_.api import AsyncProxy6
+
+
+log = logging.getLogger('proxy6')
+
+MAX_DESCR_LENGTH = 50
+
+
+class OrderState(Enum):
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+class Order(BaseModel):
+    tag: str = Field(..., description='Уникальный descr заказа')
+    state: OrderState = Field(OrderState.PENDING, description='Состояние заказа')
+    count: int = Field(..., description='Кол-во прокси')
+    period: int = Field(..., description='Период (кол-во дней)')
+    country: str = Field(..., description='Страна в формате ISO2')
+    version: types.ProxyVersion = Field(..., description='Версия прокси')
+    type: types.ProxyType = Field(..., description='Тип прокси')
+    auto_prolong: bool = Field(False, description='Автопродление')
+    ids: list[str] = Field([], description='Номера купленных прокси')
+    error: str | None = Field(None, description='Последняя ошибка')
+    updated_at: datetime = Field(default_factory=datetime.now, description='Время записи')
+
+
+class OrderJournal:
+    '''Append-only JSONL write-ahead log of purchases.
+
+    An order is written as pending before the `buy` request is sent and
+    again once its outcome is known; the last record of a tag wins. Each
+    record is flushed with fsync, so a pending order survives a crash.
+    '''
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self.orders: dict[str, Order] = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        order = Order.model_validate_json(line)
+                    except ValueError:
+                        # Torn last line after a crash.
+                        log.warning(f'Skipping broken journal record in {path}')
+                        continue
+                    self.orders[order.tag] = order
+
+    def write(self, order: Order) -> None:
+        '''Appends order record.
+
+        Args:
+            order (Order): Order.
+        '''
+        order.updated_at = datetime.now()
+        line = order.model_dump_json() + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.orders[order.tag] = order
+
+    def pending(self) -> list[Order]:
+        '''Returns orders with unknown outcome.
+
+        Returns:
+            list[Order]: Pending orders.
+        '''
+        with self._lock:
+            return [order for order in self.orders.values() if order.state == OrderState.PENDING]
+
+    def compact(self) -> None:
+        '''Rewrites journal keeping only pending orders.
+        '''
+        with self._lock:
+            pending = [o for o in self.orders.values() if o.state == OrderState.PENDING]
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for order in pending:
+                    f.write(order.model_dump_json() + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self.orders = {order.tag: order for order in pending}
+
+
+class IdempotentBuyer:
+    '''Buys proxies with retries that never double-purchase.
+
+    Every order gets a unique `descr` tag. When the outcome of a `buy` is
+    unknown (timeout, dropped connection, 503 or other non-API answer) the
+    buyer waits `settle_delay` seconds and looks the tag up with
+    `get_proxy(descr=tag)`; the order is retried only if nothing was bought.
+    Errors returned by the API and failures before the request is sent
+    are final. With `journal`, unresolved orders are kept on disk and
+    `recover` resolves them after a restart.
+    '''
+    TAG_PREFIX = 'p6-'
+    RETRIES = 3
+    SETTLE_DELAY = 2.0
+
+    def __init__(
+            self, client: AsyncProxy6, journal: OrderJournal | None = None,
+            retries: int = RETRIES, timeout: float | None = None,
+            settle_delay: float = SETTLE_DELAY, tag_prefix: str = TAG_PREFIX
+    ) -> None:
+        self.client = client
+        self.journal = journal
+        self.retries = retries
+        self.timeout = timeout
+        self.settle_delay = settle_delay
+        self.tag_prefix = tag_prefix
+
+    def make_tag(self) -> str:
+        return f'{self.tag_prefix}{uuid.uuid4().hex}'[:MAX_DESCR_LENGTH]
+
+    async def buy(
+            self, count: int, period: int, country: str,
+            version: types.ProxyVersion = types.ProxyVersion.IPV6,
+            type: types.ProxyType = types.ProxyType.HTTPS,
+            auto_prolong: bool = False, tag: str | None = None,
+            *, deadline: float | None = None
+    ) -> types.BuyResponse:
+        '''Buys proxies at most once.
+
+        Args:
+            count (int): Кол-во прокси для покупки.
+            period (int): Период - кол-во дней.
+            country (str): Страна в формате iso2.
+            version (types.ProxyVersion, optional): Версия прокси. Defaults to types.ProxyVersion.IPV6.
+            type (types.ProxyType, optional): Тип прокси (протокол). Defaults to types.ProxyType.HTTPS.
+            auto_prolong (bool, optional): Включить автопродление. Defaults to False.
+            tag (str | None, optional): Unique descr for the order. Defaults to a generated one.
+            deadline (float | None, optional): Крайний срок - значение `time.monotonic()`. Defaults to None.
+
+        Raises:
+            errors.BaseAPIError: API rejected the order.
+            errors.DeadlineAPIError: Deadline passed before the outcome became known.
+
+        Returns:
+            types.BuyResponse: Ответ API, or a response rebuilt from `get_proxy` when the order was found by tag.
+        '''
+        order = Order(
+            tag=tag or self.make_tag(), count=count, period=period, country=country,
+            version=version, type=type, auto_prolong=auto_prolong
+        )
+        if len(order.tag) > MAX_DESCR_LENGTH:
+            raise ValueError('Аргумент "tag" превышает максимальную длину в 50 символов.')
+        self._write(order)
+        ambiguous = False
+        for attempt in range(self.retries + 1):
+            try:
+                resp = await self.client.buy(
+                    count, period, country, version, type, order.tag, auto_prolong,
+                    timeout=self.timeout, deadline=deadline
+                )
+            except (errors.BaseAPIError, errors.DeadlineAPIError, httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # The API answered, or the request never left: nothing was bought by this attempt.
+                order.error = repr(e)
+                if not ambiguous:
+                    order.state = OrderState.FAILED
+                self._write(order)
+                raise
+            except (httpx.TransportError, errors.RPSAPIError, errors.UnexpectedAPIError, ValueError) as e:
+                ambiguous = True
+                order.error = repr(e)
+                log.warning(f'Order {order.tag}: outcome unknown after {e!r}, reconciling')
+                found = await self._reconcile(order, deadline)
+                if found is not None:
+                    return found
+                if attempt == self.retries:
+                    self._write(order)
+                    raise
+                continue
+            order.state = OrderState.DONE
+            order.ids = list(resp.list)
+            order.error = None
+            self._write(order)
+            return resp
+
+    async def lookup(self, order: Order, deadline: float | None = None) -> types.BuyResponse | None:
+        '''Looks order up by its tag.
+
+        Args:
+            order (Order): Order.
+            deadline (float | None, optional): Крайний срок - значение `time.monotonic()`. Defaults to None.
+
+        Returns:
+            types.BuyResponse | None: Response rebuilt from found proxies, or None if nothing was bought.
+        '''
+        # A cached answer may predate the purchase and lead to buying twice.
+        resp = await self.client.get_proxy(
+            types.ProxyState.ALL, order.tag, timeout=self.timeout, deadline=deadline, cached=False
+        )
+        if not resp.list:
+            return None
+        return types.BuyResponse(
+            user_id=resp.user_id, balance=resp.balance, currency=resp.currency,
+            count=len(resp.list), period=order.period, country=order.country, list=resp.list
+        )
+
+    async def recover(self, resubmit: bool = False) -> list[Order]:
+        '''Resolves pending journal orders.
+
+        Args:
+            resubmit (bool, optional): Buy orders that were not found instead of marking them failed. Defaults to False.
+
+        Returns:
+            list[Order]: Resolved orders.
+        '''
+        if self.journal is None:
+            return []
+        resolved = []
+        for order in self.journal.pending():
+            found = await self.lookup(order)
+            if found is not None:
+                self._done(order, found)
+            elif resubmit:
+                await self.buy(
+                    order.count, order.period, order.country, order.version,
+                    order.type, order.auto_prolong, order.tag
+                )
+                order = self.journal.orders[order.tag]
+            else:
+                order.state = OrderState.FAILED
+                order.error = 'Not found on recovery'
+                self._write(order)
+            resolved.append(order)
+        return resolved
+
+    async def _reconcile(self, order: Order, deadline: float | None) -> types.BuyResponse | None:
+        delay = self.settle_delay
+        if deadline is not None:
+            delay = min(delay, max(deadline - time.monotonic(), 0))
+        await asyncio.sleep(delay)
+        for _ in range(self.retries + 1):
+            try:
+                found = await self.lookup(order, deadline)
+            except errors.DeadlineAPIError:
+                self._write(order)
+                raise
+            except (httpx.TransportError, errors.RPSAPIError, errors.UnexpectedAPIError) as e:
+                log.warning(f'Order {order.tag}: lookup failed with {e!r}')
+                continue
+            if found is not None:
+                self._done(order, found)
+            return found
+        # The outcome is still unknown, retrying the purchase could double it.
+        self._write(order)
+        raise errors.UnexpectedAPIError(f'Не удалось проверить заказ {order.tag}.')
+
+    def _done(self, order: Order, resp: types.BuyResponse) -> None:
+        order.state = OrderState.DONE
+        order.ids = list(resp.list)
+        order.error = None
+        self._write(order)
+
+    def _write(self, order: Order) -> None:
+        if self.journal is not None:
+            self.journal.write(order)
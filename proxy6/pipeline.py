@@ -0,0 +1,514 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Streaming fleet pipelines.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable
+
+from pydantic import BaseModel, Field
+
+from . import types
+from .async_.api import AsyncProxy6
+from .async_.scheduler import request_caller
+from .routing import measure_route
+
+
+log = logging.getLogger('proxy6')
+
+QUEUE_SIZE = 100
+_END = object()
+
+
+class StageStats(BaseModel):
+    name: str = Field(..., description='Название стадии')
+    concurrency: int = Field(..., description='Кол-во параллельных обработчиков')
+    received: int = Field(0, description='Получено элементов')
+    emitted: int = Field(0, description='Передано дальше элементов')
+    failed: int = Field(0, description='Элементов с ошибкой')
+    busy: float = Field(0.0, description='Время обработки, сумма по обработчикам (с)')
+    blocked: float = Field(0.0, description='Время ожидания места в очереди следующей стадии (с)')
+    started: float | None = Field(None, description='Начало работы, time.monotonic()')
+    finished: float | None = Field(None, description='Окончание работы, time.monotonic()')
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        '''Emitted items per second.
+        '''
+        return self.emitted / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class Stage:
+    '''Pipeline step run by `concurrency` workers.
+
+    `process` is an async generator yielding any number of outputs for
+    one input; `flush` yields what is left once the input is exhausted.
+    An exception in `process` drops the item and is counted in stats.
+    `writes` marks stages that change proxies through the API.
+    '''
+    writes = False
+
+    def __init__(self, name: str, concurrency: int = 1) -> None:
+        if concurrency < 1:
+            raise ValueError('Аргумент "concurrency" должен быть больше 0.')
+        self.name = name
+        self.concurrency = concurrency
+        self.stats = StageStats(name=name, concurrency=concurrency)
+
+    def process(self, item: Any) -> AsyncIterator[Any]:
+        raise NotImplementedError
+
+    async def flush(self) -> AsyncIterator[Any]:
+        return
+        yield
+
+    async def run(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        self.stats.started = time.monotonic()
+        request_caller.set(f'pipeline.{self.name}')
+        await asyncio.gather(*(self._worker(inbox, outbox) for _ in range(self.concurrency)))
+        async for out in self.flush():
+            await self._emit(outbox, out)
+        await outbox.put(_END)
+        self.stats.finished = time.monotonic()
+
+    async def _worker(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        while True:
+            item = await inbox.get()
+            if item is _END:
+                # Leave the marker for the other workers of this stage.
+                inbox.put_nowait(_END)
+                return
+            self.stats.received += 1
+            started = time.monotonic()
+            blocked = self.stats.blocked
+            try:
+                async for out in self.process(item):
+                    await self._emit(outbox, out)
+            except Exception as e:
+                self.stats.failed += 1
+                log.warning(f'Pipeline stage {self.name} failed on {_describe(item)}: {e!r}')
+            self.stats.busy += time.monotonic() - started - (self.stats.blocked - blocked)
+
+    async def _emit(self, outbox: asyncio.Queue, item: Any) -> None:
+        started = time.monotonic()
+        await outbox.put(item)
+        self.stats.blocked += time.monotonic() - started
+        self.stats.emitted += 1
+
+
+class SourceStage(Stage):
+    '''First stage, yields items from `produce` instead of an input queue.
+    '''
+
+    def __init__(self, name: str, produce: Callable[[], AsyncIterator[Any]]) -> None:
+        super().__init__(name)
+        self.produce = produce
+
+    async def run(self, inbox: asyncio.Queue | None, outbox: asyncio.Queue) -> None:
+        self.stats.started = time.monotonic()
+        request_caller.set(f'pipeline.{self.name}')
+        async for item in self.produce():
+            self.stats.received += 1
+            await self._emit(outbox, item)
+        await outbox.put(_END)
+        self.stats.finished = time.monotonic()
+
+
+class GeneratorStage(Stage):
+    '''Stage calling an async generator function for every item.
+    '''
+
+    def __init__(self, name: str, fn: Callable[[Any], AsyncIterator[Any]], concurrency: int = 1) -> None:
+        super().__init__(name, concurrency)
+        self.fn = fn
+
+    def process(self, item: Any) -> AsyncIterator[Any]:
+        return self.fn(item)
+
+
+class BatchStage(Stage):
+    '''Groups items into lists of `size`.
+
+    A partial batch is emitted when no batch was completed for `max_wait`
+    seconds since its first item, and when the input ends.
+    '''
+
+    def __init__(self, name: str, size: int, max_wait: float | None = None) -> None:
+        super().__init__(name)
+        self.size = size
+        self.max_wait = max_wait
+
+    async def run(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        self.stats.started = time.monotonic()
+        batch: list[Any] = []
+        first = 0.0
+        while True:
+            timeout = None
+            if batch and self.max_wait is not None:
+                timeout = max(first + self.max_wait - time.monotonic(), 0)
+            try:
+                item = await asyncio.wait_for(inbox.get(), timeout)
+            except asyncio.TimeoutError:
+                await self._emit(outbox, batch)
+                batch = []
+                continue
+            if item is _END:
+                break
+            self.stats.received += 1
+            if not batch:
+                first = time.monotonic()
+            batch.append(item)
+            if len(batch) >= self.size:
+                await self._emit(outbox, batch)
+                batch = []
+        if batch:
+            await self._emit(outbox, batch)
+        await outbox.put(_END)
+        self.stats.finished = time.monotonic()
+
+
+def _describe(item: Any) -> str:
+    if isinstance(item, types.ProxyInfo):
+        return f'proxy {item.id}'
+    if isinstance(item, list):
+        return f'batch of {len(item)}'
+    return repr(item)
+
+
+def _ids(items: Any) -> list[str]:
+    if not isinstance(items, list):
+        items = [items]
+    return [item.id if isinstance(item, types.ProxyInfo) else str(item) for item in items]
+
+
+async def _result(value: Any) -> Any:
+    return await value if inspect.isawaitable(value) else value
+
+
+class Pipeline:
+    '''Chain of stages connected by bounded queues.
+
+    Every stage runs in its own task and pulls from the queue of the
+    previous one, so items flow end to end as soon as they are ready and
+    a slow stage holds the upstream back once its queue is full. API
+    calls of all stages go through the same client, i.e. its scheduler and
+    rate limiter; each stage is a separate scheduler caller, so stages
+    share request slots round-robin.
+
+    Usage:
+        pipeline = (
+            Pipeline(client).fetch(types.ProxyState.ACTIVE)
+            .check(concurrency=10, keep=False).batch(100).delete()
+        )
+        async for resp in pipeline.stream():
+            ...
+    '''
+
+    def __init__(self, client: AsyncProxy6 | None = None, queue_size: int = QUEUE_SIZE) -> None:
+        self.client = client
+        self.queue_size = queue_size
+        self.stages: list[Stage] = []
+
+    def add(self, stage: Stage) -> 'Pipeline':
+        '''Appends stage.
+
+        Args:
+            stage (Stage): Stage.
+
+        Returns:
+            Pipeline: This pipeline.
+        '''
+        if not self.stages and not isinstance(stage, SourceStage):
+            raise ValueError('Первой стадией должен быть источник.')
+        if self.stages and isinstance(stage, SourceStage):
+            raise ValueError('Источник может быть только первой стадией.')
+        names = {s.name for s in self.stages}
+        if stage.name in names:
+            index = 2
+            while f'{stage.name}{index}' in names:
+                index += 1
+            stage.name = stage.stats.name = f'{stage.name}{index}'
+        self.stages.append(stage)
+        return self
+
+    def source(self, items: Iterable[Any] | AsyncIterator[Any], name: str = 'source') -> 'Pipeline':
+        '''Starts pipeline from items.
+
+        Args:
+            items (Iterable[Any] | AsyncIterator[Any]): Items or async iterator.
+            name (str, optional): Stage name. Defaults to 'source'.
+
+        Returns:
+            Pipeline: This pipeline.
+        '''
+        async def produce():
+            if hasattr(items, '__aiter__'):
+                async for item in items:
+                    yield item
+            else:
+                for item in items:
+                    yield item
+
+        return self.add(SourceStage(name, produce))
+
+    def fetch(self, state: types.ProxyState = types.ProxyState.ALL, descr: str | None = None) -> 'Pipeline':
+        '''Starts pipeline from `get_proxy`, yielding `types.ProxyInfo`.
+
+        The list is read past the `refresh_ahead` cache when the pipeline has write stages.
+
+        Args:
+            state (types.ProxyState, optional): Состояние возвращаемых прокси. Defaults to types.ProxyState.ALL.
+            descr (str | None, optional): Технический комментарий. Defaults to None.
+
+        Returns:
+            Pipeline: This pipeline.
+        '''
+        async def produce():
+            # A pipeline that changes proxies must not act on a cached list.
+            cached = not any(stage.writes for stage in self.stages)
+            resp = await self._client().get_proxy(state, descr, cached=cached)
+            for proxy in resp.list.values():
+                yield proxy
+
+        return self.add(SourceStage('fetch', produce))
+
+    def stage(
+            self, fn: Callable[[Any], AsyncIterator[Any]], name: str | None = None,
+            concurrency: int = 1
+    ) -> 'Pipeline':
+        '''Appends async generator function as a stage.
+
+        Args:
+            fn (Callable[[Any], AsyncIterator[Any]]): Yields outputs for one item.
+            name (str | None, optional): Stage name. Defaults to function name.
+            concurrency (int, optional): Parallel workers. Defaults to 1.
+
+        Returns:
+            Pipeline: This pipeline.
+        '''
+        return self.add(GeneratorStage(name or fn.__name__, fn, concurrency))
+
+    def map(
+            self, fn: Callable[[Any], Any | Awaitable[Any]], name: str = 'map',
+            concurrency: int = 1
+    ) -> 'Pipeline':
+        '''Appends stage replacing each item with `fn(item)`.
+
+        Args:
+            fn (Callable[[Any], Any | Awaitable[Any]]): Sync or async function.
+            name (str, optional): Stage name. Defaults to 'map'.
+            concurrency (int, optional): Parallel workers. Defaults to 1.
+
+        Returns:
+            Pipeline: This pipeline.
+        '''
+        async def process(item):
+            yield await _result(fn(item))
+
+        return self.add(GeneratorStage(name, process, concurrency))
+
+    def filter(
+            self, predicate: Callable[[Any], bool | Awaitable[bool]], name: str = 'filter',
+            concurrency: int = 1
+    ) -> 'Pipeline':
+        '''Appends stage passing items for which `predicate` is true.
+
+        Args:
+            predicate (Callable[[Any], bool | Awaitable[bool]]): Sync or async predicate.
+            name (str, optional): Stage name. Defaults to 'filter'.
+            concurrency (int, optional): Parallel workers. Defaults to 1.
+
+        Returns:
+            Pipeline: This pipeline.
+        '''
+        async def process(item):
+            if await _result(predicate(item)):
+                yield item
+
+        return self.add(GeneratorStage(name, process, concurrency))
+
+    def check(self, concurrency: int = 4, keep: bool = True) -> 'Pipeline':
+        '''Appends stage checking proxies with the `check` API method.
+
+        Args:
+            concurrency (int, optional): Parallel checks. Defaults to 4.
+            keep (bool, optional): Pass working proxies if True, failed ones if False. Defaults to True.
+
+        Returns:
+            Pipeline: This pipeline.
+        '''
+        async def process(item):
+            if (await self._client().check(_ids(item)[0])).proxy_status == keep:
+                yield item
+
+        return self.add(GeneratorStage('check', process, concurrency))
+
+    def probe(
+            self, host: str | None = None, port: int = 443, timeout: float = 10.0,
+            concurrency: int = 50, keep: bool = True
+    ) -> 'Pipeline':
+        '''Appends stage probing `types.ProxyInfo` items from this machine.
+
+        Without `host` only a TCP connection to the proxy is opened, with
+        it a tunnel to `host:port` is established through the proxy.
+        No API requests are made.
+
+        Args:
+            host (str | None, optional): Target host. Defaults to None.
+            port (int, optional): Target port. Defaults to 443.
+            timeout (float, optional): Probe timeout in seconds. Defaults to 10.0.
+            concurrency (int, optional): Parallel probes. Defaults to 50.
+            keep (bool, optional): Pass working proxies if True, failed ones if False. Defaults to True.
+
+        Returns:
+            Pipeline: This pipeline.
+        '''
+        async def process(proxy: types.ProxyInfo):
+            if await probe_proxy(proxy, host, port, timeout) == keep:
+                yield proxy
+
+        return self.add(GeneratorStage('probe', process, concurrency))
+
+    def batch(self, size: int = 100, max_wait: float | None = None) -> 'Pipeline':
+        '''Appends stage grouping items into lists.
+
+        Args:
+            size (int, optional): Batch size. Defaults to 100.
+            max_wait (float | None, optional): Emit a partial batch after this many seconds. Defaults to None.
+
+        Returns:
+            Pipeline: This pipeline.
+        '''
+        return self.add(BatchStage('batch', size, max_wait))
+
+    def write(
+            self, fn: Callable[[list[str]], Awaitable[Any]], name: str = 'write',
+            concurrency: int = 1
+    ) -> 'Pipeline':
+        '''Appends stage calling `fn` with proxy IDs of each batch and yielding its result.
+
+        Args:
+            fn (Callable[[list[str]], Awaitable[Any]]): Write call, e.g. `lambda ids: client.delete(ids)`.
+            name (str, optional): Stage name. Defaults to 'write'.
+            concurrency (int, optional): Parallel calls. Defaults to 1.
+
+        Returns:
+            Pipeline: This pipeline.
+        '''
+        async def process(items):
+            yield await fn(_ids(items))
+
+        stage = GeneratorStage(name, process, concurrency)
+        stage.writes = True
+        return self.add(stage)
+
+    def prolong(self, period: int, concurrency: int = 1) -> 'Pipeline':
+        '''Appends stage prolonging each batch.
+
+        Args:
+            period (int): Период продления в днях.
+            concurrency (int, optional): Parallel calls. Defaults to 1.
+
+        Returns:
+            Pipeline: This pipeline.
+        '''
+        return self.write(lambda ids: self._client().prolong(period, ids), 'prolong', concurrency)
+
+    def delete(self, concurrency: int = 1) -> 'Pipeline':
+        '''Appends stage deleting each batch.
+
+        Args:
+            concurrency (int, optional): Parallel calls. Defaults to 1.
+
+        Returns:
+            Pipeline: This pipeline.
+        '''
+        return self.write(lambda ids: self._client().delete(ids), 'delete', concurrency)
+
+    async def stream(self) -> AsyncIterator[Any]:
+        '''Runs pipeline, yielding outputs of the last stage as they are ready.
+
+        Stage tasks are cancelled when the consumer stops early.
+
+        Raises:
+            Exception: A stage failed outside of item processing, e.g. `fetch`.
+        '''
+        if not self.stages:
+            raise ValueError('Пайплайн не содержит стадий.')
+        queues = [asyncio.Queue(self.queue_size) for _ in self.stages]
+        tasks = {
+            asyncio.create_task(stage.run(queues[i - 1] if i else None, queues[i]))
+            for i, stage in enumerate(self.stages)
+        }
+        output = queues[-1]
+        getter: asyncio.Future | None = None
+        try:
+            while True:
+                getter = asyncio.ensure_future(output.get())
+                while not getter.done():
+                    done, _ = await asyncio.wait(tasks | {getter}, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done - {getter}:
+                        tasks.discard(task)
+                        if task.exception() is not None:
+                            raise task.exception()
+                item = getter.result()
+                if item is _END:
+                    return
+                yield item
+        finally:
+            if getter is not None:
+                getter.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self.stream()
+
+    async def run(self) -> list[Any]:
+        '''Runs pipeline to the end.
+
+        Returns:
+            list[Any]: Outputs of the last stage.
+        '''
+        return [item async for item in self.stream()]
+
+    def stats(self) -> dict[str, StageStats]:
+        '''Returns stats of every stage.
+
+        Returns:
+            dict[str, StageStats]: Stats by stage name.
+        '''
+        return {stage.name: stage.stats for stage in self.stages}
+
+    def _client(self) -> AsyncProxy6:
+        if self.client is None:
+            raise ValueError('Для стадий API нужен клиент "client".')
+        return self.client
+
+
+async def probe_proxy(
+        proxy: types.ProxyInfo, host: str | None = None, port: int = 443,
+        timeout: float = 10.0
+) -> bool:
+    '''Checks that proxy accepts connections, and tunnels to `host:port` if given.
+
+    Args:
+        proxy (types.ProxyInfo): Proxy.
+        host (str | None, optional): Target host. Defaults to None.
+        port (int, optional): Target port. Defaults to 443.
+        timeout (float, optional): Timeout in seconds. Defaults to 10.0.
+
+    Returns:
+        bool: Proxy works.
+    '''
+    return await measure_route(proxy, host, port, timeout) is not None
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Bulk change planners.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import logging
+from enum import Enum
+from typing import Iterable, Mapping
+
+from pydantic import BaseModel, Field
+
+from . import types
+from .async_.api import AsyncProxy6
+from .inventory import InventoryIndex
+
+
+log = logging.getLogger('proxy6')
+
+CHUNK_SIZE = 100
+
+
+class SetTypeBatch(BaseModel):
+    type: types.ProxyType = Field(..., description='Устанавливаемый тип')
+    ids: list[str] = Field(..., description='Номера прокси')
+    done: bool = Field(False, description='Запрос выполнен')
+    error: str | None = Field(None, description='Ошибка выполнения')
+
+
+class SetTypePlan(BaseModel):
+    batches: list[SetTypeBatch] = Field([], description='Запросы settype')
+    unchanged: list[str] = Field([], description='Прокси, уже имеющие нужный тип')
+    unknown: list[str] = Field([], description='Прокси, отсутствующие в списке')
+
+    @property
+    def changed(self) -> int:
+        return sum(len(batch.ids) for batch in self.batches if batch.done)
+
+
+class _InventoryPlanner:
+    def __init__(
+            self, client: AsyncProxy6, inventory: InventoryIndex | None = None,
+            chunk_size: int = CHUNK_SIZE
+    ) -> None:
+        self.client = client
+        self.inventory = inventory
+        self.chunk_size = chunk_size
+
+    async def refresh(self) -> InventoryIndex:
+        '''Reloads inventory from `get_proxy`, past the `refresh_ahead` cache.
+
+        Returns:
+            InventoryIndex: Inventory.
+        '''
+        resp = await self.client.get_proxy(types.ProxyState.ALL, cached=False)
+        if self.inventory is None:
+            self.inventory = InventoryIndex.from_response(resp)
+        else:
+            self.inventory.update(resp)
+        return self.inventory
+
+    def _chunks(self, ids: list[str]) -> list[list[str]]:
+        return [ids[i:i + self.chunk_size] for i in range(0, len(ids), self.chunk_size)]
+
+
+class SetTypePlanner(_InventoryPlanner):
+    '''Converts proxy protocols with the fewest `settype` calls.
+
+    `settype` fails with error 30 when every passed proxy already has the
+    target type, so desired types are diffed against the inventory first:
+    no-ops are dropped, the rest is grouped by target type and chunked,
+    and chunks are sent concurrently. Successful chunks update the
+    inventory. Proxies missing from the inventory are looked up once with
+    `get_proxy` and skipped if still unknown.
+    '''
+
+    def diff(self, desired: Mapping[str, types.ProxyType]) -> SetTypePlan:
+        '''Plans `settype` calls against the current inventory without requests.
+
+        Args:
+            desired (Mapping[str, types.ProxyType]): Target type by proxy ID.
+
+        Returns:
+            SetTypePlan: Plan.
+        '''
+        inventory = self.inventory or InventoryIndex()
+        plan = SetTypePlan()
+        groups: dict[types.ProxyType, list[str]] = {}
+        for id, type in desired.items():
+            proxy = inventory.get(id)
+            if proxy is None:
+                plan.unknown.append(id)
+            elif proxy.type == type:
+                plan.unchanged.append(id)
+            else:
+                groups.setdefault(type, []).append(id)
+        for type, ids in groups.items():
+            for chunk in self._chunks(ids):
+                plan.batches.append(SetTypeBatch(type=type, ids=chunk))
+        return plan
+
+    async def plan(self, desired: Mapping[str, types.ProxyType]) -> SetTypePlan:
+        '''Plans `settype` calls, loading inventory if it is missing or stale.
+
+        Args:
+            desired (Mapping[str, types.ProxyType]): Target type by proxy ID.
+
+        Returns:
+            SetTypePlan: Plan.
+        '''
+        if self.inventory is None or any(id not in self.inventory for id in desired):
+            await self.refresh()
+        return self.diff(desired)
+
+    async def apply(self, plan: SetTypePlan) -> SetTypePlan:
+        '''Sends planned chunks concurrently.
+
+        Args:
+            plan (SetTypePlan): Plan from `plan`.
+
+        Returns:
+            SetTypePlan: The same plan with `done` and `error` filled.
+        '''
+        await asyncio.gather(*(
+            self._execute(batch) for batch in plan.batches if not batch.done
+        ))
+        return plan
+
+    async def convert(
+            self, desired: Mapping[str, types.ProxyType] | Iterable[str],
+            type: types.ProxyType | None = None
+    ) -> SetTypePlan:
+        '''Plans and applies protocol changes.
+
+        Args:
+            desired (Mapping[str, types.ProxyType] | Iterable[str]): Target type by proxy ID, or IDs when `type` is given.
+            type (types.ProxyType | None, optional): Target type for all IDs. Defaults to None.
+
+        Returns:
+            SetTypePlan: Executed plan.
+        '''
+        if type is not None:
+            desired = dict.fromkeys(desired, type)
+        return await self.apply(await self.plan(desired))
+
+    async def _execute(self, batch: SetTypeBatch) -> None:
+        try:
+            await self.client.set_type(batch.ids, batch.type)
+        except Exception as e:
+            batch.error = repr(e)
+            log.warning(f'settype {batch.type.value} for {len(batch.ids)} proxies failed: {e!r}')
+            return
+        batch.done = True
+        for id in batch.ids:
+            self.inventory.patch(id, type=batch.type)
+
+
+class SelectorAction(Enum):
+    DELETE = 'delete'
+    SET_DESCR = 'set_descr'
+
+
+class SelectorCall(BaseModel):
+    descr: str | None = Field(None, description='Селектор по комментарию (descr для delete, old для setdescr)')
+    ids: list[str] = Field([], description='Номера прокси, если селектор не используется')
+    done: bool = Field(False, description='Запрос выполнен')
+    error: str | None = Field(None, description='Ошибка выполнения')
+
+
+class SelectorPlan(BaseModel):
+    action: SelectorAction = Field(..., description='Операция')
+    new: str | None = Field(None, description='Новый комментарий для set_descr')
+    calls: list[SelectorCall] = Field([], description='Запросы')
+    covered: dict[str, list[str]] = Field({}, description='Номера прокси, затронутые селектором, по descr')
+    unchanged: list[str] = Field([], description='Прокси, уже имеющие нужный комментарий')
+    unknown: list[str] = Field([], description='Прокси, отсутствующие в списке')
+
+    @property
+    def requests(self) -> int:
+        return len(self.calls)
+
+
+class SelectorPlanner(_InventoryPlanner):
+    '''Targets bulk `delete` and `setdescr` by descr where it is exact.
+
+    Target IDs are grouped by their descr. A group that is the whole descr
+    group of the inventory is sent as one selector call (`descr` for
+    delete, `old` for setdescr), other IDs go in chunked ID lists. A
+    selector acts on the server's view of the group, so with `verify`
+    every candidate group is re-read with `get_proxy(descr=...)` and used
+    only if it still matches; a selector is then chosen only when those
+    two requests beat the ID chunks it replaces.
+    '''
+
+    def __init__(
+            self, client: AsyncProxy6, inventory: InventoryIndex | None = None,
+            chunk_size: int = CHUNK_SIZE, verify: bool = True
+    ) -> None:
+        super().__init__(client, inventory, chunk_size)
+        self.verify = verify
+
+    def diff(
+            self, ids: Iterable[str], action: SelectorAction, new: str | None = None
+    ) -> SelectorPlan:
+        '''Plans calls against the current inventory without requests.
+
+        Args:
+            ids (Iterable[str]): Target proxy IDs.
+            action (SelectorAction): Operation.
+            new (str | None, optional): New descr for set_descr. Defaults to None.
+
+        Returns:
+            SelectorPlan: Plan.
+        '''
+        inventory = self.inventory or InventoryIndex()
+        plan = SelectorPlan(action=action, new=new)
+        groups: dict[str | None, list[str]] = {}
+        for id in dict.fromkeys(ids):
+            proxy = inventory.get(id)
+            if proxy is None:
+                plan.unknown.append(id)
+            elif action == SelectorAction.SET_DESCR and (proxy.descr or None) == (new or None):
+                plan.unchanged.append(id)
+            else:
+                groups.setdefault(proxy.descr or None, []).append(id)
+        rest: list[str] = []
+        selector_cost = 2 if self.verify else 1
+        for descr, group in groups.items():
+            chunks = -(-len(group) // self.chunk_size)
+            if (
+                descr is not None and len(group) == len(inventory.with_descr(descr))
+                and (selector_cost < chunks or (selector_cost == chunks and not self.verify))
+            ):
+                plan.calls.append(SelectorCall(descr=descr))
+                plan.covered[descr] = group
+            else:
+                rest.extend(group)
+        plan.calls.extend(SelectorCall(ids=chunk) for chunk in self._chunks(rest))
+        return plan
+
+    async def plan(
+            self, ids: Iterable[str], action: SelectorAction, new: str | None = None
+    ) -> SelectorPlan:
+        '''Plans calls, loading inventory if needed and verifying selectors.
+
+        Args:
+            ids (Iterable[str]): Target proxy IDs.
+            action (SelectorAction): Operation.
+            new (str | None, optional): New descr for set_descr. Defaults to None.
+
+        Returns:
+            SelectorPlan: Plan.
+        '''
+        ids = list(ids)
+        if action == SelectorAction.SET_DESCR and not new:
+            raise ValueError('Для set_descr нужен аргумент "new".')
+        if self.inventory is None or any(id not in self.inventory for id in ids):
+            await self.refresh()
+        plan = self.diff(ids, action, new)
+        if not self.verify or not plan.covered:
+            return plan
+        descrs = list(plan.covered)
+        responses = await asyncio.gather(*(
+            self.client.get_proxy(types.ProxyState.ALL, descr, cached=False) for descr in descrs
+        ))
+        fallback: list[str] = []
+        for descr, resp in zip(descrs, responses):
+            if set(resp.list) != set(plan.covered[descr]):
+                log.info(f'descr group "{descr}" changed on the server, falling back to IDs')
+                fallback.extend(plan.covered.pop(descr))
+        if fallback:
+            # Fallback IDs are merged into the ID chunks, so no call is sent undersized.
+            rest = [id for call in plan.calls if call.descr is None for id in call.ids] + fallback
+            plan.calls = [call for call in plan.calls if call.descr in plan.covered]
+            plan.calls.extend(SelectorCall(ids=chunk) for chunk in self._chunks(rest))
+        return plan
+
+    async def apply(self, plan: SelectorPlan) -> SelectorPlan:
+        '''Sends planned calls concurrently and updates inventory.
+
+        Args:
+            plan (SelectorPlan): Plan from `plan`.
+
+        Returns:
+            SelectorPlan: The same plan with `done` and `error` filled.
+        '''
+        await asyncio.gather(*(
+            self._execute(plan, call) for call in plan.calls if not call.done
+        ))
+        return plan
+
+    async def delete(self, ids: Iterable[str]) -> SelectorPlan:
+        '''Deletes proxies with the fewest requests.
+
+        Args:
+            ids (Iterable[str]): Proxy IDs.
+
+        Returns:
+            SelectorPlan: Executed plan.
+        '''
+        return await self.apply(await self.plan(ids, SelectorAction.DELETE))
+
+    async def set_descr(self, ids: Iterable[str], new: str) -> SelectorPlan:
+        '''Relabels proxies with the fewest requests.
+
+        Args:
+            ids (Iterable[str]): Proxy IDs.
+            new (str): New descr.
+
+        Returns:
+            SelectorPlan: Executed plan.
+        '''
+        return await self.apply(await self.plan(ids, SelectorAction.SET_DESCR, new))
+
+    async def _execute(self, plan: SelectorPlan, call: SelectorCall) -> None:
+        ids = plan.covered[call.descr] if call.descr is not None else call.ids
+        try:
+            if plan.action == SelectorAction.DELETE:
+                if call.descr is not None:
+                    await self.client.delete(descr=call.descr)
+                else:
+                    await self.client.delete(call.ids)
+            elif call.descr is not None:
+                await self.client.set_descr(plan.new, old=call.descr)
+            else:
+                await self.client.set_descr(plan.new, ids=call.ids)
+        except Exception as e:
+            call.error = repr(e)
+            log.warning(f'{plan.action.value} for {len(ids)} proxies failed: {e!r}')
+            return
+        call.done = True
+        for id in ids:
+            if plan.action == SelectorAction.DELETE:
+                self.inventory.remove(id)
+            else:
+                self.inventory.patch(id, descr=plan.new)
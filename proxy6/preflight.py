@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Pre-flight validation.
+#  Created by LulzLoL231 at 19/10/26
+#
+import logging
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from . import errors
+from .account import AccountState
+
+
+log = logging.getLogger('proxy6')
+
+
+class PreflightValidator:
+    '''Rejects API calls that are certain to fail before they are sent.
+
+    Only the checks that can't give a false positive are made: parameter
+    formats, countries from a cached `getcountry` answer and the last known
+    balance against the price of a smaller-or-equal order seen in `getprice`.
+    '''
+    DESCR_MAX_LENGTH = 50
+    CACHE_TTL = 3600
+    PROXY_TYPES = frozenset({'http', 'socks'})
+    PERIOD_METHODS = frozenset({'getprice', 'buy', 'prolong'})
+    COUNT_METHODS = frozenset({'getprice', 'buy'})
+    COUNTRY_METHODS = frozenset({'getcount', 'buy'})
+    IDS_METHODS = frozenset({'settype', 'setdescr', 'prolong', 'delete', 'check'})
+
+    def __init__(self, account: AccountState | None = None, cache_ttl: float = CACHE_TTL) -> None:
+        self.account = account
+        self.cache_ttl = cache_ttl
+        self.saved = 0
+        self.saved_by_method: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._countries: dict[int, tuple[float, frozenset[str]]] = {}
+        self._prices: dict[tuple[int, int, int], tuple[float, Decimal]] = {}
+
+    def validate(self, method: str, params: dict | None = None) -> None:
+        '''Checks API call locally.
+
+        Args:
+            method (str): API method.
+            params (dict | None, optional): API params. Defaults to None.
+
+        Raises:
+            errors.CountAPIError: Count is not a positive number.
+            errors.PeriodAPIError: Period is not a positive number.
+            errors.CountryAPIError: Country is not in ISO2 format or not available.
+            errors.IDsAPIError: Malformed proxy IDs.
+            errors.DescrAPIError: Descr is longer than 50 characters.
+            errors.TypeAPIError: Unknown proxy type.
+            errors.NoMoneyAPIError: Known balance is lower than the order price.
+        '''
+        params = params or {}
+        try:
+            self._check(method, params)
+        except errors.BaseAPIError:
+            with self._lock:
+                self.saved += 1
+                self.saved_by_method[method] += 1
+            raise
+
+    def observe(self, method: str, params: dict | None, resp: dict) -> None:
+        '''Learns countries and prices from successful API response.
+
+        Args:
+            method (str): API method.
+            params (dict | None): API params.
+            resp (dict): API response.
+        '''
+        params = params or {}
+        now = time.monotonic()
+        match method:
+            case 'getcountry':
+                version = self._int(params.get('version'))
+                if version is not None and isinstance(resp.get('list'), list):
+                    with self._lock:
+                        self._countries[version] = (
+                            now, frozenset(c.lower() for c in resp['list'])
+                        )
+            case 'getprice':
+                key = tuple(self._int(params.get(p)) for p in ('version', 'period', 'count'))
+                if None not in key and 'price' in resp:
+                    with self._lock:
+                        self._prices[key] = (now, Decimal(str(resp['price'])))
+
+    def stats(self) -> dict:
+        '''Returns counters of rejected calls.
+
+        Returns:
+            dict: Total saved requests and saved requests per method.
+        '''
+        with self._lock:
+            return {'saved': self.saved, 'by_method': dict(self.saved_by_method)}
+
+    def _check(self, method: str, params: dict) -> None:
+        if method in self.COUNT_METHODS:
+            count = self._int(params.get('count'))
+            if count is None or count <= 0:
+                self._fail(errors.CountAPIError, 200, f'Неверно указано кол-во прокси: {params.get("count")!r}')
+        if method in self.PERIOD_METHODS:
+            period = self._int(params.get('period'))
+            if period is None or period <= 0:
+                self._fail(errors.PeriodAPIError, 210, f'Неверно указан период: {params.get("period")!r}')
+        if method in self.COUNTRY_METHODS:
+            country = str(params.get('country', ''))
+            if len(country) != 2 or not country.isalpha():
+                self._fail(errors.CountryAPIError, 220, f'Страна должна быть указана в формате iso2: {country!r}')
+            if method == 'buy':
+                available = self._cached_countries(self._int(params.get('version')))
+                if available is not None and country.lower() not in available:
+                    self._fail(errors.CountryAPIError, 220, f'Страна {country!r} недоступна для покупки')
+        if method in self.IDS_METHODS and 'ids' in params:
+            ids = str(params['ids']).split(',')
+            if not all(i.isdigit() for i in ids):
+                self._fail(errors.IDsAPIError, 230, f'Неверный формат номеров прокси: {params["ids"]!r}')
+        if 'descr' in params and method == 'buy' and len(str(params['descr'])) > self.DESCR_MAX_LENGTH:
+            self._fail(errors.DescrAPIError, 250, 'Технический комментарий длиннее 50 символов')
+        if method == 'setdescr' and not 0 < len(str(params.get('new', ''))) <= self.DESCR_MAX_LENGTH:
+            self._fail(errors.DescrAPIError, 250, 'Технический комментарий пуст, либо длиннее 50 символов')
+        if method in ('settype', 'buy') and params.get('type') not in self.PROXY_TYPES:
+            self._fail(errors.TypeAPIError, 260, f'Неверный тип прокси: {params.get("type")!r}')
+        if method == 'buy':
+            self._check_balance(params)
+
+    def _check_balance(self, params: dict) -> None:
+        balance = self.account.balance if self.account else None
+        if balance is None:
+            return
+        version = self._int(params.get('version'))
+        period = self._int(params.get('period'))
+        count = self._int(params.get('count'))
+        now = time.monotonic()
+        with self._lock:
+            # Order price never decreases with count or period, so any cached
+            # smaller-or-equal order is a safe lower bound.
+            lower_bound = max(
+                (
+                    price for (v, p, c), (ts, price) in self._prices.items()
+                    if v == version and p <= period and c <= count and now - ts <= self.cache_ttl
+                ),
+                default=None
+            )
+        if lower_bound is not None and balance < lower_bound:
+            self._fail(
+                errors.NoMoneyAPIError, 400,
+                f'Недостаточно средств: баланс {balance}, стоимость не меньше {lower_bound}'
+            )
+
+    def _cached_countries(self, version: int | None) -> frozenset[str] | None:
+        with self._lock:
+            cached = self._countries.get(version)
+        if cached is None or time.monotonic() - cached[0] > self.cache_ttl:
+            return None
+        return cached[1]
+
+    @staticmethod
+    def _int(value) -> int | None:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _fail(error: type[errors.BaseAPIError], error_id: int, message: str) -> None:
+        log.debug(f'Pre-flight rejected call: {message}')
+        raise error(
+            {'status': 'no', 'error_id': error_id, 'error': message, 'preflight': True},
+            message
+        )
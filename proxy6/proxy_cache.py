@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: getproxy parse cache.
+#  Created by LulzLoL231 at 19/10/26
+#
+import threading
+from collections import OrderedDict
+from typing import Hashable
+
+from . import types
+
+
+class _CachedList:
+    __slots__ = ('entries', 'proxies')
+
+    def __init__(self, entries: dict[str, dict], proxies: dict[str, types.ProxyInfo]) -> None:
+        self.entries = entries
+        self.proxies = proxies
+
+
+class ProxyListCache:
+    '''Reuses `ProxyInfo` models between `getproxy` responses.
+
+    Every raw entry of the `list` section is compared with the one its
+    cached model was built from. When the whole section is unchanged the
+    previous models are reused and only the top-level account fields are
+    validated; otherwise only new or changed entries are validated again.
+    Lists of the `max_keys` most recently used request keys are kept.
+    Each response gets its own `list` dict, but the models in it are
+    shared between responses, so they must not be modified in place.
+    '''
+    MAX_KEYS = 64
+
+    def __init__(self, max_keys: int = MAX_KEYS) -> None:
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._lists: OrderedDict[Hashable, _CachedList] = OrderedDict()
+        self.hits = 0
+        self.parsed = 0
+
+    def build(self, resp: dict, key: Hashable = None) -> types.GetProxyResponse:
+        '''Makes `GetProxyResponse` from raw response.
+
+        Args:
+            resp (dict): Raw `getproxy` response.
+            key (Hashable, optional): Request key, e.g. (state, descr). Defaults to None.
+
+        Returns:
+            types.GetProxyResponse: Parsed response.
+        '''
+        raw_list = resp.get('list') or {}
+        if isinstance(raw_list, list):
+            raw_list = {str(entry.get('id')): entry for entry in raw_list}
+        with self._lock:
+            cached = self._lists.get(key)
+            if cached is not None:
+                self._lists.move_to_end(key)
+        if cached is not None and cached.entries == raw_list:
+            proxies = cached.proxies
+            with self._lock:
+                self.hits += 1
+        else:
+            proxies = {}
+            parsed = 0
+            for id, entry in raw_list.items():
+                if cached is not None and cached.entries.get(id) == entry:
+                    proxies[id] = cached.proxies[id]
+                else:
+                    proxies[id] = types.ProxyInfo.model_validate(entry)
+                    parsed += 1
+            with self._lock:
+                self._lists[key] = _CachedList(raw_list, proxies)
+                self._lists.move_to_end(key)
+                while len(self._lists) > self.max_keys:
+                    self._lists.popitem(last=False)
+                self.parsed += parsed
+        header = types.GetProxyResponse.model_validate({**resp, 'list': {}})
+        return header.model_copy(update={'list': dict(proxies)})
+
+    def clear(self) -> None:
+        '''Drops all cached models.
+        '''
+        with self._lock:
+            self._lists.clear()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Refresh-ahead cache of read responses.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable
+
+
+log = logging.getLogger('proxy6')
+
+CacheKey = tuple[str, tuple]
+
+
+class _Entry:
+    __slots__ = ('value', 'expires', 'refresh_at', 'hits', 'task')
+
+    def __init__(self, value: dict, ttl: float, ahead: float) -> None:
+        now = time.monotonic()
+        self.value = value
+        self.expires = now + ttl
+        self.refresh_at = now + ttl * (1 - ahead)
+        self.hits = 0
+        self.task: asyncio.Task | None = None
+
+
+class RefreshAheadCache:
+    '''Caches read responses and re-fetches hot ones before they expire.
+
+    A response is served for its method TTL. When a key that got at least
+    `min_hits` hits since it was fetched is read within the last `ahead`
+    fraction of its TTL, it is re-fetched in background at
+    `RequestPriority.BACKGROUND`, so callers keep getting a cached answer
+    and never wait for the API or the rate limiter. Only the
+    `max_prefetch_keys` hottest keys are refreshed ahead, and at most
+    `max_prefetch_rate` background requests are made per minute. Misses
+    for the same key share one request. Every write attempt drops the
+    responses it may change, also when it failed, since the API may have
+    applied it anyway.
+
+    The cache is opt-in. Code that plans writes from a `get_proxy` answer
+    (planners, `CapacityReconciler`, write pipelines, `IdempotentBuyer`,
+    `InventoryWatcher`) reads with `cached=False`, so it never acts on a
+    list another process already changed.
+    '''
+    TTLS = {'getproxy': 60.0, 'getcountry': 3600.0, 'getcount': 60.0}
+    INVALIDATES = {
+        'buy': ('getproxy', 'getcount'),
+        'prolong': ('getproxy',),
+        'delete': ('getproxy',),
+        'settype': ('getproxy',),
+        'setdescr': ('getproxy',),
+    }
+
+    def __init__(
+            self, ttls: dict[str, float] | None = None, ahead: float = 0.2,
+            min_hits: int = 2, max_keys: int = 256, max_prefetch_keys: int = 32,
+            max_prefetch_rate: int = 30
+    ) -> None:
+        self.ttls = dict(self.TTLS if ttls is None else ttls)
+        self.ahead = ahead
+        self.min_hits = min_hits
+        self.max_keys = max_keys
+        self.max_prefetch_keys = max_prefetch_keys
+        self.max_prefetch_rate = max_prefetch_rate
+        self.hits = 0
+        self.misses = 0
+        self.prefetches = 0
+        self.prefetch_skipped = 0
+        self._entries: OrderedDict[CacheKey, _Entry] = OrderedDict()
+        self._inflight: dict[CacheKey, asyncio.Future] = {}
+        self._prefetched: deque[float] = deque()
+        self._generations: dict[str, int] = {}
+
+    def caches(self, method: str) -> bool:
+        return method in self.ttls
+
+    async def get(
+            self, method: str, params: dict | None,
+            fetch: Callable[[], Awaitable[dict]], refresh: Callable[[], Awaitable[dict]]
+    ) -> dict:
+        '''Returns cached response, fetching it on a miss.
+
+        Args:
+            method (str): API method.
+            params (dict | None): API params.
+            fetch (Callable[[], Awaitable[dict]]): Foreground request.
+            refresh (Callable[[], Awaitable[dict]]): Background request.
+
+        Returns:
+            dict: API response.
+        '''
+        key = method, tuple(sorted((params or {}).items()))
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now < entry.expires:
+            self.hits += 1
+            entry.hits += 1
+            self._entries.move_to_end(key)
+            if now >= entry.refresh_at and entry.task is None:
+                self._prefetch(key, entry, refresh)
+            return entry.value
+        waiting = self._inflight.get(key)
+        if waiting is not None:
+            # A failed background refresh resolves to None, then fetch here.
+            value = await asyncio.shield(waiting)
+            if value is not None:
+                self.hits += 1
+                return value
+        self.misses += 1
+        generation = self._generations.get(method, 0)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting.
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelled: waiters fetch on their own.
+            future.set_result(None)
+            raise
+        else:
+            # A write finished meanwhile, the response may predate it.
+            if self._generations.get(method, 0) == generation:
+                self._store(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def invalidate(self, method: str) -> None:
+        '''Drops responses changed by a write.
+
+        Args:
+            method (str): Written API method.
+        '''
+        methods = self.INVALIDATES.get(method, ())
+        for name in methods:
+            self._generations[name] = self._generations.get(name, 0) + 1
+        if methods:
+            for key in [key for key in self._entries if key[0] in methods]:
+                self._drop(key)
+
+    def clear(self) -> None:
+        for key in list(self._entries):
+            self._drop(key)
+
+    def _store(self, key: CacheKey, value: dict) -> None:
+        previous = self._entries.get(key)
+        entry = _Entry(value, self.ttls[key[0]], self.ahead)
+        if previous is not None:
+            self._entries.move_to_end(key)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_keys:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.task is not None:
+            entry.task.cancel()
+
+    def _prefetch(self, key: CacheKey, entry: _Entry, refresh: Callable[[], Awaitable[dict]]) -> None:
+        if entry.hits < self.min_hits:
+            return
+        hotter = sum(1 for other in self._entries.values() if other.hits > entry.hits)
+        now = time.monotonic()
+        while self._prefetched and self._prefetched[0] <= now - 60:
+            self._prefetched.popleft()
+        if hotter >= self.max_prefetch_keys or len(self._prefetched) >= self.max_prefetch_rate:
+            self.prefetch_skipped += 1
+            # Not retried before expiry, the next miss fetches it.
+            entry.refresh_at = entry.expires
+            return
+        self._prefetched.append(now)
+        self.prefetches += 1
+        entry.task = asyncio.ensure_future(self._refresh(key, entry, refresh))
+
+    async def _refresh(self, key: CacheKey, entry: _Entry, refresh: Callable[[], Awaitable[dict]]) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight.setdefault(key, future)
+        value = None
+        try:
+            value = await refresh()
+        except Exception as e:
+            log.debug(f'Refresh-ahead of {key[0]} failed: {e!r}')
+            entry.refresh_at = entry.expires
+        finally:
+            entry.task = None
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            # Dropped entries were invalidated by a write, their refresh may be stale.
+            if value is not None and self._entries.get(key) is entry:
+                self._store(key, value)
+            else:
+                value = None
+            future.set_result(value)
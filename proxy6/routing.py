@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Per-target latency routing.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import logging
+import math
+import time
+from array import array
+from typing import Iterable
+
+from pydantic import BaseModel, Field
+
+from . import types
+from .async_.api import AsyncProxy6
+from .handshake import GatewayError, http_handshake, socks_handshake
+
+
+log = logging.getLogger('proxy6')
+
+DEFAULT_PORT = 443
+
+
+class RouteStats(BaseModel):
+    proxy_id: str = Field(..., description='Номер прокси')
+    target: str = Field(..., description='Цель в формате host:port')
+    latency: float | None = Field(None, description='Сглаженное время установки туннеля (с), ошибки считаются как timeout')
+    success_rate: float | None = Field(None, description='Сглаженная доля успешных замеров')
+    samples: int = Field(0, description='Кол-во замеров')
+
+
+async def measure_route(
+        proxy: types.ProxyInfo, host: str | None = None, port: int = DEFAULT_PORT,
+        timeout: float = 10.0
+) -> float | None:
+    '''Times a connection to proxy, and a tunnel to `host:port` through it if given.
+
+    Args:
+        proxy (types.ProxyInfo): Proxy.
+        host (str | None, optional): Target host. Defaults to None.
+        port (int, optional): Target port. Defaults to 443.
+        timeout (float, optional): Timeout in seconds. Defaults to 10.0.
+
+    Returns:
+        float | None: Seconds until the tunnel was established, or None on failure.
+    '''
+    writer = None
+    started = time.monotonic()
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(proxy.host, proxy.port), timeout
+        )
+        if host is not None:
+            handshake = http_handshake if proxy.type == types.ProxyType.HTTPS else socks_handshake
+            left = max(timeout - (time.monotonic() - started), 0)
+            await asyncio.wait_for(handshake(reader, writer, proxy, host, port), left)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, GatewayError) as e:
+        log.debug(f'Route {proxy.host}:{proxy.port} -> {host}:{port} failed: {e!r}')
+        return None
+    finally:
+        if writer is not None:
+            writer.close()
+    return time.monotonic() - started
+
+
+def _target(target: str | tuple[str, int]) -> tuple[str, int]:
+    if isinstance(target, tuple):
+        return target
+    host, sep, port = target.rpartition(':')
+    if sep and port.isdigit() and (']' in host or ':' not in host):
+        return host.strip('[]'), int(port)
+    return target.strip('[]'), DEFAULT_PORT
+
+
+class RoutingTable:
+    '''Proxy × target latency matrix with precomputed best proxies.
+
+    Every round measures the time to open a tunnel through each proxy to
+    each target, with at most `concurrency` probes at once. Results are
+    smoothed with an EWMA (a failed probe counts as `timeout`) and kept in
+    flat `array('d')` rows, one row per proxy. After each round the `top_k`
+    fastest proxies of every target are cached, so `best` is a dict lookup
+    and a slice. Probes are made from this machine and cost no API
+    requests; with `client`, the proxy list is reloaded each round.
+    '''
+    TOP_K = 10
+    ALPHA = 0.3
+    INTERVAL = 300.0
+
+    def __init__(
+            self, targets: Iterable[str | tuple[str, int]],
+            proxies: Iterable[types.ProxyInfo] = (), client: AsyncProxy6 | None = None,
+            top_k: int = TOP_K, alpha: float = ALPHA, timeout: float = 10.0,
+            concurrency: int = 50, interval: float = INTERVAL,
+            state: types.ProxyState = types.ProxyState.ACTIVE, descr: str | None = None
+    ) -> None:
+        self.targets = list(dict.fromkeys(_target(target) for target in targets))
+        if not self.targets:
+            raise ValueError('Не указаны цели "targets".')
+        self.client = client
+        self.top_k = top_k
+        self.alpha = alpha
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.interval = interval
+        self.state = state
+        self.descr = descr
+        self._target_index = {target: i for i, target in enumerate(self.targets)}
+        self._host_index = {}
+        for i, (host, _) in enumerate(self.targets):
+            self._host_index.setdefault(host, i)
+        self.proxies: list[types.ProxyInfo] = []
+        self._proxy_index: dict[str, int] = {}
+        self._latency = array('d')
+        self._success = array('d')
+        self._samples = array('L')
+        self._best: list[tuple[types.ProxyInfo, ...]] = [() for _ in self.targets]
+        self.rounds = 0
+        self._task: asyncio.Task | None = None
+        self._stopped = asyncio.Event()
+        self.update(proxies)
+
+    def update(self, proxies: Iterable[types.ProxyInfo]) -> None:
+        '''Replaces measured proxies, keeping measurements of those that stay.
+
+        Args:
+            proxies (Iterable[types.ProxyInfo]): Proxies.
+        '''
+        width = len(self.targets)
+        latency, success, samples = array('d'), array('d'), array('L')
+        new = list({proxy.id: proxy for proxy in proxies}.values())
+        for proxy in new:
+            row = self._proxy_index.get(proxy.id)
+            if row is None:
+                latency.extend([math.nan] * width)
+                success.extend([math.nan] * width)
+                samples.extend([0] * width)
+            else:
+                start = row * width
+                latency.extend(self._latency[start:start + width])
+                success.extend(self._success[start:start + width])
+                samples.extend(self._samples[start:start + width])
+        self.proxies = new
+        self._proxy_index = {proxy.id: i for i, proxy in enumerate(new)}
+        self._latency, self._success, self._samples = latency, success, samples
+        self._rank()
+
+    def record(self, proxy_id: str, target: str | tuple[str, int], latency: float | None) -> None:
+        '''Adds one measurement without re-ranking.
+
+        Args:
+            proxy_id (str): Proxy ID.
+            target (str | tuple[str, int]): Target.
+            latency (float | None): Tunnel time in seconds, None for failure.
+        '''
+        cell = self._proxy_index[proxy_id] * len(self.targets) + self._target_index[_target(target)]
+        ok = latency is not None
+        value = latency if ok else self.timeout
+        if self._samples[cell] == 0:
+            self._latency[cell] = value
+            self._success[cell] = float(ok)
+        else:
+            self._latency[cell] += self.alpha * (value - self._latency[cell])
+            self._success[cell] += self.alpha * (float(ok) - self._success[cell])
+        self._samples[cell] += 1
+
+    async def measure(self) -> None:
+        '''Runs one measurement round and re-ranks proxies.
+        '''
+        if self.client is not None:
+            resp = await self.client.get_proxy(self.state, self.descr)
+            self.update(resp.list.values())
+        pairs = iter([(proxy, target) for proxy in self.proxies for target in self.targets])
+
+        async def worker() -> None:
+            for proxy, (host, port) in pairs:
+                latency = await measure_route(proxy, host, port, self.timeout)
+                if proxy.id in self._proxy_index:
+                    self.record(proxy.id, (host, port), latency)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        self.rounds += 1
+        self._rank()
+
+    def best(self, target: str | tuple[str, int], k: int | None = None) -> tuple[types.ProxyInfo, ...]:
+        '''Returns fastest proxies for target, fastest first.
+
+        Args:
+            target (str | tuple[str, int]): Host, `host:port` or (host, port).
+            k (int | None, optional): Number of proxies, at most `top_k`. Defaults to `top_k`.
+
+        Returns:
+            tuple[types.ProxyInfo, ...]: Proxies with at least one successful probe.
+        '''
+        if isinstance(target, str) and target in self._host_index:
+            index = self._host_index[target]
+        else:
+            index = self._target_index.get(_target(target))
+            if index is None:
+                raise KeyError(f'Unknown target {target!r}')
+        best = self._best[index]
+        return best if k is None else best[:k]
+
+    def stats(self, proxy_id: str, target: str | tuple[str, int]) -> RouteStats:
+        '''Returns measurements of one proxy for one target.
+
+        Args:
+            proxy_id (str): Proxy ID.
+            target (str | tuple[str, int]): Target.
+
+        Returns:
+            RouteStats: Stats.
+        '''
+        host, port = _target(target)
+        cell = self._proxy_index[proxy_id] * len(self.targets) + self._target_index[(host, port)]
+        samples = self._samples[cell]
+        return RouteStats(
+            proxy_id=proxy_id, target=f'{host}:{port}', samples=samples,
+            latency=self._latency[cell] if samples else None,
+            success_rate=self._success[cell] if samples else None
+        )
+
+    def start(self) -> asyncio.Task:
+        '''Starts measuring in background task.
+
+        Returns:
+            asyncio.Task: Measure task.
+        '''
+        if self._task is None or self._task.done():
+            self._stopped.clear()
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        '''Stops background measuring.
+        '''
+        self._stopped.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def run(self) -> None:
+        '''Measures every `interval` seconds until `stop` is called.
+        '''
+        while not self._stopped.is_set():
+            try:
+                await self.measure()
+            except Exception:
+                log.exception('Routing table measure failed')
+            try:
+                await asyncio.wait_for(self._stopped.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _rank(self) -> None:
+        width = len(self.targets)
+        for t in range(width):
+            ranked = []
+            for row, proxy in enumerate(self.proxies):
+                cell = row * width + t
+                if self._samples[cell] and self._success[cell] > 0:
+                    ranked.append((self._latency[cell], row))
+            ranked.sort()
+            self._best[t] = tuple(self.proxies[row] for _, row in ranked[:self.top_k])
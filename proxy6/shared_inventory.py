@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Shared memory inventory for pre-fork workers.
+#  Created by LulzLoL231 at 19/10/26
+#
+# File layout, native byte order (checked by the reader):
+#   header   MAGIC, byte order, version, published (ns), rows, column count
+#   columns  (name, typecode, offset, length) per column
+#   data     8-byte aligned columns: fixed-width arrays, and text columns
+#            as `rows + 1` uint32 offsets followed by UTF-8 bytes.
+# Rows are sorted by ID, so lookups by ID are a binary search.
+import asyncio
+import bisect
+import contextlib
+import ipaddress
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Iterable, Iterator
+
+from . import types
+from .async_.api import AsyncProxy6
+
+
+log = logging.getLogger('proxy6')
+
+MAGIC = b'P6INV001'
+_HEADER = struct.Struct('<8sBQQII')
+_COLUMN = struct.Struct('<16s2sQQ')
+_TEXT = '0'
+_ORDERS = {'little': 0, 'big': 1}
+
+# Text columns, then fixed-width ones; `null` holds bit 0 for country, bit 1 for descr.
+TEXT_COLUMNS = ('id', 'ip', 'host', 'user', 'passwd', 'country', 'descr')
+FIXED_COLUMNS = (
+    ('port', 'I'), ('version', 'B'), ('type', 'B'), ('active', 'B'), ('null', 'B'),
+    ('date', 'd'), ('date_end', 'd'),
+)
+_TYPES = (types.ProxyType.HTTPS, types.ProxyType.SOCKS5)
+_NULL_COUNTRY = 1
+_NULL_DESCR = 2
+
+
+def _timestamp(value: datetime) -> float:
+    # Dates are stored as the wall-clock time the API returned.
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _datetime(value: float) -> datetime:
+    return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+
+
+def encode(proxies: Iterable[types.ProxyInfo], version: int) -> bytes:
+    '''Serializes proxies into the columnar format.
+
+    Args:
+        proxies (Iterable[types.ProxyInfo]): Proxies.
+        version (int): Inventory version.
+
+    Returns:
+        bytes: Buffer.
+    '''
+    rows = sorted({proxy.id: proxy for proxy in proxies}.values(), key=lambda p: p.id.encode())
+    columns: list[tuple[str, str, bytes]] = []
+    for name in TEXT_COLUMNS:
+        offsets, blob = array('I', [0]), bytearray()
+        for proxy in rows:
+            value = getattr(proxy, name)
+            blob += (str(value) if value is not None else '').encode()
+            offsets.append(len(blob))
+        columns.append((name, _TEXT, offsets.tobytes() + bytes(blob)))
+    for name, code in FIXED_COLUMNS:
+        if name == 'type':
+            values = [_TYPES.index(p.type) for p in rows]
+        elif name == 'null':
+            values = [
+                (_NULL_COUNTRY if p.country is None else 0) | (_NULL_DESCR if p.descr is None else 0)
+                for p in rows
+            ]
+        elif name in ('date', 'date_end'):
+            values = [_timestamp(getattr(p, name)) for p in rows]
+        else:
+            values = [int(getattr(p, name)) for p in rows]
+        columns.append((name, code, array(code, values).tobytes()))
+
+    start = _HEADER.size + _COLUMN.size * len(columns)
+    offset = start + -start % 8
+    directory, data = bytearray(), bytearray(offset - start)
+    for name, code, payload in columns:
+        directory += _COLUMN.pack(name.encode(), code.encode(), offset, len(payload))
+        padding = -len(payload) % 8
+        data += payload + bytes(padding)
+        offset += len(payload) + padding
+    header = _HEADER.pack(MAGIC, _ORDERS[sys.byteorder], version, time.time_ns(), len(rows), len(columns))
+    return header + bytes(directory) + bytes(data)
+
+
+class InventorySnapshot:
+    '''Read-only view of one inventory version.
+
+    Columns are memoryviews over the mapped buffer; a row is decoded only
+    when it is accessed. A snapshot stays valid after newer versions are
+    published.
+    '''
+
+    def __init__(self, buffer: mmap.mmap | bytes) -> None:
+        self._buffer = buffer
+        view = memoryview(buffer)
+        magic, order, self.version, published, self.rows, count = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError('Неизвестный формат файла инвентаря.')
+        if order != _ORDERS[sys.byteorder]:
+            raise ValueError('Файл инвентаря записан с другим порядком байт.')
+        self.published = datetime.fromtimestamp(published / 1e9)
+        self._text: dict[str, tuple[memoryview, memoryview]] = {}
+        self._fixed: dict[str, memoryview] = {}
+        for i in range(count):
+            name, code, offset, length = _COLUMN.unpack_from(view, _HEADER.size + i * _COLUMN.size)
+            name, code = name.rstrip(b'\0').decode(), code.rstrip(b'\0').decode()
+            column = view[offset:offset + length]
+            if code == _TEXT:
+                size = (self.rows + 1) * 4
+                self._text[name] = column[:size].cast('I'), column[size:]
+            else:
+                self._fixed[name] = column.cast(code)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __iter__(self) -> Iterator[types.ProxyInfo]:
+        for index in range(self.rows):
+            yield self[index]
+
+    def __getitem__(self, index: int) -> types.ProxyInfo:
+        '''Decodes one row.
+        '''
+        if not 0 <= index < self.rows:
+            raise IndexError(index)
+        null = self._fixed['null'][index]
+        return types.ProxyInfo.model_construct(
+            id=self.text(index, 'id'),
+            ip=ipaddress.ip_address(self.text(index, 'ip')),
+            host=self.text(index, 'host'),
+            port=self._fixed['port'][index],
+            user=self.text(index, 'user'),
+            passwd=self.text(index, 'passwd'),
+            version=types.ProxyVersion(self._fixed['version'][index]),
+            type=_TYPES[self._fixed['type'][index]],
+            country=None if null & _NULL_COUNTRY else self.text(index, 'country'),
+            date=_datetime(self._fixed['date'][index]),
+            date_end=_datetime(self._fixed['date_end'][index]),
+            descr=None if null & _NULL_DESCR else self.text(index, 'descr'),
+            active=bool(self._fixed['active'][index])
+        )
+
+    def text(self, index: int, column: str) -> str:
+        '''Decodes one text field.
+
+        Args:
+            index (int): Row.
+            column (str): Text column name.
+
+        Returns:
+            str: Value.
+        '''
+        offsets, blob = self._text[column]
+        return bytes(blob[offsets[index]:offsets[index + 1]]).decode()
+
+    def column(self, name: str) -> memoryview:
+        '''Returns fixed-width column without copying, e.g. `date_end` as POSIX seconds.
+
+        Args:
+            name (str): Column name.
+
+        Returns:
+            memoryview: Column values.
+        '''
+        return self._fixed[name]
+
+    def find(self, id: str) -> int | None:
+        '''Finds row by proxy ID.
+
+        Args:
+            id (str): Proxy ID.
+
+        Returns:
+            int | None: Row, or None if missing.
+        '''
+        offsets, blob = self._text['id']
+        key = id.encode()
+        keys = _TextKeys(offsets, blob, self.rows)
+        index = bisect.bisect_left(keys, key)
+        if index < self.rows and keys[index] == key:
+            return index
+        return None
+
+    def get(self, id: str) -> types.ProxyInfo | None:
+        index = self.find(id)
+        return None if index is None else self[index]
+
+    def ending_before(self, when: datetime) -> list[int]:
+        '''Returns rows with `date_end` before `when`.
+
+        Args:
+            when (datetime): Moment, in API wall-clock time.
+
+        Returns:
+            list[int]: Rows.
+        '''
+        limit = _timestamp(when)
+        return [index for index, value in enumerate(self._fixed['date_end']) if value < limit]
+
+
+class _TextKeys:
+    '''Sequence of raw text values for `bisect`.
+    '''
+    __slots__ = ('offsets', 'blob', 'rows')
+
+    def __init__(self, offsets: memoryview, blob: memoryview, rows: int) -> None:
+        self.offsets = offsets
+        self.blob = blob
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, index: int) -> bytes:
+        return bytes(self.blob[self.offsets[index]:self.offsets[index + 1]])
+
+
+class InventoryReader:
+    '''Maps the inventory published at `path`.
+
+    The publisher swaps files with an atomic rename, so `snapshot` only
+    compares the inode of `path` with the mapped one and maps the new
+    file when it changed. No locks are taken; old snapshots keep their
+    mapping of the replaced file alive.
+    '''
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._inode: tuple[int, int] | None = None
+        self._snapshot: InventorySnapshot | None = None
+
+    def snapshot(self) -> InventorySnapshot:
+        '''Returns the latest published version.
+
+        Raises:
+            FileNotFoundError: Nothing was published yet.
+
+        Returns:
+            InventorySnapshot: Snapshot.
+        '''
+        stat = os.stat(self.path)
+        inode = stat.st_dev, stat.st_ino
+        if inode != self._inode or self._snapshot is None:
+            with open(self.path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._snapshot = InventorySnapshot(buffer)
+            self._inode = stat.st_dev, stat.st_ino
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self.snapshot().version
+
+
+class InventoryPublisher:
+    '''Writes inventory versions for `InventoryReader`.
+
+    Each version is written to a temporary file next to `path` and renamed
+    over it. Use a path on tmpfs, like `/dev/shm`, to keep it in shared
+    memory. The temporary file is only accessible by the owner while it is
+    written and gets `mode` before it is published: owner read-only by
+    default, `0o440` to share it with the readers' group. With `client`,
+    `refresh` and the background loop reload the list with `get_proxy`.
+    '''
+    INTERVAL = 60.0
+    MODE = 0o400
+
+    def __init__(
+            self, path: str, client: AsyncProxy6 | None = None,
+            state: types.ProxyState = types.ProxyState.ALL, descr: str | None = None,
+            interval: float = INTERVAL, mode: int = MODE
+    ) -> None:
+        self.path = path
+        self.mode = mode
+        self.client = client
+        self.state = state
+        self.descr = descr
+        self.interval = interval
+        self.version = 0
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(_HEADER.size)
+            if len(header) == _HEADER.size and header.startswith(MAGIC):
+                self.version = _HEADER.unpack(header)[2]
+        except FileNotFoundError:
+            pass
+        self._task: asyncio.Task | None = None
+        self._stopped = asyncio.Event()
+
+    def publish(self, proxies: Iterable[types.ProxyInfo]) -> int:
+        '''Publishes new version.
+
+        Args:
+            proxies (Iterable[types.ProxyInfo]): Proxies.
+
+        Returns:
+            int: Published version.
+        '''
+        version = self.version + 1
+        data = encode(proxies, version)
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            with open(fd, 'wb') as f:
+                f.write(data)
+                os.fchmod(f.fileno(), self.mode)
+            os.replace(tmp, self.path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp)
+            raise
+        self.version = version
+        return version
+
+    async def refresh(self) -> int:
+        '''Loads the list with `get_proxy` and publishes it.
+
+        Returns:
+            int: Published version.
+        '''
+        if self.client is None:
+            raise ValueError('Для обновления нужен клиент "client".')
+        resp = await self.client.get_proxy(self.state, self.descr)
+        return self.publish(resp.list.values())
+
+    def start(self) -> asyncio.Task:
+        '''Starts publishing in background task.
+
+        Returns:
+            asyncio.Task: Publish task.
+        '''
+        if self._task is None or self._task.done():
+            self._stopped.clear()
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        '''Stops background publishing.
+        '''
+        self._stopped.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def run(self) -> None:
+        '''Publishes every `interval` seconds until `stop` is called.
+        '''
+        while not self._stopped.is_set():
+            try:
+                await self.refresh()
+            except Exception:
+                log.exception('Inventory publish failed')
+            try:
+                await asyncio.wait_for(self._stopped.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
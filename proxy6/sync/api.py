@@ -3,60 +3,438 @@
 #  pyProxy6 API: API.
 #  Created by LulzLoL231 at 02/07/22
 #
+# Annotations are not evaluated, so the response models (pydantic) and the
+# optional subsystems are only imported when used.
+from __future__ import annotations
+
 import logging
-from time import sleep
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Callable, Iterable, TypeVar
 from urllib.parse import urlencode
 
-from httpx import Client
+from httpx import BaseTransport, Client, HTTPTransport, Limits, URL, USE_CLIENT_DEFAULT
 
 from .. import types
 from .. import errors
+from .. import tracing
+from ..hedging import HEDGE_METHODS, LatencyTracker
+
+if TYPE_CHECKING:
+    from ..account import AccountState
 
 
 log = logging.getLogger('proxy6')
+T = TypeVar('T')
+
+
+class RequestDelayer:
+    '''Thread-safe counterpart of the async `RequestDelayer`.
+    '''
+    REQUESTS_SECONDS_INTERVAL = 1
+    MAX_REQUESTS_PER_INTERVAL = 2
+
+    def __init__(self):
+        self.last_requests: list[dict[str, float]] = list()
+        self._cond = threading.Condition()
+
+    def acquire(self, deadline: float | None = None) -> dict[str, float]:
+        '''Waits for a free request slot and takes it.
+
+        Args:
+            deadline (float | None, optional): Latest `time.monotonic()` to wait until. Defaults to None.
+
+        Raises:
+            errors.DeadlineAPIError: No free slot before deadline.
+
+        Returns:
+            dict[str, float]: Request record, must be passed to `release`.
+        '''
+        with self._cond:
+            while True:
+                now = time.time()
+                self.last_requests = [
+                    request for request in self.last_requests
+                    if "finish" not in request or now - request["finish"] <= self.REQUESTS_SECONDS_INTERVAL
+                ]
+                if len(self.last_requests) < self.MAX_REQUESTS_PER_INTERVAL:
+                    break
+                finished = [request["finish"] for request in self.last_requests if "finish" in request]
+                timeout = min(finished) + self.REQUESTS_SECONDS_INTERVAL - now if finished else None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise errors.DeadlineAPIError('Истекло время ожидания очереди запросов.')
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+                self._cond.wait(timeout)
+            request = {"start": now}
+            self.last_requests.append(request)
+            return request
+
+    def release(self, request: dict[str, float]) -> None:
+        with self._cond:
+            request["finish"] = time.time()
+            self._cond.notify_all()
 
 
 class APIConnector:
+    '''Sync API connector. Safe to share between threads: the HTTP
+    connection pool, rate limiter and stats are shared, retry state is
+    kept per call.
+    '''
     ENDPOINT = 'https://proxy6.net/api/{}/{}'
-
-    def __init__(self, apikey: str) -> None:
+    HEDGE_WORKERS = 4
+    MAX_WORKERS = 8
+    RPS_RETRIES = 3
+    RPS_RETRY_DELAY = 1
+    KEEPALIVE_INTERVAL = 30.0
+    KEEPALIVE_EXPIRY = 90.0
+
+    def __init__(
+        self, apikey: str, preflight: bool = False,
+        transport: BaseTransport | None = None, max_workers: int = MAX_WORKERS,
+        reuse_proxy_models: bool = False, warmup: int = 0, hedge_percentile: float = 0.95
+    ) -> None:
         self.apikey = apikey
-        self.__rps_try = 0
+        self.transport = transport
+        self.max_workers = max_workers
+        self.request_delayer = RequestDelayer()
+        self.latency = LatencyTracker(hedge_percentile)
+        self._lock = threading.Lock()
+        self._account: AccountState | None = None
+        self.preflight = None
+        if preflight:
+            from ..preflight import PreflightValidator
+
+            self.preflight = PreflightValidator(self.account)
+        self.proxy_cache = None
+        if reuse_proxy_models:
+            from ..proxy_cache import ProxyListCache
+
+            self.proxy_cache = ProxyListCache()
+        self.tracer = None
+        self.warmup = warmup
+        self.dns_cache = None
+        if warmup:
+            # httpcore is only needed for the DNS cache, keep it out of plain imports.
+            from ..network import DNSCache, install_dns_cache
+
+            self.dns_cache = DNSCache()
+            if transport is None:
+                transport = HTTPTransport(limits=Limits(
+                    max_keepalive_connections=max(warmup, 20),
+                    keepalive_expiry=self.KEEPALIVE_EXPIRY
+                ))
+            if not install_dns_cache(transport, self.dns_cache):
+                log.debug('DNS cache is not supported by the transport')
+        self._client = Client(transport=transport)
+        self._executor: ThreadPoolExecutor | None = None
+        self._worker = threading.local()
+        self._hedge_executor: ThreadPoolExecutor | None = None
+        self._last_used = time.monotonic()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._warmup_ok = not warmup
+        self._warmup_thread: threading.Thread | None = None
+        if warmup:
+            self._warmup_thread = threading.Thread(
+                target=self._warmup, name='proxy6-warmup', daemon=True
+            )
+            self._warmup_thread.start()
+        else:
+            self._ready.set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
-    def make_request(self, method: str, params: dict | None = None) -> dict:
+    @property
+    def account(self) -> AccountState:
+        '''Account state fed by every response, created on first use.
+        '''
+        with self._lock:
+            if self._account is None:
+                from ..account import AccountState
+
+                self._account = AccountState()
+            return self._account
+
+    def ready(self, timeout: float | None = None) -> bool:
+        '''Waits until warm-up is done.
+
+        Args:
+            timeout (float | None, optional): Max seconds to wait. Defaults to None.
+
+        Returns:
+            bool: Warm-up finished and opened at least one connection, always True without warm-up.
+        '''
+        return self._ready.wait(timeout) and self._warmup_ok
+
+    def close(self) -> None:
+        '''Closes connection pool and worker threads.
+        '''
+        self._stopped.set()
+        if self._warmup_thread is not None:
+            self._warmup_thread.join()
+            self._warmup_thread = None
+        for executor in (self._executor, self._hedge_executor):
+            if executor is not None:
+                executor.shutdown(wait=True)
+        self._executor = self._hedge_executor = None
+        self._client.close()
+
+    def make_request(
+        self, method: str, params: dict | None = None,
+        deadline: float | None = None, timeout: float | None = None,
+        hedge: bool = False
+    ) -> dict:
         '''Makes API request.
 
         Args:
             method (str): API method.
             params (dict | None, optional): API params. Defaults to None.
+            deadline (float | None, optional): Latest `time.monotonic()` by which the request must finish. Defaults to None.
+            timeout (float | None, optional): Request timeout in seconds. Defaults to None.
+            hedge (bool, optional): Send a second request if the first one is slower than usual. Only for idempotent reads. Defaults to False.
 
         Raises:
             errors.RPSAPIError: RPS error.
             errors.UnexpectedAPIError: API unexpected error.
+            errors.DeadlineAPIError: Request deadline is exceeded.
+            errors.BaseAPIError: Call rejected by pre-flight validation.
+            ValueError: Hedging requested for non-idempotent method.
 
         Returns:
             dict: API response.
         '''
-        log.debug(f'Called with args: ({method}, {params}); Try #{self.__rps_try}.')
-        sleep(1)  # skip RPS error... Maybe...
+        try:
+            return self._make_request(method, params, deadline, timeout, hedge)
+        finally:
+            # Nothing parses the answer of a raw call, so its trace ends here.
+            tracing.emit_pending()
+
+    def _make_request(
+        self, method: str, params: dict | None = None,
+        deadline: float | None = None, timeout: float | None = None,
+        hedge: bool = False
+    ) -> dict:
+        # API methods call this and leave the trace to `_parse`.
+        if self.preflight:
+            self.preflight.validate(method, params)
+        if hedge:
+            if method not in HEDGE_METHODS:
+                raise ValueError(f'Метод "{method}" не поддерживает дублирующие запросы.')
+            return self._hedged_request(method, params, deadline, timeout)
+        return self._request(method, params, deadline, timeout)
+
+    def map(
+        self, func: Callable[..., T], args: Iterable[Any],
+        return_exceptions: bool = False
+    ) -> list[T | BaseException]:
+        '''Calls `func` for every item of `args` on the internal thread pool.
+
+        Args:
+            func (Callable[..., T]): Function to call, e.g. `self.check`.
+            args (Iterable[Any]): Call arguments; tuples are unpacked.
+            return_exceptions (bool, optional): Return exceptions in place of results instead of raising the first one. Defaults to False.
+
+        Returns:
+            list[T | BaseException]: Results in input order.
+
+        Note:
+            Called from a pool worker, e.g. inside `func` of another `map`,
+            the calls run one by one in that worker: waiting for the pool
+            from its own worker could deadlock once all workers wait.
+        '''
+        if getattr(self._worker, 'active', False):
+            return self._map_inline(func, args, return_exceptions)
+        executor = self._get_executor()
+        futures = [
+            executor.submit(func, *(arg if isinstance(arg, tuple) else (arg,)))
+            for arg in args
+        ]
+        results = []
+        try:
+            for future in futures:
+                if return_exceptions:
+                    exc = future.exception()
+                    results.append(exc if exc is not None else future.result())
+                else:
+                    results.append(future.result())
+        finally:
+            for future in futures:
+                future.cancel()
+        return results
+
+    def _map_inline(
+        self, func: Callable[..., T], args: Iterable[Any],
+        return_exceptions: bool
+    ) -> list[T | BaseException]:
+        results = []
+        for arg in args:
+            try:
+                results.append(func(*(arg if isinstance(arg, tuple) else (arg,))))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.max_workers, thread_name_prefix='proxy6',
+                    initializer=setattr, initargs=(self._worker, 'active', True)
+                )
+            return self._executor
+
+    def _hedged_request(
+        self, method: str, params: dict | None,
+        deadline: float | None, timeout: float | None
+    ) -> dict:
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    self.HEDGE_WORKERS, thread_name_prefix='proxy6-hedge'
+                )
+            executor = self._hedge_executor
+        delay = self.latency.hedge_delay(method)
+        futures = {executor.submit(self._request, method, params, deadline, timeout, False)}
+        try:
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                log.debug(f'Hedging "{method}" after {delay:.3f}s')
+                futures.add(executor.submit(self._request, method, params, deadline, timeout, False))
+            while True:
+                done, pending = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                if not pending:
+                    return done.pop().result()
+                futures = pending
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _request(
+        self, method: str, params: dict | None,
+        deadline: float | None, timeout: float | None,
+        defer_trace: bool = True
+    ) -> dict:
         url = self.ENDPOINT.format(self.apikey, method)
         if params:
             url += f'?{urlencode(params)}'
         log.debug(f'Final URL: {url}')
-        with Client() as sess:
-            resp = sess.get(url)
+        tracer = self.tracer or tracing.get_tracer()
+        if tracer is None:
+            return self._send(method, params, url, deadline, timeout, None)
+        trace = tracing.RequestTrace(tracer, method, queued=False)
+        try:
+            result = self._send(method, params, url, deadline, timeout, trace)
+        except BaseException as e:
+            trace.emit(e)
+            raise
+        if defer_trace:
+            trace.defer()
+        else:
+            trace.emit()
+        return result
+
+    def _send(
+        self, method: str, params: dict | None, url: str,
+        deadline: float | None, timeout: float | None,
+        trace: tracing.RequestTrace | None
+    ) -> dict:
+        for attempt in range(self.RPS_RETRIES + 1):
+            log.debug(f'Called with args: ({method}, {params}); Try #{attempt}.')
+            started = self._last_used = time.monotonic()
+            if trace is not None:
+                # No scheduler queue in the sync client, only the rate limiter.
+                trace.mark('rate_wait')
+            request = self.request_delayer.acquire(deadline)
+            sent = time.monotonic()
+            try:
+                if trace is None:
+                    resp = self._client.get(url, timeout=self._timeout(timeout, deadline))
+                else:
+                    trace.mark('dispatched')
+                    trace.attributes['proxy6.attempt'] = attempt
+                    token = trace.activate()
+                    try:
+                        resp = self._client.get(
+                            url, timeout=self._timeout(timeout, deadline),
+                            extensions={'trace': trace.event}
+                        )
+                    finally:
+                        trace.deactivate(token)
+                    trace.attributes['http.status_code'] = resp.status_code
+            finally:
+                self.request_delayer.release(request)
             if resp.is_success:
+                if trace is not None:
+                    trace.mark('json.started')
                 json_resp = resp.json()
+                if trace is not None:
+                    trace.mark('json.complete')
                 log.debug(f'API Response: {json_resp}')
-                return self.process_api_response(json_resp)
+                result = self.process_api_response(json_resp)
+                self.latency.record(method, time.monotonic() - started)
+                self.account.update(result, sent)
+                if self.preflight:
+                    self.preflight.observe(method, params, result)
+                return result
             elif resp.status_code == 503:
-                if self.__rps_try == 3:
-                    self.__rps_try = 0
-                    raise errors.RPSAPIError('Большое колличество запросов. Попробуйте позже.')
-                self.__rps_try += 1
-                return self.make_request(method, params)
+                if attempt < self.RPS_RETRIES:
+                    time.sleep(self.RPS_RETRY_DELAY)
             else:
                 raise errors.UnexpectedAPIError('Не удалось получит данные у API.')
+        raise errors.RPSAPIError('Большое колличество запросов. Попробуйте позже.')
+
+    def _parse(self, model: type[T], resp: dict) -> T:
+        return tracing.finish_pending(model.model_validate, resp)
+
+    def _warmup(self) -> None:
+        # HEAD on the site root opens pooled connections without API calls or rate limiter slots.
+        url = URL(self.ENDPOINT.format('', '')).copy_with(path='/', query=None)
+        with ThreadPoolExecutor(self.warmup, thread_name_prefix='proxy6-keepalive') as executor:
+            def ping() -> bool:
+                results = list(executor.map(self._head, [url] * self.warmup))
+                failed = [r for r in results if r is not None]
+                if failed:
+                    log.warning(f'Warm-up: {len(failed)} of {self.warmup} connections failed: {failed[0]!r}')
+                return len(failed) < self.warmup
+
+            self._warmup_ok = ping()
+            self._ready.set()
+            while True:
+                idle = time.monotonic() - self._last_used
+                if idle < self.KEEPALIVE_INTERVAL:
+                    if self._stopped.wait(self.KEEPALIVE_INTERVAL - idle):
+                        return
+                    continue
+                ping()
+                self._last_used = time.monotonic()
+
+    def _head(self, url: URL) -> Exception | None:
+        try:
+            self._client.head(url)
+        except Exception as e:
+            return e
+        return None
+
+    @staticmethod
+    def _timeout(timeout: float | None, deadline: float | None):
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise errors.DeadlineAPIError('Истек крайний срок выполнения запроса.')
+            timeout = min(timeout, remaining) if timeout else remaining
+        return timeout if timeout else USE_CLIENT_DEFAULT
 
     def process_api_response(self, resp: dict) -> dict:
         '''Checking API response on errors. If not - returns response.
@@ -84,78 +462,22 @@ class APIConnector:
             dict: API response.
         '''
         log.debug(f'Called with args: ({resp})')
-        if resp.get('error'):
-            match resp.get('error_id'):
-                case 30:
-                    raise errors.UnknownAPIError(
-                        resp, resp.get('error', 'Неизвестная ошибка')
-                    )
-                case 100:
-                    raise errors.KeyAPIError(
-                        resp, 'Ошибка авторизации, неверный ключ'
-                    )
-                case 110:
-                    raise errors.MethodAPIError(
-                        resp, 'Ошибочный метод'
-                    )
-                case 200:
-                    raise errors.CountAPIError(
-                        resp, 'Ошибка кол-ва прокси, неверно указано кол-во, либо отсутствует'
-                    )
-                case 210:
-                    raise errors.PeriodAPIError(
-                        resp, 'Ошибка периода, неверно указано кол-во (дней), либо отсутствует'
-                    )
-                case 220:
-                    raise errors.CountryAPIError(
-                        resp, 'Ошибка страны, неверно указана страна (страны указываются в формате iso2), либо отсутствует'
-                    )
-                case 230:
-                    raise errors.IDsAPIError(
-                        resp, 'Ошибка списка номеров прокси. Номера прокси должны быть указаны через запятую'
-                    )
-                case 250:
-                    raise errors.DescrAPIError(
-                        resp, 'Ошибка технического комментария, неверно указан, либо отсутствует'
-                    )
-                case 260:
-                    raise errors.TypeAPIError(
-                        resp, 'Ошибка типа (протокола) прокси, неверно указан, либо отсутствует'
-                    )
-                case 300:
-                    raise errors.ActiveProxyAllowAPIError(
-                        resp, 'Ошибка кол-ва прокси. Возникает при попытке покупки большего кол-ва прокси, чем доступно на сервисе'
-                    )
-                case 400:
-                    raise errors.NoMoneyAPIError(
-                        resp, 'Ошибка баланса. На вашем балансе отсутствуют средства, либо их не хватает для покупки запрашиваемого кол-ва прокси'
-                    )
-                case 404:
-                    raise errors.NotFoundAPIError(
-                        resp, 'Ошибка поиска. Возникает когда запрашиваемый элемент не найден'
-                    )
-                case 410:
-                    raise errors.PriceAPIError(
-                        resp, 'Ошибка расчета стоимости. Итоговая стоимость меньше, либо равна нулю'
-                    )
-                case _:
-                    raise errors.UnexpectedAPIError(
-                        resp, resp.get(
-                            'error',
-                            'Неожиданная ошибка API'
-                        )
-                    )
-        else:
-            return resp
+        errors.raise_for_response(resp)
+        return resp
 
 
 class Proxy6(APIConnector):
-    def __init__(self, apikey: str) -> None:
-        super().__init__(apikey)
+    def __init__(
+        self, apikey: str, preflight: bool = False,
+        transport: BaseTransport | None = None, max_workers: int = APIConnector.MAX_WORKERS,
+        reuse_proxy_models: bool = False, warmup: int = 0, hedge_percentile: float = 0.95
+    ) -> None:
+        super().__init__(apikey, preflight, transport, max_workers, reuse_proxy_models, warmup, hedge_percentile)
 
     def get_price(
         self, count: int,
-        period: int, version: types.ProxyVersion = types.ProxyVersion.IPV6
+        period: int, version: types.ProxyVersion = types.ProxyVersion.IPV6,
+        *, timeout: float | None = None, deadline: float | None = None, hedge: bool = False
     ) -> types.GetPriceResponse:
         '''Используется для получения информации о сумме заказа в зависимости от периода и кол-ва прокси.
 
@@ -163,6 +485,9 @@ class Proxy6(APIConnector):
             count (int): Кол-во прокси.
             period (int): Период - кол-во дней
             version (types.ProxyVersion): Версия прокси. Стандартно - types.ProxyVersion.IPV6
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
+            hedge (bool, optional): Отправить дублирующий запрос, если ответ задерживается дольше обычного. Defaults to False.
 
         Returns:
             types.GetPriceResponse: Ответ API.
@@ -172,17 +497,21 @@ class Proxy6(APIConnector):
             'count': count, 'period': period,
             'version': version.value
         }
-        resp = self.make_request('getprice', params)
-        return types.GetPriceResponse(**resp)
+        resp = self._make_request('getprice', params, timeout=timeout, deadline=deadline, hedge=hedge)
+        return self._parse(types.GetPriceResponse, resp)
 
     def get_count(
-        self, country: str, version: types.ProxyVersion = types.ProxyVersion.IPV6
+        self, country: str, version: types.ProxyVersion = types.ProxyVersion.IPV6,
+        *, timeout: float | None = None, deadline: float | None = None, hedge: bool = False
     ) -> types.GetCountResponse:
         '''Используется для получения информации о доступном для приобретения кол-ве прокси определенной страны.
 
         Args:
             country (str): Код страны в формате iso2.
             version (types.ProxyVersion): Версия прокси. Стандартно - types.ProxyVersion.IPV6
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
+            hedge (bool, optional): Отправить дублирующий запрос, если ответ задерживается дольше обычного. Defaults to False.
 
         Returns:
             types.GetCountResponse: Ответ API.
@@ -191,35 +520,43 @@ class Proxy6(APIConnector):
         params = {
             'country': country, 'version': version.value
         }
-        resp = self.make_request('getcount', params)
-        return types.GetCountResponse(**resp)
+        resp = self._make_request('getcount', params, timeout=timeout, deadline=deadline, hedge=hedge)
+        return self._parse(types.GetCountResponse, resp)
 
     def get_country(
-        self, version: types.ProxyVersion = types.ProxyVersion.IPV6
+        self, version: types.ProxyVersion = types.ProxyVersion.IPV6,
+        *, timeout: float | None = None, deadline: float | None = None, hedge: bool = False
     ) -> types.GetCountryResponse:
         '''Используется для получения информации о доступных для приобретения странах.
 
         Args:
             version (types.ProxyVersion, optional): Версия прокси. Defaults to types.ProxyVersion.IPV6.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
+            hedge (bool, optional): Отправить дублирующий запрос, если ответ задерживается дольше обычного. Defaults to False.
 
         Returns:
             types.GetCountryResponse: Ответ API.
         '''
         log.debug(f'Called with args: ({version})')
-        resp = self.make_request(
-            'getcountry', {'version': version.value}
+        resp = self._make_request(
+            'getcountry', {'version': version.value}, timeout=timeout, deadline=deadline, hedge=hedge
         )
-        return types.GetCountryResponse(**resp)
+        return self._parse(types.GetCountryResponse, resp)
 
     def get_proxy(
         self, state: types.ProxyState = types.ProxyState.ALL,
-        descr: str | None = None
+        descr: str | None = None,
+        *, timeout: float | None = None, deadline: float | None = None, hedge: bool = False
     ) -> types.GetProxyResponse:
         '''Используется для получения списка ваших прокси.
 
         Args:
             state (types.ProxyState, optional): Состояние возвращаемых прокси. Доступные значения: active - Активные, expired - Неактивные, expiring - Заканчивающиеся, all - Все (по-умолчанию). Defaults to types.ProxyState.ALL.
             descr (str | None, optional): Технический комментарий, который вы указывали при покупке прокси. Если данный параметр присутствует, то будут выбраны только те прокси, у которых присутствует данный комментарий, если же данный параметр не задан, то будут выбраны все прокси. Defaults to None.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
+            hedge (bool, optional): Отправить дублирующий запрос, если ответ задерживается дольше обычного. Defaults to False.
 
         Returns:
             types.GetProxyResponse: Ответ API.
@@ -230,17 +567,22 @@ class Proxy6(APIConnector):
         }
         if descr:
             params['descr'] = descr
-        resp = self.make_request('getproxy', params)
-        return types.GetProxyResponse(**resp)
+        resp = self._make_request('getproxy', params, timeout=timeout, deadline=deadline, hedge=hedge)
+        if self.proxy_cache is not None:
+            return tracing.finish_pending(lambda r: self.proxy_cache.build(r, (state, descr)), resp)
+        return self._parse(types.GetProxyResponse, resp)
 
     def set_type(
-        self, ids: list[str], type: types.ProxyType
+        self, ids: list[str], type: types.ProxyType,
+        *, timeout: float | None = None, deadline: float | None = None
     ) -> types.SetTypeResponse:
         '''Используется для изменения типа (протокола) у списка прокси.
 
         Args:
             ids (list[str]): Перечень внутренних номеров прокси в нашей системе;
             type (types.ProxyType): Устанавливаемый тип (протокол).
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
 
         Returns:
             types.SetTypeResponse: Ответ API.
@@ -253,12 +595,13 @@ class Proxy6(APIConnector):
             'ids': ','.join(ids),
             'type': type.value
         }
-        resp = self.make_request('settype', params)
-        return types.SetTypeResponse(**resp)
+        resp = self._make_request('settype', params, timeout=timeout, deadline=deadline)
+        return self._parse(types.SetTypeResponse, resp)
 
     def set_descr(
         self, new: str, old: str | None = None,
-        ids: list[str] | None = None
+        ids: list[str] | None = None,
+        *, timeout: float | None = None, deadline: float | None = None
     ) -> types.SetDescrResponse:
         '''Используется для обновления технического комментария у списка прокси, который был установлен при покупке.
 
@@ -266,6 +609,8 @@ class Proxy6(APIConnector):
             new (str): Технический комментарий, на который нужно изменить. Максимальная длина 50 символов.
             old (str | None, optional): Технический комментарий, который нужно изменить. Defaults to None.
             ids (list[str] | None, optional): Перечень внутренних номеров прокси в нашей системе. Defaults to None.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
 
         Returns:
             types.SetDescrResponse: Ответ API.
@@ -291,14 +636,15 @@ class Proxy6(APIConnector):
                 params['old'] = old
             if ids:
                 params['ids'] = ','.join(ids)
-            resp = self.make_request('setdescr', params)
-            return types.SetDescrResponse(**resp)
+            resp = self._make_request('setdescr', params, timeout=timeout, deadline=deadline)
+            return self._parse(types.SetDescrResponse, resp)
 
     def buy(
         self, count: int, period: int, country: str,
         version: types.ProxyVersion = types.ProxyVersion.IPV6,
         type: types.ProxyType = types.ProxyType.HTTPS,
-        descr: str | None = None, auto_prolong: bool = False
+        descr: str | None = None, auto_prolong: bool = False,
+        *, timeout: float | None = None, deadline: float | None = None
     ) -> types.BuyResponse:
         '''Используется для покупки прокси.
 
@@ -310,6 +656,8 @@ class Proxy6(APIConnector):
             type (types.ProxyType, optional): Тип прокси (протокол). Defaults to types.ProxyType.HTTPS.
             descr (str | None, optional): Технический комментарий для списка прокси, максимальная длина 50 символов. Указание данного параметра позволит вам делать выборку списка прокси про этому параметру через метод `getproxy`. Defaults to None.
             auto_prolong (bool, optional): При добавлении данного параметра, у купленных прокси будет включено автопродление. Defaults to False.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
 
         Returns:
             types.BuyResponse: Ответ API.
@@ -334,17 +682,20 @@ class Proxy6(APIConnector):
                 params['descr'] = descr
         if auto_prolong:
             params['auto_prolong'] = ''
-        resp = self.make_request('buy', params)
-        return types.BuyResponse(**resp)
+        resp = self._make_request('buy', params, timeout=timeout, deadline=deadline)
+        return self._parse(types.BuyResponse, resp)
 
     def prolong(
-        self, period: int, ids: list[str]
+        self, period: int, ids: list[str],
+        *, timeout: float | None = None, deadline: float | None = None
     ) -> types.ProlongResponse:
         '''Используется для продления текущих прокси.
 
         Args:
             period (int):  Период продления - кол-во дней.
             ids (list[str]): Перечень внутренних номеров прокси в нашей системе.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
 
         Returns:
             types.ProlongResponse: Ответ API.
@@ -354,17 +705,20 @@ class Proxy6(APIConnector):
             'period': period,
             'ids': ','.join(ids)
         }
-        resp = self.make_request('prolong', params)
-        return types.ProlongResponse(**resp)
+        resp = self._make_request('prolong', params, timeout=timeout, deadline=deadline)
+        return self._parse(types.ProlongResponse, resp)
 
     def delete(
-        self, ids: list[str] | None = None, descr: str | None = None
+        self, ids: list[str] | None = None, descr: str | None = None,
+        *, timeout: float | None = None, deadline: float | None = None
     ) -> types.DeleteResponse:
         '''Используется для удаления прокси.
 
         Args:
             ids (list[str] | None, optional): Перечень внутренних номеров прокси в нашей системе. Defaults to None.
             descr (str | None, optional): Технический комментарий, который вы указывали при покупке прокси, либо через метод `setdescr`. Defaults to None.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
 
         Returns:
             types.DeleteResponse: Ответ API.
@@ -376,7 +730,7 @@ class Proxy6(APIConnector):
             Обязательно должен присутствовать один из параметров, либо `ids`, либо `descr`.
         '''
         log.debug(f'Called with args: ({ids}, {descr})')
-        if not ids or not descr:
+        if not ids and not descr:
             raise TypeError(
                 'Обязательно должен быть указан один из аргументов: "ids" или "descr"'
             )
@@ -384,30 +738,41 @@ class Proxy6(APIConnector):
             params = {'ids': ','.join(ids)}
         else:
             params = {'descr': descr}
-        resp = self.make_request('delete', params)
-        return types.DeleteResponse(**resp)
+        resp = self._make_request('delete', params, timeout=timeout, deadline=deadline)
+        return self._parse(types.DeleteResponse, resp)
 
-    def check(self, ids: str) -> types.CheckResponse:
+    def check(
+        self, ids: str,
+        *, timeout: float | None = None, deadline: float | None = None, hedge: bool = False
+    ) -> types.CheckResponse:
         '''Используется для проверки валидности (работоспособности) прокси.
 
         Args:
             ids (str): Внутренний номер прокси в нашей системе.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
+            hedge (bool, optional): Отправить дублирующий запрос, если ответ задерживается дольше обычного. Defaults to False.
 
         Returns:
             types.CheckResponse: Ответ API.
         '''
         log.debug(f'Called with args: ({ids})')
-        resp = self.make_request(
-            'check', {'ids': ids}
+        resp = self._make_request(
+            'check', {'ids': ids}, timeout=timeout, deadline=deadline, hedge=hedge
         )
-        return types.CheckResponse(**resp)
+        return self._parse(types.CheckResponse, resp)
 
-    def ipauth(self, ip: list[str] | None = None, delete: bool = False) -> types.IPAuthResponse:
+    def ipauth(
+        self, ip: list[str] | None = None, delete: bool = False,
+        *, timeout: float | None = None, deadline: float | None = None
+    ) -> types.IPAuthResponse:
         '''Используется для привязки, либо удаления авторизации прокси по ip.
 
         Args:
             ip (list[str] | None): Список привязываемых ip-адресов. Defaults is None.
             delete (bool): Удалить привязку по IP? Defaults is False.
+            timeout (float | None, optional): Таймаут запроса в секундах. Defaults to None.
+            deadline (float | None, optional): Крайний срок выполнения запроса - значение `time.monotonic()`. Defaults to None.
 
         Returns:
             types.IPAuthResponse: Ответ API.
@@ -429,5 +794,73 @@ class Proxy6(APIConnector):
             params = {
                 'ip': 'delete'
             }
-        resp = self.make_request('ipauth', params)
-        return types.IPAuthResponse(**resp)
+        resp = self._make_request('ipauth', params, timeout=timeout, deadline=deadline)
+        return self._parse(types.IPAuthResponse, resp)
+
+    def map_check(
+        self, ids: Iterable[str], return_exceptions: bool = False
+    ) -> list[types.CheckResponse | BaseException]:
+        '''Проверяет список прокси конкурентно, см. `check`.
+
+        Args:
+            ids (Iterable[str]): Внутренние номера прокси в нашей системе.
+            return_exceptions (bool, optional): Вернуть исключения на месте результатов вместо возбуждения первого из них. Defaults to False.
+
+        Returns:
+            list[types.CheckResponse | BaseException]: Ответы API в порядке `ids`.
+        '''
+        return self.map(self.check, ids, return_exceptions)
+
+    def map_get_count(
+        self, countries: Iterable[str],
+        version: types.ProxyVersion = types.ProxyVersion.IPV6,
+        return_exceptions: bool = False
+    ) -> list[types.GetCountResponse | BaseException]:
+        '''Получает доступное кол-во прокси для списка стран конкурентно, см. `get_count`.
+
+        Args:
+            countries (Iterable[str]): Коды стран в формате iso2.
+            version (types.ProxyVersion, optional): Версия прокси. Defaults to types.ProxyVersion.IPV6.
+            return_exceptions (bool, optional): Вернуть исключения на месте результатов вместо возбуждения первого из них. Defaults to False.
+
+        Returns:
+            list[types.GetCountResponse | BaseException]: Ответы API в порядке `countries`.
+        '''
+        return self.map(self.get_count, ((c, version) for c in countries), return_exceptions)
+
+    def map_get_price(
+        self, orders: Iterable[tuple[int, int]],
+        version: types.ProxyVersion = types.ProxyVersion.IPV6,
+        return_exceptions: bool = False
+    ) -> list[types.GetPriceResponse | BaseException]:
+        '''Получает стоимость списка заказов конкурентно, см. `get_price`.
+
+        Args:
+            orders (Iterable[tuple[int, int]]): Пары (кол-во прокси, период).
+            version (types.ProxyVersion, optional): Версия прокси. Defaults to types.ProxyVersion.IPV6.
+            return_exceptions (bool, optional): Вернуть исключения на месте результатов вместо возбуждения первого из них. Defaults to False.
+
+        Returns:
+            list[types.GetPriceResponse | BaseException]: Ответы API в порядке `orders`.
+        '''
+        return self.map(
+            self.get_price, ((count, period, version) for count, period in orders),
+            return_exceptions
+        )
+
+    def map_get_proxy(
+        self, descrs: Iterable[str],
+        state: types.ProxyState = types.ProxyState.ALL,
+        return_exceptions: bool = False
+    ) -> list[types.GetProxyResponse | BaseException]:
+        '''Получает списки прокси для нескольких технических комментариев конкурентно, см. `get_proxy`.
+
+        Args:
+            descrs (Iterable[str]): Технические комментарии.
+            state (types.ProxyState, optional): Состояние возвращаемых прокси. Defaults to types.ProxyState.ALL.
+            return_exceptions (bool, optional): Вернуть исключения на месте результатов вместо возбуждения первого из них. Defaults to False.
+
+        Returns:
+            list[types.GetProxyResponse | BaseException]: Ответы API в порядке `descrs`.
+        '''
+        return self.map(self.get_proxy, ((state, d) for d in descrs), return_exceptions)
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Request tracing.
+#  Created by LulzLoL231 at 19/10/26
+#
+# The span API is the subset of OpenTelemetry the clients use:
+# `tracer.start_span(name, context=..., attributes=..., start_time=ns)`,
+# `span.set_attribute`, `span.record_exception` and `span.end(end_time=ns)`.
+# An `opentelemetry.trace.Tracer` works as is; `RecordingTracer` is a
+# dependency-free implementation. Spans are emitted after the call from
+# recorded timestamps, so nothing is traced unless a tracer is installed.
+#
+# Phases come from marks: the clients mark the scheduler and rate limiter
+# steps, httpx reports the connection phases through its `trace`
+# extension. httpcore doesn't resolve names itself, so `dns` is only
+# marked by the DNS cache of `proxy6.network` (clients with `warmup`).
+# The sync client has no scheduler queue and emits no `queue` span.
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar, Token
+from typing import Any, Callable, TypeVar
+
+
+T = TypeVar('T')
+
+_tracer: Any = None
+_pending: ContextVar['RequestTrace | None'] = ContextVar('proxy6_pending_trace', default=None)
+_current: ContextVar['RequestTrace | None'] = ContextVar('proxy6_current_trace', default=None)
+
+# (span, start mark, end mark); phases missing a mark are not emitted.
+PHASES = (
+    ('queue', 'enqueued', 'rate_wait'),
+    ('rate_limit', 'rate_wait', 'dispatched'),
+    ('dns', 'dns.started', 'dns.complete'),
+    ('connect', 'connect_tcp.started', 'connect_tcp.complete'),
+    ('tls', 'start_tls.started', 'start_tls.complete'),
+    ('send', 'send_request_headers.started', 'send_request_body.complete'),
+    ('ttfb', 'send_request_body.complete', 'receive_response_headers.complete'),
+    ('body', 'receive_response_body.started', 'receive_response_body.complete'),
+    ('json', 'json.started', 'json.complete'),
+    ('validate', 'validate.started', 'validate.complete'),
+)
+
+
+def set_tracer(tracer: Any) -> None:
+    '''Installs tracer for all clients. None disables tracing.
+
+    Args:
+        tracer (Any): OpenTelemetry-compatible tracer.
+    '''
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Any:
+    return _tracer
+
+
+def mark_current(name: str) -> None:
+    '''Marks event on the trace of the request being sent, if any.
+
+    Lets code below httpx, like network backends, report phases.
+
+    Args:
+        name (str): Mark name, e.g. 'dns.started'.
+    '''
+    trace = _current.get()
+    if trace is not None:
+        trace.mark(name)
+
+
+class Span:
+    '''Finished or running span of `RecordingTracer`.
+    '''
+    __slots__ = ('name', 'parent', 'attributes', 'start_time', 'end_time', 'exception', '_tracer')
+
+    def __init__(self, tracer: 'RecordingTracer', name: str, parent: 'Span | None', attributes: dict | None, start_time: int | None) -> None:
+        self._tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self.start_time = start_time if start_time is not None else time.time_ns()
+        self.end_time: int | None = None
+        self.exception: BaseException | None = None
+
+    @property
+    def duration(self) -> float | None:
+        '''Span duration in seconds.
+        '''
+        return None if self.end_time is None else (self.end_time - self.start_time) / 1e9
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exception: BaseException, **kwargs) -> None:
+        self.exception = exception
+
+    def end(self, end_time: int | None = None) -> None:
+        self.end_time = end_time if end_time is not None else time.time_ns()
+        self._tracer._finish(self)
+
+
+class RecordingTracer:
+    '''Keeps the last `max_spans` finished spans in memory.
+    '''
+
+    def __init__(self, max_spans: int = 10000) -> None:
+        self.spans: deque[Span] = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def start_span(
+            self, name: str, context: Any = None, kind: Any = None,
+            attributes: dict | None = None, links: Any = None,
+            start_time: int | None = None, **kwargs
+    ) -> Span:
+        '''Starts span. `context` is the parent `Span`.
+        '''
+        return Span(self, name, context if isinstance(context, Span) else None, attributes, start_time)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        '''Aggregates finished spans by name.
+
+        Returns:
+            dict[str, dict[str, float]]: count, avg and max duration in seconds per span name.
+        '''
+        with self._lock:
+            spans = list(self.spans)
+        result: dict[str, dict[str, float]] = {}
+        for span in spans:
+            stat = result.setdefault(span.name, {'count': 0, 'avg': 0.0, 'max': 0.0})
+            stat['count'] += 1
+            stat['avg'] += span.duration
+            stat['max'] = max(stat['max'], span.duration)
+        for stat in result.values():
+            stat['avg'] /= stat['count']
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+
+def _child_context(tracer: Any, span: Any) -> Any:
+    if isinstance(tracer, RecordingTracer):
+        return span
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+    return trace.set_span_in_context(span)
+
+
+class RequestTrace:
+    '''Timestamps of one API call, turned into spans by `emit`.
+
+    `event`/`aevent` are the httpx `trace` extension callbacks for sync
+    and async clients.
+    '''
+    __slots__ = ('tracer', 'method', 'marks', 'attributes', 'queued')
+
+    def __init__(self, tracer: Any, method: str, queued: bool = True) -> None:
+        self.tracer = tracer
+        self.method = method
+        self.queued = queued
+        self.marks: dict[str, int] = {'enqueued': time.monotonic_ns()}
+        self.attributes: dict[str, Any] = {'proxy6.method': method}
+
+    def mark(self, name: str, at: int | None = None) -> None:
+        self.marks[name] = at if at is not None else time.monotonic_ns()
+
+    def event(self, name: str, info: dict) -> None:
+        # 'http11.send_request_headers.started' -> 'send_request_headers.started'
+        self.marks[name.split('.', 1)[1]] = time.monotonic_ns()
+
+    async def aevent(self, name: str, info: dict) -> None:
+        self.marks[name.split('.', 1)[1]] = time.monotonic_ns()
+
+    def activate(self) -> Token:
+        '''Makes the trace current for `mark_current`.
+
+        Returns:
+            Token: Token for `deactivate`.
+        '''
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token: Token) -> None:
+        _current.reset(token)
+
+    def defer(self) -> None:
+        '''Leaves the trace to be finished by `finish_pending` after model validation.
+        '''
+        previous = _pending.get()
+        if previous is not None:
+            previous.emit()
+        _pending.set(self)
+
+    def emit(self, error: BaseException | None = None) -> None:
+        '''Sends spans to the tracer.
+
+        Args:
+            error (BaseException | None, optional): Call error. Defaults to None.
+        '''
+        if _pending.get() is self:
+            _pending.set(None)
+        if error is not None:
+            self.mark('failed')
+        marks = self.marks
+        offset = time.time_ns() - time.monotonic_ns()
+        end = max(marks.values())
+        parent = self.tracer.start_span(
+            f'proxy6 {self.method}', attributes=self.attributes,
+            start_time=marks['enqueued'] + offset
+        )
+        context = _child_context(self.tracer, parent)
+        for name, start_mark, end_mark in PHASES:
+            if name == 'queue' and not self.queued:
+                continue
+            start, stop = marks.get(start_mark), marks.get(end_mark)
+            if start is not None and stop is not None:
+                span = self.tracer.start_span(
+                    f'proxy6.{name}', context=context, start_time=start + offset
+                )
+                span.end(end_time=stop + offset)
+        if error is not None:
+            parent.set_attribute('error.type', type(error).__name__)
+            parent.record_exception(error)
+        parent.end(end_time=end + offset)
+
+
+def emit_pending() -> None:
+    '''Emits the deferred trace of the current context, if any.
+
+    For raw `make_request` calls, whose answer is not parsed.
+    '''
+    trace = _pending.get()
+    if trace is not None:
+        trace.emit()
+
+
+def finish_pending(parse: Callable[[dict], T], resp: dict) -> T:
+    '''Parses API response, timing it for the deferred trace.
+
+    Args:
+        parse (Callable[[dict], T]): Parser, e.g. `model.model_validate`.
+        resp (dict): API response.
+
+    Returns:
+        T: Parsed response.
+    '''
+    trace = _pending.get()
+    if trace is None:
+        return parse(resp)
+    trace.mark('validate.started')
+    try:
+        result = parse(resp)
+    except BaseException as e:
+        trace.mark('validate.complete')
+        trace.emit(e)
+        raise
+    trace.mark('validate.complete')
+    trace.emit()
+    return result
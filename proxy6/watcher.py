@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Inventory watcher.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import inspect
+import logging
+import time
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable
+
+from pydantic import BaseModel, Field
+
+from . import types
+from .async_.api import AsyncProxy6
+from .async_.scheduler import RequestPriority, request_priority
+
+
+log = logging.getLogger('proxy6')
+
+
+class ProxyEventKind(Enum):
+    ADDED = 'added'
+    REMOVED = 'removed'
+    EXPIRED = 'expired'
+    PROLONGED = 'prolonged'
+    DESCR_CHANGED = 'descr_changed'
+    TYPE_CHANGED = 'type_changed'
+
+
+class ProxyEvent(BaseModel):
+    kind: ProxyEventKind = Field(..., description='Тип события')
+    id: str = Field(..., description='Внутренний номер прокси')
+    old: types.ProxyInfo | None = Field(
+        None, description='Прокси до изменения (None для added)'
+    )
+    new: types.ProxyInfo | None = Field(
+        None, description='Прокси после изменения (None для removed)'
+    )
+    timestamp: datetime = Field(..., description='Время обнаружения изменения')
+
+
+def is_expired(proxy: types.ProxyInfo, now: datetime | None = None) -> bool:
+    '''Checks whether proxy is expired.
+
+    Args:
+        proxy (types.ProxyInfo): Proxy.
+        now (datetime | None, optional): Current time. Defaults to now in the proxy timezone.
+
+    Returns:
+        bool: Proxy is expired.
+    '''
+    if now is None:
+        now = datetime.now(proxy.date_end.tzinfo)
+    return not proxy.active or proxy.date_end <= now
+
+
+def diff_inventory(
+        old: dict[str, types.ProxyInfo], new: dict[str, types.ProxyInfo]
+) -> list[ProxyEvent]:
+    '''Makes change events from two proxy lists keyed by proxy ID.
+
+    Expiry is time based and is not reported here, see `InventoryWatcher`.
+
+    Args:
+        old (dict[str, types.ProxyInfo]): Previous proxy list.
+        new (dict[str, types.ProxyInfo]): Current proxy list.
+
+    Returns:
+        list[ProxyEvent]: Change events.
+    '''
+    now = datetime.now()
+    events = []
+    for id, proxy in new.items():
+        before = old.get(id)
+        if before is None:
+            events.append(ProxyEvent(kind=ProxyEventKind.ADDED, id=id, new=proxy, timestamp=now))
+            continue
+        if before == proxy:
+            continue
+        if proxy.date_end > before.date_end:
+            events.append(ProxyEvent(kind=ProxyEventKind.PROLONGED, id=id, old=before, new=proxy, timestamp=now))
+        if proxy.descr != before.descr:
+            events.append(ProxyEvent(kind=ProxyEventKind.DESCR_CHANGED, id=id, old=before, new=proxy, timestamp=now))
+        if proxy.type != before.type:
+            events.append(ProxyEvent(kind=ProxyEventKind.TYPE_CHANGED, id=id, old=before, new=proxy, timestamp=now))
+    for id, proxy in old.items():
+        if id not in new:
+            events.append(ProxyEvent(kind=ProxyEventKind.REMOVED, id=id, old=proxy, timestamp=now))
+    return events
+
+
+class InventoryWatcher:
+    '''Polls `get_proxy` and emits typed change events.
+
+    The polling interval grows by `backoff` while nothing changes, drops back
+    to `min_interval` on any change and is shortened so the next poll lands
+    right after the nearest known `date_end`. Polls bypass the client
+    `refresh_ahead` cache, so changes are diffed against the API state.
+    '''
+    MIN_INTERVAL = 5.0
+    MAX_INTERVAL = 300.0
+    BACKOFF = 1.5
+    BOUNDARY_SLACK = 1.0
+    QUEUE_SIZE = 1000
+
+    def __init__(
+            self, client: AsyncProxy6,
+            state: types.ProxyState = types.ProxyState.ALL, descr: str | None = None,
+            min_interval: float = MIN_INTERVAL, max_interval: float = MAX_INTERVAL,
+            backoff: float = BACKOFF, emit_initial: bool = False
+    ) -> None:
+        self.client = client
+        self.state = state
+        self.descr = descr
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.emit_initial = emit_initial
+        self.inventory: dict[str, types.ProxyInfo] | None = None
+        self.interval = min_interval
+        self.dropped = 0
+        self._expired: set[str] = set()
+        self._callbacks: list[Callable[[ProxyEvent], Any]] = []
+        self._queues: list[asyncio.Queue] = []
+        self._task: asyncio.Task | None = None
+        self._stopped = asyncio.Event()
+
+    def subscribe(self, callback: Callable[[ProxyEvent], Any]) -> Callable[[], None]:
+        '''Registers event callback, sync or async.
+
+        Args:
+            callback (Callable[[ProxyEvent], Any]): Callback.
+
+        Returns:
+            Callable[[], None]: Unsubscribe function.
+        '''
+        self._callbacks.append(callback)
+
+        def unsubscribe() -> None:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+        return unsubscribe
+
+    def events(self, maxsize: int = QUEUE_SIZE) -> 'EventStream':
+        '''Subscribes to events until the watcher is stopped.
+
+        The subscription starts on the call, so events emitted before the
+        first iteration are kept. When the consumer falls `maxsize` events
+        behind, the oldest ones are dropped and counted in `dropped`.
+
+        Args:
+            maxsize (int, optional): Max events waiting for the consumer. Defaults to 1000.
+
+        Returns:
+            EventStream: Async iterator of events.
+        '''
+        queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._queues.append(queue)
+        if self._stopped.is_set():
+            queue.put_nowait(None)
+        return EventStream(self, queue)
+
+    async def poll(self) -> list[ProxyEvent]:
+        '''Polls inventory once, emits and returns events.
+
+        Returns:
+            list[ProxyEvent]: Change events.
+        '''
+        token = request_priority.set(RequestPriority.BACKGROUND)
+        try:
+            resp = await self.client.get_proxy(self.state, self.descr, cached=False)
+        finally:
+            request_priority.reset(token)
+        current = resp.list
+        if self.inventory is None:
+            events = diff_inventory({}, current) if self.emit_initial else []
+        else:
+            events = diff_inventory(self.inventory, current)
+        events.extend(self._expiry_events(current))
+        self.inventory = current
+        for event in events:
+            await self._emit(event)
+        return events
+
+    def start(self) -> asyncio.Task:
+        '''Starts polling in background task.
+
+        Returns:
+            asyncio.Task: Polling task.
+        '''
+        if self._task is None or self._task.done():
+            self._stopped.clear()
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        '''Stops polling and ends all event iterators.
+        '''
+        self._stopped.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def run(self) -> None:
+        '''Polls until `stop` is called.
+        '''
+        try:
+            while not self._stopped.is_set():
+                try:
+                    changed = bool(await self.poll())
+                except Exception:
+                    log.exception('Inventory poll failed')
+                    changed = False
+                self.interval = self._next_interval(changed)
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for queue in self._queues:
+                self._put(queue, None)
+
+    def _expiry_events(self, current: dict[str, types.ProxyInfo]) -> list[ProxyEvent]:
+        events = []
+        now = datetime.now()
+        for id, proxy in current.items():
+            if is_expired(proxy):
+                if id not in self._expired:
+                    self._expired.add(id)
+                    if self.inventory is not None or self.emit_initial:
+                        events.append(ProxyEvent(
+                            kind=ProxyEventKind.EXPIRED, id=id,
+                            old=(self.inventory or {}).get(id), new=proxy, timestamp=now
+                        ))
+            else:
+                self._expired.discard(id)
+        self._expired.intersection_update(current)
+        return events
+
+    def _next_interval(self, changed: bool) -> float:
+        if changed:
+            interval = self.min_interval
+        else:
+            interval = min(self.interval * self.backoff, self.max_interval)
+        boundaries = [
+            proxy.date_end.timestamp() for id, proxy in (self.inventory or {}).items()
+            if id not in self._expired
+        ]
+        if boundaries:
+            until = min(boundaries) - time.time() + self.BOUNDARY_SLACK
+            interval = min(interval, max(until, self.min_interval))
+        return interval
+
+    def _put(self, queue: asyncio.Queue, event: ProxyEvent | None) -> None:
+        if queue.full():
+            queue.get_nowait()
+            self.dropped += 1
+            log.warning('Inventory event subscriber is too slow, dropped the oldest event')
+        queue.put_nowait(event)
+
+    async def _emit(self, event: ProxyEvent) -> None:
+        for queue in self._queues:
+            self._put(queue, event)
+        for callback in list(self._callbacks):
+            try:
+                result = callback(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                log.exception('Inventory event callback failed')
+
+
+class EventStream:
+    '''Async iterator returned by `InventoryWatcher.events`.
+    '''
+
+    def __init__(self, watcher: InventoryWatcher, queue: asyncio.Queue) -> None:
+        self._watcher = watcher
+        self._queue: asyncio.Queue | None = queue
+
+    def __aiter__(self) -> 'EventStream':
+        return self
+
+    async def __anext__(self) -> ProxyEvent:
+        if self._queue is None:
+            raise StopAsyncIteration
+        event = await self._queue.get()
+        if event is None:
+            self.close()
+            raise StopAsyncIteration
+        return event
+
+    async def aclose(self) -> None:
+        self.close()
+
+    def close(self) -> None:
+        '''Unsubscribes from events.
+        '''
+        if self._queue is not None:
+            self._watcher._queues.remove(self._queue)
+            self._queue = None
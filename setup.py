@@ -43,6 +43,9 @@ setup(
     download_url='https://github.com/LulzLoL231/pyProxy6/archive/master.zip',
     packages=['proxy6', 'proxy6.sync', 'proxy6.async_'],
     install_requires=requirements(),
+    entry_points={
+        'console_scripts': ['proxy6 = proxy6.cli:main']
+    },
     setup_requires=['wheel'],
     classifiers=[
         'License :: OSI Approved :: Apache Software License',
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Account state tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import threading
+from decimal import Decimal
+
+import pytest
+
+from proxy6.account import AccountState
+
+
+def test_update_keeps_missing_user_id_as_none():
+    state = AccountState()
+    state.update({'balance': '10', 'currency': 'RUB'})
+    assert state.user_id is None
+    state.update({'balance': '9', 'user_id': 42})
+    assert state.user_id == '42'
+    state.update({'balance': '8'})
+    assert state.user_id == '42'
+
+
+def test_update_ignores_responses_to_older_requests():
+    state = AccountState()
+    assert state.update({'balance': '5'}, sent=2.0) is not None
+    assert state.update({'balance': '10'}, sent=1.0) is None
+    assert state.balance == Decimal('5')
+    state.update({'balance': '4'}, sent=3.0)
+    assert state.balance == Decimal('4')
+
+
+def test_listener_gets_balance_changes_only():
+    state = AccountState()
+    changes = []
+    unsubscribe = state.subscribe(changes.append)
+    state.update({'balance': '10'})
+    state.update({'balance': '10'})
+    state.update({'balance': '7'})
+    unsubscribe()
+    state.update({'balance': '1'})
+    assert [(c.old, c.new) for c in changes] == [(None, Decimal('10')), (Decimal('10'), Decimal('7'))]
+
+
+def test_coroutine_listener_requires_event_loop():
+    async def listener(change):
+        pass
+
+    with pytest.raises(TypeError):
+        AccountState().subscribe(listener)
+
+
+def test_coroutine_listener_runs_on_its_loop_from_thread():
+    async def main():
+        state = AccountState()
+        received = asyncio.Event()
+        loops = []
+
+        async def listener(change):
+            loops.append(asyncio.get_running_loop())
+            received.set()
+
+        state.subscribe(listener)
+        thread = threading.Thread(target=state.update, args=({'balance': '3'},))
+        thread.start()
+        thread.join()
+        await asyncio.wait_for(received.wait(), 1)
+        assert loops == [asyncio.get_running_loop()]
+
+    asyncio.run(main())
+
+
+def test_spend_rate_counts_decreases_only():
+    state = AccountState()
+    for balance in ('100', '90', '150', '140'):
+        state.update({'balance': balance})
+    assert state.spend_rate() > 0
+    assert AccountState().spend_rate() == 0
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: IP allowlist manager tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import fcntl
+import json
+import os
+import threading
+
+import httpx
+import pytest
+
+from proxy6 import errors
+from proxy6.allowlist import AllowlistManager
+from proxy6.async_.api import AsyncProxy6
+
+from .utils import FakeAPI, ok, unthrottle
+
+
+def _client(api: FakeAPI) -> AsyncProxy6:
+    client = AsyncProxy6('key', transport=api.transport())
+    unthrottle(client)
+    return client
+
+
+def _sent(api: FakeAPI) -> list[str]:
+    return [params['ip'] for method, params in api.calls if method == 'ipauth']
+
+
+def test_changes_within_debounce_are_one_call():
+    api = FakeAPI(ipauth=lambda params: ok())
+
+    async def main():
+        manager = AllowlistManager(_client(api), debounce=0.05)
+        results = await asyncio.gather(
+            manager.add('10.0.0.2'), manager.add('10.0.0.1', ' 10.0.0.3 '),
+            manager.remove('10.0.0.3'), manager.add('::1', wait=False)
+        )
+        assert results[0] == results[1] == frozenset({'10.0.0.1', '10.0.0.2', '::1'})
+        assert results[3] is None
+        assert manager.calls == 1
+
+    asyncio.run(main())
+    assert _sent(api) == ['10.0.0.1,10.0.0.2,::1']
+
+
+def test_unchanged_set_is_not_sent():
+    api = FakeAPI(ipauth=lambda params: ok())
+
+    async def main():
+        manager = AllowlistManager(_client(api), debounce=0.01)
+        await manager.add('10.0.0.1')
+        await manager.add('10.0.0.1')
+        await manager.add('10.0.0.2')
+        await manager.remove('10.0.0.2')
+        await manager.remove('10.0.0.1')
+        await manager.close()
+        assert (manager.calls, manager.skipped) == (4, 1)
+
+    asyncio.run(main())
+    assert _sent(api) == ['10.0.0.1', '10.0.0.1,10.0.0.2', '10.0.0.1', 'delete']
+
+
+def test_invalid_ip_is_rejected():
+    async def main():
+        with pytest.raises(ValueError):
+            await AllowlistManager(_client(FakeAPI())).add('10.0.0.256')
+
+    asyncio.run(main())
+
+
+def test_expired_leases_are_dropped():
+    api = FakeAPI(ipauth=lambda params: ok())
+
+    async def main():
+        manager = AllowlistManager(_client(api), debounce=0, ttl=0.05)
+        await manager.add('10.0.0.1')
+        await asyncio.sleep(0.06)
+        assert manager.effective == frozenset()
+        await manager.add('10.0.0.2')
+
+    asyncio.run(main())
+    assert _sent(api) == ['10.0.0.1', '10.0.0.2']
+
+
+def test_failed_flush_reaches_waiters_and_is_resent():
+    answers = [httpx.Response(503), ok()]
+    api = FakeAPI(ipauth=lambda params: answers.pop(0))
+
+    async def main():
+        manager = AllowlistManager(_client(api), debounce=0)
+        with pytest.raises(errors.RPSAPIError):
+            await manager.add('10.0.0.1')
+        assert manager.applied is None
+        assert await manager.flush() == frozenset({'10.0.0.1'})
+
+    asyncio.run(main())
+    assert _sent(api) == ['10.0.0.1', '10.0.0.1']
+
+
+def test_shared_state_merges_workers(tmp_path):
+    api = FakeAPI(ipauth=lambda params: ok())
+    path = str(tmp_path / 'allowlist.json')
+
+    async def main():
+        first = AllowlistManager(_client(api), debounce=0, path=path)
+        second = AllowlistManager(_client(api), debounce=0, path=path)
+        await first.add('10.0.0.1')
+        assert await second.add('10.0.0.2') == frozenset({'10.0.0.1', '10.0.0.2'})
+        # Already applied by the second worker.
+        await first.add('10.0.0.2')
+        assert first.skipped == 1
+
+    asyncio.run(main())
+    assert _sent(api) == ['10.0.0.1', '10.0.0.1,10.0.0.2']
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['applied'] == ['10.0.0.1', '10.0.0.2']
+
+
+def test_cancelled_shared_flush_locks_and_closes_its_own_file(tmp_path, monkeypatch):
+    api = FakeAPI(ipauth=lambda params: ok())
+    path = str(tmp_path / 'allowlist.json')
+    gate = threading.Event()
+    locked = []
+    flock = fcntl.flock
+
+    def slow_flock(fd, operation):
+        gate.wait(5)
+        locked.append(os.readlink(f'/proc/self/fd/{fd}'))
+        flock(fd, operation)
+
+    monkeypatch.setattr(fcntl, 'flock', slow_flock)
+
+    async def main():
+        manager = AllowlistManager(_client(api), debounce=0, path=path)
+        fds = len(os.listdir('/proc/self/fd'))
+        manager._ops.append((True, '10.0.0.1', None))
+        flush = asyncio.ensure_future(manager.flush())
+        await asyncio.sleep(0.05)
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+        # The flock thread is still running; a file opened now must not take its descriptor.
+        with open(tmp_path / 'other', 'w'):
+            gate.set()
+            monkeypatch.setattr(fcntl, 'flock', flock)
+            assert await asyncio.wait_for(manager.add('10.0.0.2'), 5) == frozenset({'10.0.0.2'})
+        assert locked == [f'{path}.lock']
+        assert len(os.listdir('/proc/self/fd')) == fds
+
+    asyncio.run(main())
+    assert _sent(api) == ['10.0.0.2']
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: API client tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+
+import pytest
+
+from proxy6.async_.api import AsyncProxy6
+from proxy6.sync.api import Proxy6
+
+from .utils import ok
+
+
+DELETE_ARGS = [
+    (dict(ids=['1', '2']), {'ids': '1,2'}),
+    (dict(descr='tag'), {'descr': 'tag'}),
+]
+
+
+def _record_requests(monkeypatch, client, is_async: bool) -> list:
+    calls = []
+
+    def make_request(method, params=None, *args, **kwargs):
+        calls.append((method, params))
+        return ok(count=1)
+
+    async def amake_request(method, params=None, *args, **kwargs):
+        return make_request(method, params)
+
+    monkeypatch.setattr(client, '_make_request', amake_request if is_async else make_request)
+    return calls
+
+
+@pytest.mark.parametrize('kwargs, params', DELETE_ARGS)
+def test_delete_needs_only_one_of_ids_and_descr(monkeypatch, kwargs, params):
+    client = Proxy6('key')
+    calls = _record_requests(monkeypatch, client, False)
+    assert client.delete(**kwargs).count == 1
+    assert calls == [('delete', params)]
+    with pytest.raises(TypeError):
+        client.delete()
+
+
+@pytest.mark.parametrize('kwargs, params', DELETE_ARGS)
+def test_async_delete_needs_only_one_of_ids_and_descr(monkeypatch, kwargs, params):
+    client = AsyncProxy6('key')
+    calls = _record_requests(monkeypatch, client, True)
+    assert asyncio.run(client.delete(**kwargs)).count == 1
+    assert calls == [('delete', params)]
+    with pytest.raises(TypeError):
+        asyncio.run(client.delete())
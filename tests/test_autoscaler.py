@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Capacity reconciler tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+from decimal import Decimal
+
+from proxy6 import types
+from proxy6.async_.api import AsyncProxy6
+from proxy6.autoscaler import CapacityActionKind, CapacityReconciler, CapacityTarget
+
+from .utils import FakeAPI, make_proxy, ok, unthrottle
+
+
+def _price(params: dict) -> dict:
+    count, period = int(params['count']), int(params['period'])
+    return ok(price=count * 2, price_single=2, period=period, count=count)
+
+
+def _reconciler(api: FakeAPI, targets: list[CapacityTarget], **kwargs) -> CapacityReconciler:
+    client = AsyncProxy6('key', transport=api.transport())
+    unthrottle(client)
+    return CapacityReconciler(client, targets, **kwargs)
+
+
+def test_targets_share_getcount_pool():
+    api = FakeAPI(
+        getproxy=lambda params: ok(list_count=0, list={}),
+        getcount=lambda params: ok(count=6),
+        getprice=_price
+    )
+    targets = [
+        CapacityTarget(country='ru', count=5, version=types.ProxyVersion.IPV4, type=types.ProxyType.HTTPS),
+        CapacityTarget(country='RU', count=5, version=types.ProxyVersion.IPV4, type=types.ProxyType.SOCKS5),
+        CapacityTarget(country='ru', count=2, version=types.ProxyVersion.IPV6),
+    ]
+    report = asyncio.run(_reconciler(api, targets).plan())
+    buys = [(action.target.type, action.target.version, action.count) for action in report.actions]
+    assert buys == [
+        (types.ProxyType.HTTPS, types.ProxyVersion.IPV4, 5),
+        (types.ProxyType.SOCKS5, types.ProxyVersion.IPV4, 1),
+        (types.ProxyType.HTTPS, types.ProxyVersion.IPV6, 2),
+    ]
+    assert [gap.available for gap in report.gaps] == [6, 1, 6]
+    assert [gap.missing for gap in report.gaps] == [0, 4, 0]
+    assert api.methods().count('getcount') == 2
+
+
+def test_prolongs_expiring_then_deletes_surplus():
+    proxies = {
+        '1': make_proxy('1', date_end='2000-01-01 00:00:00'),
+        '2': make_proxy('2', country='us'),
+        '3': make_proxy('3', country='us', date_end='2030-01-01 00:00:00'),
+    }
+    api = FakeAPI(
+        getproxy=lambda params: ok(list_count=len(proxies), list=proxies),
+        getcount=lambda params: ok(count=0),
+        getprice=_price
+    )
+    targets = [
+        CapacityTarget(country='ru', count=1, version=types.ProxyVersion.IPV4),
+        CapacityTarget(country='us', count=1, version=types.ProxyVersion.IPV4),
+    ]
+    report = asyncio.run(_reconciler(api, targets).plan())
+    actions = [(action.kind, action.ids) for action in report.actions]
+    assert actions == [(CapacityActionKind.PROLONG, ['1']), (CapacityActionKind.DELETE, ['2'])]
+    assert report.cost == Decimal(2)
+
+
+def test_budget_caps_buys():
+    api = FakeAPI(
+        getproxy=lambda params: ok(list_count=0, list={}, balance='5'),
+        getcount=lambda params: ok(count=100, balance='5'),
+        getprice=lambda params: {**_price(params), 'balance': '5'}
+    )
+    report = asyncio.run(_reconciler(api, [CapacityTarget(country='ru', count=10)]).plan())
+    assert [action.count for action in report.actions] == [2]
+    assert report.budget == Decimal(5)
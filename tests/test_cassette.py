@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Record/replay transport tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+
+import httpx
+import pytest
+
+from proxy6 import errors
+from proxy6.async_.api import AsyncProxy6
+from proxy6.cassette import Cassette, CassetteMissError, RecordingTransport, ReplayTransport
+from proxy6.sync.api import Proxy6
+
+from .utils import FakeAPI, make_proxy, ok, unthrottle
+
+
+def _session(client: AsyncProxy6) -> list:
+    async def main():
+        unthrottle(client)
+        results = [(await client.get_count('ru')).count]
+        with pytest.raises(errors.RPSAPIError):
+            await client.get_count('ru')
+        results.append(list((await client.get_proxy()).list))
+        return results
+
+    return asyncio.run(main())
+
+
+def _api() -> FakeAPI:
+    counts = [ok(count=5), httpx.Response(503)]
+    return FakeAPI(
+        getcount=lambda params: counts.pop(0),
+        getproxy=lambda params: ok(list_count=1, list={'1': make_proxy('1')})
+    )
+
+
+def test_replay_matches_recording(tmp_path):
+    path = str(tmp_path / 'cassette.json')
+    cassette = Cassette(path)
+    recording = RecordingTransport(cassette, async_transport=_api().transport())
+    recorded = _session(AsyncProxy6('secret-key', transport=recording))
+    cassette.save()
+    assert 'secret-key' not in open(path, encoding='utf-8').read()
+
+    replay = ReplayTransport(Cassette.load(path), speed=None)
+    assert _session(AsyncProxy6('other-key', transport=replay)) == recorded == [5, ['1']]
+    assert replay.remaining() == 0
+
+
+def test_sync_replay_and_miss():
+    cassette = Cassette()
+    with Proxy6('key', transport=RecordingTransport(cassette, transport=_api().transport())) as client:
+        assert client.get_count('ru').count == 5
+    replay = ReplayTransport(cassette, speed=None)
+    with Proxy6('key', transport=replay) as client:
+        assert client.get_count('ru').count == 5
+        with pytest.raises(CassetteMissError):
+            client.get_count('ru')
+
+
+def test_replay_keeps_recorded_latency():
+    cassette = Cassette(interactions=[{
+        'method': 'GET', 'url': 'https://proxy6.net/api/{apikey}/getcount?country=ru&version=6',
+        'status': 200, 'headers': [], 'body': '{"status": "yes", "user_id": "1", "balance": "1", '
+        '"currency": "RUB", "count": 3}', 'started': 0, 'elapsed': 0.2
+    }])
+
+    async def main():
+        client = AsyncProxy6('key', transport=ReplayTransport(cassette, speed=4))
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert (await client.get_count('ru')).count == 3
+        return loop.time() - started
+
+    assert 0.05 <= asyncio.run(main()) < 0.2
+    with pytest.raises(ValueError):
+        ReplayTransport(cassette, speed=0)
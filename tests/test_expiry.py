@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Expiry scheduler tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import gc
+import logging
+import warnings
+from datetime import datetime, timedelta
+
+from proxy6 import types
+from proxy6.expiry import ExpiryScheduler
+
+from .utils import make_proxy, ok
+
+
+END = datetime(2027, 1, 10)
+EXPIRING = (END - timedelta(days=3)).timestamp()
+
+
+def test_pop_due_fires_leads_in_order():
+    scheduler = ExpiryScheduler()
+    scheduler.schedule('1', END)
+    scheduler.schedule('2', END + timedelta(days=1))
+    assert scheduler.next_fire() == EXPIRING
+    assert scheduler.pop_due(EXPIRING - 1) == []
+    events = scheduler.pop_due(END.timestamp() + timedelta(days=1).total_seconds())
+    assert [(e.id, e.state) for e in events] == [
+        ('1', types.ProxyState.EXPIRING),
+        ('2', types.ProxyState.EXPIRING),
+        ('1', types.ProxyState.EXPIRED),
+        ('2', types.ProxyState.EXPIRED),
+    ]
+    assert scheduler.next_fire() is None
+
+
+def test_reschedule_and_cancel_drop_old_timers():
+    scheduler = ExpiryScheduler()
+    scheduler.schedule('1', END)
+    scheduler.schedule('1', END + timedelta(days=30))
+    scheduler.schedule('2', END)
+    scheduler.cancel('2')
+    assert scheduler.pop_due(END.timestamp()) == []
+    assert len(scheduler) == 1
+
+
+def test_update_from_full_list_cancels_missing():
+    scheduler = ExpiryScheduler()
+    scheduler.schedule('gone', END)
+    resp = types.GetProxyResponse.model_validate(ok(
+        list_count=1, list={'1': make_proxy('1', date_end='2027-01-10 00:00:00')}
+    ))
+    scheduler.update_from(resp)
+    assert len(scheduler) == 1
+    assert [e.id for e in scheduler.pop_due(END.timestamp())] == ['1', '1']
+
+
+def test_fire_due_isolates_failing_callbacks():
+    scheduler = ExpiryScheduler({types.ProxyState.EXPIRED: timedelta(0)})
+    seen = []
+
+    def broken(event):
+        raise RuntimeError('boom')
+
+    scheduler.subscribe(broken)
+    unsubscribe = scheduler.subscribe(seen.append)
+    scheduler.schedule('1', END)
+    assert len(scheduler.fire_due(END.timestamp())) == 1
+    assert [e.id for e in seen] == ['1']
+    unsubscribe()
+    scheduler.schedule('2', END)
+    scheduler.fire_due(END.timestamp())
+    assert len(seen) == 1
+
+
+def test_fire_due_keeps_coroutine_callbacks_running():
+    scheduler = ExpiryScheduler({types.ProxyState.EXPIRED: timedelta(0)})
+    seen = []
+
+    async def notify(event):
+        await asyncio.sleep(0.01)
+        seen.append(event.id)
+
+    scheduler.subscribe(notify)
+
+    async def main():
+        scheduler.schedule('1', END)
+        scheduler.fire_due(END.timestamp())
+        assert len(scheduler._tasks) == 1
+        gc.collect()
+        await asyncio.gather(*scheduler._tasks)
+        assert not scheduler._tasks
+
+    asyncio.run(main())
+    assert seen == ['1']
+
+
+def test_fire_due_without_loop_drops_coroutine_callbacks(caplog):
+    scheduler = ExpiryScheduler({types.ProxyState.EXPIRED: timedelta(0)})
+
+    async def notify(event):
+        pass
+
+    scheduler.subscribe(notify)
+    scheduler.schedule('1', END)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        with caplog.at_level(logging.ERROR, logger='proxy6'):
+            assert len(scheduler.fire_due(END.timestamp())) == 1
+        gc.collect()
+    assert 'outside of an event loop' in caplog.text
+
+
+def test_run_fires_on_time_and_wakes_up_on_schedule():
+    scheduler = ExpiryScheduler({types.ProxyState.EXPIRED: timedelta(0)})
+    seen = []
+
+    async def notify(event):
+        seen.append((event.id, event.state))
+
+    def broken(event):
+        raise RuntimeError('boom')
+
+    scheduler.subscribe(broken)
+    scheduler.subscribe(notify)
+
+    async def main():
+        runner = asyncio.ensure_future(scheduler.run())
+        await asyncio.sleep(0.01)
+        # Scheduled while the runner waits without a timer.
+        scheduler.schedule('1', datetime.now() + timedelta(seconds=0.05))
+        scheduler.schedule('2', datetime.now() + timedelta(days=1))
+        await asyncio.sleep(0.02)
+        assert seen == []
+        await asyncio.sleep(0.1)
+        assert seen == [('1', types.ProxyState.EXPIRED)]
+        assert not runner.done()
+        runner.cancel()
+        await asyncio.gather(runner, return_exceptions=True)
+
+    asyncio.run(main())
+    assert scheduler.next_fire() == scheduler._date_end['2'].timestamp()
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Local gateway tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import base64
+import struct
+
+from proxy6.async_.api import AsyncProxy6
+from proxy6.gateway import ProxyGateway, RotationStrategy
+
+from .utils import FakeAPI, make_proxy, ok, proxy_info, unthrottle
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+
+async def _tunnel(reader, writer, host: str, port: int) -> None:
+    target_reader, target_writer = await asyncio.open_connection(host, port)
+    await asyncio.gather(_pipe(reader, target_writer), _pipe(target_reader, writer))
+
+
+async def _echo_server() -> asyncio.AbstractServer:
+    '''Target stand-in: answers every chunk with 'echo:' and the chunk.
+    '''
+    async def handle(reader, writer):
+        try:
+            while data := await reader.read(65536):
+                writer.write(b'echo:' + data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+
+async def _connect_upstream(seen: list) -> asyncio.AbstractServer:
+    '''Purchased HTTP proxy stand-in: CONNECT with Basic auth, then tunnels.
+    '''
+    async def handle(reader, writer):
+        head = (await reader.readuntil(b'\r\n\r\n')).decode()
+        target = head.split()[1]
+        auth = next(line for line in head.split('\r\n') if line.startswith('Proxy-Authorization'))
+        seen.append((target, base64.b64decode(auth.split()[-1]).decode()))
+        host, _, port = target.rpartition(':')
+        writer.write(b'HTTP/1.1 200 Connection established\r\n\r\n')
+        await _tunnel(reader, writer, host, int(port))
+
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+
+async def _socks_upstream(seen: list) -> asyncio.AbstractServer:
+    '''Purchased SOCKS5 proxy stand-in: username/password auth, then tunnels.
+    '''
+    async def handle(reader, writer):
+        await reader.readexactly(3)
+        writer.write(b'\x05\x02')
+        _, ulen = await reader.readexactly(2)
+        user = await reader.readexactly(ulen)
+        plen, = await reader.readexactly(1)
+        passwd = await reader.readexactly(plen)
+        writer.write(b'\x01\x00')
+        _, _, _, atyp = await reader.readexactly(4)
+        assert atyp == 1
+        host = '.'.join(map(str, await reader.readexactly(4)))
+        port, = struct.unpack('!H', await reader.readexactly(2))
+        seen.append((f'{host}:{port}', f'{user.decode()}:{passwd.decode()}'))
+        writer.write(b'\x05\x00\x00\x01' + bytes(4) + b'\x00\x00')
+        await _tunnel(reader, writer, host, port)
+
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+
+def _port(server: asyncio.AbstractServer) -> int:
+    return server.sockets[0].getsockname()[1]
+
+
+def _upstream(id: str, server: asyncio.AbstractServer, type: str):
+    return proxy_info(id, ip='127.0.0.1', host='127.0.0.1', port=str(_port(server)), type=type, user=f'u{id}', **{'pass': f'p{id}'})
+
+
+async def _http_client(gateway: ProxyGateway, target: int, user: str, password: str):
+    reader, writer = await asyncio.open_connection('127.0.0.1', gateway.port)
+    token = base64.b64encode(f'{user}:{password}'.encode()).decode()
+    writer.write(
+        f'CONNECT 127.0.0.1:{target} HTTP/1.1\r\nProxy-Authorization: Basic {token}\r\n\r\n'.encode()
+    )
+    status = (await reader.readuntil(b'\r\n\r\n')).split(b'\r\n')[0]
+    return status, reader, writer
+
+
+async def _socks_client(gateway: ProxyGateway, target: int, user: str, password: str):
+    reader, writer = await asyncio.open_connection('127.0.0.1', gateway.port)
+    writer.write(b'\x05\x01\x02')
+    assert await reader.readexactly(2) == b'\x05\x02'
+    writer.write(bytes((1, len(user))) + user.encode() + bytes((len(password),)) + password.encode())
+    _, status = await reader.readexactly(2)
+    if status != 0:
+        return status, reader, writer
+    writer.write(b'\x05\x01\x00\x01' + bytes((127, 0, 0, 1)) + struct.pack('!H', target))
+    _, rep, _, _ = await reader.readexactly(4)
+    await reader.readexactly(6)
+    return rep, reader, writer
+
+
+async def _echo(reader, writer, data: bytes) -> bytes:
+    writer.write(data)
+    await writer.drain()
+    return await reader.readexactly(len(data) + 5)
+
+
+def test_http_connect_tunnels_through_upstreams():
+    async def main():
+        echo, seen = await _echo_server(), []
+        upstreams = [await _connect_upstream(seen), await _socks_upstream(seen)]
+        gateway = ProxyGateway(
+            proxies=[_upstream('1', upstreams[0], 'http'), _upstream('2', upstreams[1], 'socks')],
+            port=0, password='secret'
+        )
+        async with gateway:
+            status, reader, writer = await _http_client(gateway, _port(echo), 'alice', 'wrong')
+            assert status.startswith(b'HTTP/1.1 407')
+            writer.close()
+            for _ in range(2):
+                status, reader, writer = await _http_client(gateway, _port(echo), '', 'secret')
+                assert status == b'HTTP/1.1 200 Connection established'
+                assert await _echo(reader, writer, b'ping') == b'echo:ping'
+                writer.close()
+                await writer.wait_closed()
+            # Each upstream got one tunnel, authorized with its own credentials.
+            assert sorted(seen) == [(f'127.0.0.1:{_port(echo)}', 'u1:p1'), (f'127.0.0.1:{_port(echo)}', 'u2:p2')]
+            await asyncio.sleep(0.05)
+            stats = gateway.stats()
+            assert [(s.connections, s.active, s.bytes_sent, s.bytes_received) for s in stats.values()] == [(1, 0, 4, 9)] * 2
+        for server in upstreams + [echo]:
+            server.close()
+
+    asyncio.run(main())
+
+
+def test_socks5_tunnel_keeps_sticky_session():
+    async def main():
+        echo, seen = await _echo_server(), []
+        upstreams = [await _socks_upstream(seen), await _socks_upstream(seen)]
+        gateway = ProxyGateway(
+            proxies=[_upstream('1', upstreams[0], 'socks'), _upstream('2', upstreams[1], 'socks')],
+            port=0, password='secret'
+        )
+        async with gateway:
+            status, reader, writer = await _socks_client(gateway, _port(echo), 'bob', 'wrong')
+            assert status == 1
+            writer.close()
+            for _ in range(3):
+                rep, reader, writer = await _socks_client(gateway, _port(echo), 'bob', 'secret')
+                assert rep == 0
+                assert await _echo(reader, writer, b'hello') == b'echo:hello'
+                writer.close()
+            # One username, one upstream.
+            assert len({auth for _, auth in seen}) == 1 and len(seen) == 3
+        for server in upstreams + [echo]:
+            server.close()
+
+    asyncio.run(main())
+
+
+def test_failed_upstream_is_skipped_and_reported():
+    async def main():
+        echo, seen = await _echo_server(), []
+        good = await _connect_upstream(seen)
+        dead = await asyncio.start_server(lambda r, w: w.close(), '127.0.0.1', 0)
+        gateway = ProxyGateway(
+            proxies=[_upstream('1', dead, 'http'), _upstream('2', good, 'http')], port=0, retries=0
+        )
+        async with gateway:
+            status, _, writer = await _http_client(gateway, _port(echo), '', '')
+            assert status == b'HTTP/1.1 502 Bad Gateway'
+            writer.close()
+            # The failed upstream cools down, the next tunnel goes through the other one.
+            status, reader, writer = await _http_client(gateway, _port(echo), '', '')
+            assert status == b'HTTP/1.1 200 Connection established'
+            assert await _echo(reader, writer, b'x') == b'echo:x'
+            writer.close()
+            assert gateway.stats()['1'].errors == 1
+        for server in (echo, good, dead):
+            server.close()
+
+    asyncio.run(main())
+
+
+def test_watcher_batch_is_applied_with_one_update():
+    inventory = {'1': make_proxy('1')}
+    api = FakeAPI(getproxy=lambda params: ok(list_count=len(inventory), list=dict(inventory)))
+
+    async def main():
+        client = AsyncProxy6('key', transport=api.transport())
+        unthrottle(client)
+        gateway = ProxyGateway(client, port=0)
+        updates = []
+        update = gateway.update
+        gateway.update = lambda proxies: updates.append(1) or update(proxies)
+        await gateway.start()
+        try:
+            await gateway.watcher.stop()
+            updates.clear()
+            inventory.pop('1')
+            inventory.update({str(i): make_proxy(str(i), port=8000 + i) for i in range(2, 52)})
+            events = await gateway.watcher.poll()
+            assert len(events) == 51
+            await asyncio.sleep(0)
+            assert len(updates) == 1
+            assert set(gateway.upstreams) == set(inventory)
+        finally:
+            await gateway.close()
+
+    asyncio.run(main())
+
+
+def test_round_robin_and_sticky_sessions():
+    gateway = ProxyGateway(proxies=[proxy_info('1'), proxy_info('2'), proxy_info('3', active='0')])
+    assert set(gateway.upstreams) == {'1', '2'}
+    assert [gateway.pick().id for _ in range(4)] == ['1', '2', '1', '2']
+    sticky = gateway.pick('user').id
+    assert all(gateway.pick('user').id == sticky for _ in range(3))
+    assert gateway.pick('user', exclude={sticky}).id != sticky
+
+
+def test_least_connections():
+    gateway = ProxyGateway(
+        proxies=[proxy_info('1'), proxy_info('2')], rotation=RotationStrategy.LEAST_CONNECTIONS
+    )
+    gateway.upstreams['1'].stats.active = 3
+    assert gateway.pick().id == '2'
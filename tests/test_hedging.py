@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Hedged requests tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from proxy6.async_.api import AsyncProxy6
+from proxy6.hedging import LatencyTracker
+from proxy6.sync.api import Proxy6
+
+from .utils import ok
+
+
+def test_hedge_delay_uses_percentile():
+    tracker = LatencyTracker(0.5, default_delay=2.0)
+    for seconds in range(1, LatencyTracker.MIN_SAMPLES):
+        tracker.record('getproxy', seconds)
+    assert tracker.hedge_delay('getproxy') == 2.0
+    tracker.record('getproxy', 10)
+    assert tracker.hedge_delay('getproxy') == 6
+    assert LatencyTracker(0.9, samples=10).hedge_delay('getcount') == LatencyTracker.DEFAULT_DELAY
+
+
+def test_percentile_must_be_fraction():
+    with pytest.raises(ValueError):
+        LatencyTracker(95)
+
+
+def test_clients_pass_hedge_percentile():
+    assert AsyncProxy6('key', hedge_percentile=0.5).latency.percentile == 0.5
+    client = Proxy6('key', hedge_percentile=0.75)
+    try:
+        assert client.latency.percentile == 0.75
+    finally:
+        client.close()
+
+
+def test_slow_request_is_hedged():
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+        return httpx.Response(200, json=ok(count=len(calls)))
+
+    async def main():
+        client = AsyncProxy6('key', transport=httpx.MockTransport(handler))
+        client.latency.default_delay = 0.05
+        resp = await client.get_count('ru', hedge=True)
+        assert resp.count == 2
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_writes_are_not_hedged():
+    async def main():
+        with pytest.raises(ValueError):
+            await AsyncProxy6('key').make_request('buy', hedge=True)
+
+    asyncio.run(main())
+
+
+def test_hedge_takes_a_rate_limiter_slot():
+    active, peak = 0, 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.2)
+        active -= 1
+        return httpx.Response(200, json=ok(count=1))
+
+    async def main():
+        client = AsyncProxy6('key', transport=httpx.MockTransport(handler))
+        client.request_delayer.MAX_REQUESTS_PER_INTERVAL = 1
+        client.latency.default_delay = 0.05
+        acquired = []
+        acquire = client.scheduler.acquire
+
+        async def counting(*args, **kwargs):
+            acquired.append(args)
+            return await acquire(*args, **kwargs)
+
+        client.scheduler.acquire = counting
+        await client.get_count('ru', hedge=True)
+        assert len(acquired) == 2
+
+    asyncio.run(main())
+    # The hedge waited for the slot held by the primary request.
+    assert peak == 1
+
+
+def test_sync_slow_request_is_hedged():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) == 1:
+            time.sleep(0.3)
+        return httpx.Response(200, json=ok(count=len(calls)))
+
+    with Proxy6('key', transport=httpx.MockTransport(handler)) as client:
+        client.latency.default_delay = 0.05
+        assert client.get_count('ru', hedge=True).count == 2
+        assert len(client.request_delayer.last_requests) == 2
+    assert len(calls) == 2
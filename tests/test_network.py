@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: DNS cache and warm-up tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import subprocess
+import sys
+import threading
+import time
+
+import httpcore
+import httpx
+import pytest
+
+from proxy6.async_.api import AsyncProxy6
+from proxy6.network import AsyncCachingNetworkBackend, CachingNetworkBackend, DNSCache, install_dns_cache
+from proxy6.sync.api import Proxy6
+
+
+def test_clients_import_without_httpcore():
+    code = (
+        'import sys\n'
+        'from proxy6.async_.api import AsyncProxy6\n'
+        'from proxy6.sync.api import Proxy6\n'
+        'assert "httpcore" not in sys.modules and "proxy6.network" not in sys.modules\n'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_literal_ip_is_not_cached():
+    cache = DNSCache()
+    assert cache.resolve('127.0.0.1', 80) == ['127.0.0.1']
+    assert cache.get('127.0.0.1', 80) is None
+
+
+def test_stale_entry_is_served_while_refreshed():
+    async def main():
+        cache = DNSCache(ttl=0)
+        cache.put('example.com', 443, ['10.0.0.1'])
+        lookups = []
+
+        async def lookup(host, port):
+            lookups.append(host)
+            return ['10.0.0.2']
+
+        cache._lookup = lookup
+        assert await cache.aresolve('example.com', 443) == ['10.0.0.1']
+        assert await cache.aresolve('example.com', 443) == ['10.0.0.1']
+        assert len(cache._tasks) == 1
+        await asyncio.gather(*cache._tasks)
+        assert lookups == ['example.com']
+        assert cache.get('example.com', 443) == (['10.0.0.2'], False)
+        assert not cache._tasks
+
+    asyncio.run(main())
+
+
+class _NoAddresses(DNSCache):
+    def resolve(self, host, port):
+        return []
+
+    async def aresolve(self, host, port):
+        return []
+
+
+def test_connect_without_addresses_raises_connect_error():
+    with pytest.raises(httpcore.ConnectError):
+        CachingNetworkBackend(_NoAddresses()).connect_tcp('example.com', 443)
+
+    async def main():
+        await AsyncCachingNetworkBackend(_NoAddresses()).connect_tcp('example.com', 443)
+
+    with pytest.raises(httpcore.ConnectError):
+        asyncio.run(main())
+
+
+def test_connect_tries_next_address():
+    cache = DNSCache()
+    cache.put('example.com', 443, ['10.0.0.1', '10.0.0.2'])
+    tried = []
+
+    class Backend(httpcore.SyncBackend):
+        def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+            tried.append(host)
+            if host == '10.0.0.1':
+                raise httpcore.ConnectError('refused')
+            return 'stream'
+
+    assert CachingNetworkBackend(cache, Backend()).connect_tcp('example.com', 443) == 'stream'
+    assert tried == ['10.0.0.1', '10.0.0.2']
+
+
+def test_dns_cache_is_installed_only_into_known_pools():
+    cache = DNSCache()
+    transport = httpx.HTTPTransport()
+    assert install_dns_cache(transport, cache)
+    assert isinstance(transport._pool._network_backend, CachingNetworkBackend)
+    assert install_dns_cache(transport, cache)
+    assert not isinstance(transport._pool._network_backend.backend, CachingNetworkBackend)
+    atransport = httpx.AsyncHTTPTransport()
+    assert install_dns_cache(atransport, cache)
+    assert isinstance(atransport._pool._network_backend, AsyncCachingNetworkBackend)
+    # Private layout changed, e.g. in a newer httpx/httpcore: left as is.
+    moved = httpx.HTTPTransport()
+    del moved._pool
+    assert not install_dns_cache(moved, cache)
+    renamed = httpx.HTTPTransport()
+    del renamed._pool._network_backend
+    assert not install_dns_cache(renamed, cache)
+    assert not install_dns_cache(httpx.MockTransport(lambda request: httpx.Response(200)), cache)
+
+
+class _Pings:
+    '''Counts warm-up HEAD requests; API calls are not expected.
+    '''
+
+    def __init__(self, status: int = 200) -> None:
+        self.status = status
+        self.heads = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        assert (request.method, request.url.path) == ('HEAD', '/')
+        with self.lock:
+            self.heads += 1
+        return httpx.Response(self.status)
+
+    async def handle_async(self, request: httpx.Request) -> httpx.Response:
+        return self(request)
+
+
+def test_async_ready_warms_up_and_keeps_connections_alive():
+    pings = _Pings()
+
+    async def main():
+        client = AsyncProxy6('key', transport=httpx.MockTransport(pings.handle_async), warmup=3)
+        client.KEEPALIVE_INTERVAL = 0.05
+        assert await client.ready()
+        assert pings.heads == 3
+        # Waiting again reuses the finished warm-up.
+        assert await client.ready()
+        assert pings.heads == 3
+        await asyncio.sleep(0.17)
+        # Idle for over three intervals: pinged again.
+        assert pings.heads >= 6
+        await client.aclose()
+        assert client._keepalive_task is None
+        heads = pings.heads
+        await asyncio.sleep(0.1)
+        assert pings.heads == heads
+
+    asyncio.run(main())
+
+
+def test_async_ready_reports_failed_warm_up():
+    async def main():
+        client = AsyncProxy6('key', transport=httpx.MockTransport(_Pings(500).handle_async), warmup=2)
+        assert await client.ready() is True
+        failing = AsyncProxy6('key', transport=httpx.MockTransport(_refuse), warmup=2)
+        assert await failing.ready() is False
+        await client.aclose()
+        await failing.aclose()
+        assert await AsyncProxy6('key').ready() is True
+
+    asyncio.run(main())
+
+
+async def _refuse(request: httpx.Request) -> httpx.Response:
+    raise httpx.ConnectError('refused', request=request)
+
+
+def test_sync_warm_up_thread_pings_until_closed():
+    pings = _Pings()
+
+    class Client(Proxy6):
+        KEEPALIVE_INTERVAL = 0.05
+
+    client = Client('key', transport=httpx.MockTransport(pings), warmup=2)
+    assert client.ready(5)
+    assert pings.heads >= 2
+    time.sleep(0.17)
+    assert pings.heads >= 4
+    client.close()
+    assert not any(thread.name == 'proxy6-warmup' for thread in threading.enumerate())
+    heads = pings.heads
+    time.sleep(0.1)
+    assert pings.heads == heads
+    assert Proxy6('key').ready(0)
+
+
+def test_sync_ready_reports_failed_warm_up():
+    def refuse(request):
+        raise httpx.ConnectError('refused', request=request)
+
+    with Proxy6('key', transport=httpx.MockTransport(refuse), warmup=2) as client:
+        assert client.ready(5) is False
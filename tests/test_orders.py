@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Idempotent purchases tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+
+import httpx
+import pytest
+
+from proxy6 import errors, types
+from proxy6.async_.api import AsyncProxy6
+from proxy6.orders import IdempotentBuyer, Order, OrderJournal, OrderState
+
+from .utils import FakeAPI, make_proxy, ok, unthrottle
+
+
+class Shop:
+    '''API stand-in that keeps bought proxies and answers `buy` by a script.
+
+    Each script step is 'ok', '503' (nothing bought), 'timeout' (bought,
+    but the answer is lost) or 'error' (API error).
+    '''
+
+    def __init__(self, *script: str) -> None:
+        self.script = list(script)
+        self.bought: dict[str, dict] = {}
+        self.purchases = 0
+        self.api = FakeAPI(buy=self.buy, getproxy=self.getproxy)
+
+    def buy(self, params: dict):
+        step = self.script.pop(0)
+        if step == '503':
+            return httpx.Response(503)
+        if step == 'error':
+            return {'status': 'no', 'error_id': 400, 'error': 'Error no money'}
+        self.purchases += 1
+        new = {}
+        for _ in range(int(params['count'])):
+            id = str(len(self.bought) + 1)
+            new[id] = self.bought[id] = make_proxy(id, descr=params.get('descr', ''))
+        if step == 'timeout':
+            raise httpx.ReadTimeout('lost answer')
+        return ok(count=len(new), period=params['period'], country=params['country'], list=new)
+
+    def getproxy(self, params: dict) -> dict:
+        found = {id: p for id, p in self.bought.items() if p['descr'] == params.get('descr', p['descr'])}
+        return ok(list_count=len(found), list=found)
+
+    def client(self, **kwargs) -> AsyncProxy6:
+        client = AsyncProxy6('key', transport=self.api.transport(), **kwargs)
+        unthrottle(client)
+        return client
+
+
+def test_lost_answer_is_found_by_tag_without_second_purchase(tmp_path):
+    shop = Shop('503', 'timeout', 'ok')
+    journal = OrderJournal(str(tmp_path / 'orders.jsonl'))
+
+    async def main():
+        client = shop.client(refresh_ahead=True)
+        buyer = IdempotentBuyer(client, journal, settle_delay=0)
+        tag = buyer.make_tag()
+        # A cached empty answer for the tag must not be trusted.
+        assert not (await client.get_proxy(types.ProxyState.ALL, tag)).list
+        return await buyer.buy(2, 30, 'ru', types.ProxyVersion.IPV4, tag=tag)
+
+    resp = asyncio.run(main())
+    assert shop.purchases == 1
+    assert set(resp.list) == {'1', '2'}
+    assert shop.api.methods() == ['getproxy', 'buy', 'getproxy', 'buy', 'getproxy']
+    order, = journal.orders.values()
+    assert order.state == OrderState.DONE and order.ids == ['1', '2']
+
+
+def test_api_error_is_final(tmp_path):
+    shop = Shop('error')
+    journal = OrderJournal(str(tmp_path / 'orders.jsonl'))
+    buyer = IdempotentBuyer(shop.client(), journal, settle_delay=0)
+    with pytest.raises(errors.NoMoneyAPIError):
+        asyncio.run(buyer.buy(1, 30, 'ru'))
+    order, = journal.orders.values()
+    assert order.state == OrderState.FAILED
+    assert shop.api.methods() == ['buy']
+
+
+def test_retries_are_limited(tmp_path):
+    shop = Shop('503', '503')
+    buyer = IdempotentBuyer(shop.client(), retries=1, settle_delay=0)
+    with pytest.raises(errors.RPSAPIError):
+        asyncio.run(buyer.buy(1, 30, 'ru'))
+    assert shop.api.methods() == ['buy', 'getproxy', 'buy', 'getproxy']
+
+
+def test_journal_replay_skips_torn_line(tmp_path):
+    path = tmp_path / 'orders.jsonl'
+    journal = OrderJournal(str(path))
+    order = Order(tag='a', count=1, period=30, country='ru', version=4, type='http')
+    journal.write(order)
+    journal.write(Order(tag='b', count=1, period=30, country='ru', version=4, type='http'))
+    order.state = OrderState.DONE
+    journal.write(order)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"tag": "c", "sta')
+    replayed = OrderJournal(str(path))
+    assert {tag: o.state for tag, o in replayed.orders.items()} == {
+        'a': OrderState.DONE, 'b': OrderState.PENDING
+    }
+    replayed.compact()
+    assert [o.tag for o in OrderJournal(str(path)).pending()] == ['b']
+    assert len(path.read_text().splitlines()) == 1
+
+
+def test_recover_resolves_pending_orders(tmp_path):
+    path = str(tmp_path / 'orders.jsonl')
+    shop = Shop('timeout', 'ok')
+    journal = OrderJournal(path)
+    for tag in ('bought', 'lost', 'again'):
+        journal.write(Order(tag=tag, count=1, period=30, country='ru', version=4, type='http'))
+
+    async def main():
+        client = shop.client()
+        # 'bought' went through before the crash.
+        await client.buy(1, 30, 'ru', descr='bought')
+
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(main())
+    buyer = IdempotentBuyer(shop.client(), OrderJournal(path), settle_delay=0)
+    resolved = asyncio.run(buyer.recover())
+    assert {o.tag: o.state for o in resolved} == {
+        'bought': OrderState.DONE, 'lost': OrderState.FAILED, 'again': OrderState.FAILED
+    }
+    assert shop.purchases == 1
+    assert OrderJournal(path).pending() == []
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Streaming fleet pipeline tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+
+import pytest
+
+from proxy6 import errors
+from proxy6.async_.api import AsyncProxy6
+from proxy6.pipeline import Pipeline
+
+from .utils import FakeAPI, make_proxy, ok, unthrottle
+
+
+def test_full_queue_holds_the_source_back():
+    produced = []
+
+    def items():
+        for i in range(20):
+            produced.append(i)
+            yield i
+
+    async def main():
+        pipeline = Pipeline(queue_size=1).source(items()).map(lambda i: i * 2)
+        stream = pipeline.stream()
+        assert await anext(stream) == 0
+        await asyncio.sleep(0.05)
+        # Two queues of one item, one item held by map and one consumed.
+        assert len(produced) <= 5
+        rest = [item async for item in stream]
+        return pipeline, rest
+
+    pipeline, rest = asyncio.run(main())
+    assert rest == [i * 2 for i in range(1, 20)]
+    assert len(produced) == 20
+    assert pipeline.stats()['source'].blocked > 0
+
+
+def test_batch_flushes_partial_batch_after_max_wait():
+    async def items():
+        for i in range(3):
+            yield i
+        await asyncio.sleep(0.3)
+        yield 3
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        received = []
+        async for batch in Pipeline().source(items()).batch(10, max_wait=0.05).stream():
+            received.append((batch, loop.time() - started))
+        return received
+
+    received = asyncio.run(main())
+    assert [batch for batch, _ in received] == [[0, 1, 2], [3]]
+    # The partial batch didn't wait for the source to go on.
+    assert received[0][1] < 0.2
+
+
+def test_end_reaches_every_worker_of_a_stage():
+    async def slow_square(i):
+        await asyncio.sleep(0.01 * (i % 3))
+        return i * i
+
+    async def main():
+        pipeline = Pipeline(queue_size=2).source(range(20)).map(slow_square, concurrency=4).map(str, concurrency=3)
+        return pipeline, await asyncio.wait_for(pipeline.run(), 5)
+
+    pipeline, result = asyncio.run(main())
+    assert sorted(result, key=int) == [str(i * i) for i in range(20)]
+    stats = pipeline.stats()
+    assert (stats['map'].received, stats['map2'].emitted) == (20, 20)
+    assert all(s.finished is not None for s in stats.values())
+
+
+def test_item_errors_are_counted_and_stage_errors_surface():
+    def invert(i):
+        return 1 / i
+
+    async def main():
+        pipeline = Pipeline().source(range(-2, 3)).map(invert)
+        assert sorted(await pipeline.run()) == [-1, -0.5, 0.5, 1]
+        assert pipeline.stats()['map'].failed == 1
+
+        api = FakeAPI(getproxy=lambda params: {'status': 'no', 'error_id': 100, 'error': 'Error key'})
+        client = AsyncProxy6('key', transport=api.transport())
+        unthrottle(client)
+        with pytest.raises(errors.KeyAPIError):
+            await Pipeline(client).fetch().map(str).run()
+
+    asyncio.run(main())
+
+
+def test_early_exit_cancels_stage_tasks():
+    def endless():
+        i = 0
+        while True:
+            yield i
+            i += 1
+
+    async def main():
+        stream = Pipeline(queue_size=2).source(endless()).map(lambda i: i, concurrency=2).stream()
+        assert [await anext(stream) for _ in range(3)] == [0, 1, 2]
+        tasks = asyncio.all_tasks() - {asyncio.current_task()}
+        # Source, map and its two workers, blocked on full queues.
+        assert len(tasks) == 4 and not any(task.done() for task in tasks)
+        await stream.aclose()
+        assert all(task.cancelled() for task in tasks)
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+
+    asyncio.run(main())
+
+
+def test_fetch_feeds_proxies_to_writes():
+    api = FakeAPI(
+        getproxy=lambda params: ok(list_count=3, list={id: make_proxy(id) for id in '123'}),
+        delete=lambda params: ok(count=len(params['ids'].split(','))),
+    )
+
+    async def main():
+        client = AsyncProxy6('key', transport=api.transport())
+        unthrottle(client)
+        return await Pipeline(client).fetch().batch(2).delete().run()
+
+    assert [resp.count for resp in asyncio.run(main())] == [2, 1]
+    assert api.calls[1:] == [('delete', {'ids': '1,2'}), ('delete', {'ids': '3'})]
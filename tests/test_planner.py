@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Bulk change planner tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+
+import pytest
+
+from proxy6 import types
+from proxy6.async_.api import AsyncProxy6
+from proxy6.inventory import InventoryIndex
+from proxy6.planner import SelectorAction, SelectorPlanner, SetTypePlanner
+
+from .utils import FakeAPI, make_proxy, ok, proxy_info, unthrottle
+
+
+class Fleet:
+    '''API stand-in that keeps proxies and applies writes to them.
+    '''
+
+    def __init__(self, **proxies: dict) -> None:
+        self.proxies = proxies
+        self.failing: set[str] = set()
+        self.api = FakeAPI(
+            getproxy=self.getproxy, settype=self.settype, delete=self.delete, setdescr=self.setdescr
+        )
+
+    def getproxy(self, params: dict) -> dict:
+        found = {
+            id: p for id, p in self.proxies.items()
+            if 'descr' not in params or p['descr'] == params['descr']
+        }
+        return ok(list_count=len(found), list=found)
+
+    def settype(self, params: dict) -> dict:
+        ids = params['ids'].split(',')
+        if self.failing & set(ids):
+            return {'status': 'no', 'error_id': 230, 'error': 'Error ids'}
+        if all(self.proxies[id]['type'] == params['type'] for id in ids):
+            return {'status': 'no', 'error_id': 30, 'error': 'Error unknown'}
+        for id in ids:
+            self.proxies[id]['type'] = params['type']
+        return ok()
+
+    def _select(self, ids: str | None, descr: str | None) -> list[str]:
+        if ids:
+            return [id for id in ids.split(',') if id in self.proxies]
+        return [id for id, p in self.proxies.items() if p['descr'] == descr]
+
+    def delete(self, params: dict) -> dict:
+        found = self._select(params.get('ids'), params.get('descr'))
+        for id in found:
+            del self.proxies[id]
+        return ok(count=len(found))
+
+    def setdescr(self, params: dict) -> dict:
+        found = self._select(params.get('ids'), params.get('old'))
+        for id in found:
+            self.proxies[id]['descr'] = params['new']
+        return ok(count=len(found))
+
+    def inventory(self) -> InventoryIndex:
+        return InventoryIndex(proxy_info(**p) for p in self.proxies.values())
+
+    def client(self) -> AsyncProxy6:
+        client = AsyncProxy6('key', transport=self.api.transport())
+        unthrottle(client)
+        return client
+
+
+def test_set_type_plan_drops_no_ops_and_groups_by_type():
+    inventory = InventoryIndex([
+        proxy_info('1', type='http'), proxy_info('2', type='socks'),
+        proxy_info('3', type='http'), proxy_info('4', type='http'), proxy_info('5', type='socks'),
+    ])
+    planner = SetTypePlanner(AsyncProxy6('key'), inventory, chunk_size=2)
+    plan = planner.diff({
+        '1': types.ProxyType.SOCKS5, '2': types.ProxyType.SOCKS5, '3': types.ProxyType.SOCKS5,
+        '4': types.ProxyType.SOCKS5, '5': types.ProxyType.HTTPS, '9': types.ProxyType.SOCKS5,
+    })
+    assert [(batch.type, batch.ids) for batch in plan.batches] == [
+        (types.ProxyType.SOCKS5, ['1', '3']), (types.ProxyType.SOCKS5, ['4']), (types.ProxyType.HTTPS, ['5']),
+    ]
+    assert plan.unchanged == ['2']
+    assert plan.unknown == ['9']
+
+
+def test_set_type_apply_updates_inventory_and_keeps_failures():
+    fleet = Fleet(**{id: make_proxy(id, type='http') for id in '1234'})
+    fleet.failing.add('4')
+
+    async def main():
+        planner = SetTypePlanner(fleet.client(), chunk_size=3)
+        first = await planner.convert(['1', '2', '3', '4', '9'], types.ProxyType.SOCKS5)
+        # Converting again finds nothing to send, so settype never fails with error 30.
+        return planner, first, await planner.convert(['1', '2', '3'], types.ProxyType.SOCKS5)
+
+    planner, plan, again = asyncio.run(main())
+    # The inventory is loaded once; unknown IDs are skipped, not sent.
+    assert fleet.api.methods().count('getproxy') == 1
+    assert plan.unknown == ['9']
+    assert [(batch.ids, batch.done) for batch in plan.batches] == [(['1', '2', '3'], True), (['4'], False)]
+    assert 'IDsAPIError' in plan.batches[1].error
+    assert plan.changed == 3
+    assert [planner.inventory.get(id).type for id in '1234'] == [types.ProxyType.SOCKS5] * 3 + [types.ProxyType.HTTPS]
+    assert again.batches == []
+    assert again.unchanged == ['1', '2', '3']
+    assert fleet.api.methods().count('settype') == 2
+
+
+def _calls(plan) -> list:
+    return [call.descr or call.ids for call in plan.calls]
+
+
+def test_selector_diff_uses_descr_only_for_whole_groups_worth_it():
+    fleet = Fleet(
+        **{str(i): make_proxy(str(i), descr='a') for i in range(1, 6)},
+        **{str(i): make_proxy(str(i), descr='b') for i in range(6, 8)},
+        **{str(i): make_proxy(str(i), descr='c') for i in range(8, 11)},
+    )
+    planner = SelectorPlanner(AsyncProxy6('key'), fleet.inventory(), chunk_size=2)
+    # 'a' is whole and replaces 3 chunks; 'b' is whole but fits in one chunk;
+    # 'c' is partial, a selector would delete proxy 10 too.
+    plan = planner.diff(['1', '2', '3', '4', '5', '6', '7', '8', '9', '42'], SelectorAction.DELETE)
+    assert _calls(plan) == ['a', ['6', '7'], ['8', '9']]
+    assert plan.covered == {'a': ['1', '2', '3', '4', '5']}
+    assert plan.unknown == ['42']
+    # Without verification a selector wins ties.
+    planner.verify = False
+    assert _calls(planner.diff(['6', '7'], SelectorAction.DELETE)) == ['b']
+
+
+def test_selector_delete_verifies_group_and_updates_inventory():
+    fleet = Fleet(**{str(i): make_proxy(str(i), descr='a') for i in range(1, 6)}, **{'6': make_proxy('6')})
+
+    async def main():
+        planner = SelectorPlanner(fleet.client(), chunk_size=2)
+        return planner, await planner.delete(['1', '2', '3', '4', '5', '6'])
+
+    planner, plan = asyncio.run(main())
+    assert _calls(plan) == ['a', ['6']]
+    assert all(call.done for call in plan.calls)
+    assert ('getproxy', {'state': 'all', 'descr': 'a'}) in fleet.api.calls
+    assert ('delete', {'descr': 'a'}) in fleet.api.calls
+    assert fleet.proxies == {}
+    assert len(planner.inventory) == 0
+
+
+def test_selector_fallback_is_merged_into_id_chunks():
+    fleet = Fleet(**{str(i): make_proxy(str(i), descr='a') for i in range(1, 8)}, **{'20': make_proxy('20')})
+
+    async def main():
+        planner = SelectorPlanner(fleet.client(), fleet.inventory(), chunk_size=3)
+        # The group grew on the server after the inventory was loaded.
+        fleet.proxies['8'] = make_proxy('8', descr='a')
+        return await planner.set_descr(['20', '1', '2', '3', '4', '5', '6', '7'], 'b')
+
+    plan = asyncio.run(main())
+    assert plan.covered == {}
+    assert _calls(plan) == [['20', '1', '2'], ['3', '4', '5'], ['6', '7']]
+    assert fleet.api.methods().count('setdescr') == 3
+    assert fleet.proxies['8']['descr'] == 'a'
+    assert {p['descr'] for id, p in fleet.proxies.items() if id != '8'} == {'b'}
+
+
+def test_selector_set_descr_skips_unchanged_and_needs_new():
+    fleet = Fleet(**{'1': make_proxy('1', descr='b'), '2': make_proxy('2')})
+    planner = SelectorPlanner(AsyncProxy6('key'), fleet.inventory())
+    plan = planner.diff(['1', '2'], SelectorAction.SET_DESCR, 'b')
+    assert plan.unchanged == ['1']
+    assert _calls(plan) == [['2']]
+    with pytest.raises(ValueError):
+        asyncio.run(planner.plan(['2'], SelectorAction.SET_DESCR))
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Pre-flight validation tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+
+import pytest
+
+from proxy6 import errors, types
+from proxy6.account import AccountState
+from proxy6.async_.api import AsyncProxy6
+from proxy6.preflight import PreflightValidator
+
+from .utils import FakeAPI, ok
+
+
+BUY = {'count': 1, 'period': 30, 'country': 'ru', 'version': 4, 'type': 'http'}
+
+
+@pytest.mark.parametrize('method, params, error', [
+    ('buy', {**BUY, 'count': 0}, errors.CountAPIError),
+    ('getprice', {'count': 'x', 'period': 30, 'version': 4}, errors.CountAPIError),
+    ('prolong', {'period': -1, 'ids': '1'}, errors.PeriodAPIError),
+    ('getcount', {'country': 'rus'}, errors.CountryAPIError),
+    ('delete', {'ids': '1,a'}, errors.IDsAPIError),
+    ('buy', {**BUY, 'descr': 'x' * 51}, errors.DescrAPIError),
+    ('setdescr', {'old': 'a', 'new': ''}, errors.DescrAPIError),
+    ('settype', {'ids': '1', 'type': 'ftp'}, errors.TypeAPIError),
+])
+def test_rejects_malformed_params(method, params, error):
+    validator = PreflightValidator()
+    with pytest.raises(error) as info:
+        validator.validate(method, params)
+    assert info.value.raw_response['preflight'] is True
+    assert validator.stats() == {'saved': 1, 'by_method': {method: 1}}
+
+
+def test_accepts_valid_params():
+    validator = PreflightValidator()
+    validator.validate('buy', BUY)
+    validator.validate('getcount', {'country': 'ru'})
+    validator.validate('setdescr', {'old': 'a', 'new': 'b'})
+    assert validator.saved == 0
+
+
+def test_rejects_country_missing_from_cached_list():
+    validator = PreflightValidator()
+    validator.validate('buy', {**BUY, 'country': 'de'})
+    validator.observe('getcountry', {'version': 4}, ok(list=['ru', 'US']))
+    validator.validate('buy', {**BUY, 'country': 'us'})
+    with pytest.raises(errors.CountryAPIError):
+        validator.validate('buy', {**BUY, 'country': 'de'})
+    # Other versions have no cached list.
+    validator.validate('buy', {**BUY, 'country': 'de', 'version': 6})
+
+
+def test_rejects_buy_above_known_balance():
+    account = AccountState()
+    validator = PreflightValidator(account)
+    validator.observe('getprice', {'version': 4, 'period': 30, 'count': 2}, ok(price=50))
+    account.update(ok(balance='40'))
+    # A smaller order isn't bounded by the price of a bigger one.
+    validator.validate('buy', BUY)
+    with pytest.raises(errors.NoMoneyAPIError):
+        validator.validate('buy', {**BUY, 'count': 3})
+    with pytest.raises(errors.NoMoneyAPIError):
+        validator.validate('buy', {**BUY, 'count': 2, 'period': 60})
+    account.update(ok(balance='60'))
+    validator.validate('buy', {**BUY, 'count': 3})
+
+
+def test_expired_cache_is_ignored():
+    validator = PreflightValidator(cache_ttl=0)
+    validator.observe('getcountry', {'version': 4}, ok(list=['ru']))
+    validator.validate('buy', {**BUY, 'country': 'de'})
+
+
+def test_client_sends_nothing_for_rejected_call():
+    api = FakeAPI(getcount=lambda params: ok(count=10))
+
+    async def main():
+        client = AsyncProxy6('key', preflight=True, transport=api.transport())
+        with pytest.raises(errors.CountryAPIError):
+            await client.get_count('russia')
+        assert (await client.get_count('ru', types.ProxyVersion.IPV4)).count == 10
+
+    asyncio.run(main())
+    assert api.methods() == ['getcount']
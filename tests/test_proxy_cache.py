@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: getproxy parse cache tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+
+from proxy6 import types
+from proxy6.async_.api import AsyncProxy6
+from proxy6.proxy_cache import ProxyListCache
+
+from .utils import FakeAPI, make_proxy, ok, unthrottle
+
+
+def _resp(*proxies: dict, **fields) -> dict:
+    return ok(list_count=len(proxies), list={proxy['id']: proxy for proxy in proxies}, **fields)
+
+
+def test_unchanged_list_reuses_models():
+    cache = ProxyListCache()
+    first = cache.build(_resp(make_proxy('1'), make_proxy('2')))
+    second = cache.build(_resp(make_proxy('1'), make_proxy('2'), balance='90'))
+    assert cache.hits == 1
+    assert cache.parsed == 2
+    assert second.balance == 90
+    assert all(second.list[id] is first.list[id] for id in ('1', '2'))
+    # Each response gets its own dict.
+    assert second.list is not first.list
+    second.list.pop('1')
+    assert '1' in cache.build(_resp(make_proxy('1'), make_proxy('2'))).list
+
+
+def test_only_changed_entries_are_parsed():
+    cache = ProxyListCache()
+    first = cache.build(_resp(make_proxy('1'), make_proxy('2')))
+    second = cache.build(_resp(make_proxy('1'), make_proxy('2', descr='new'), make_proxy('3')))
+    assert cache.parsed == 4
+    assert second.list['1'] is first.list['1']
+    assert second.list['2'].descr == 'new'
+    assert set(second.list) == {'1', '2', '3'}
+
+
+def test_list_format_and_keys_are_separate():
+    cache = ProxyListCache()
+    cache.build(ok(list_count=1, list=[make_proxy('1')]), key='a')
+    cache.build(_resp(make_proxy('1')), key='b')
+    assert cache.parsed == 2
+    cache.build(_resp(make_proxy('1')), key='a')
+    assert cache.hits == 1
+
+
+def test_least_recently_used_keys_are_dropped():
+    cache = ProxyListCache(max_keys=2)
+    for key in ('a', 'b', 'a', 'c'):
+        cache.build(_resp(make_proxy('1')), key=key)
+    assert list(cache._lists) == ['a', 'c']
+    cache.build(_resp(make_proxy('1')), key='b')
+    assert cache.parsed == 4
+
+
+def test_client_reuses_models_per_state_and_descr():
+    api = FakeAPI(getproxy=lambda params: _resp(make_proxy('1', descr=params.get('descr', ''))))
+
+    async def main():
+        client = AsyncProxy6('key', reuse_proxy_models=True, transport=api.transport())
+        unthrottle(client)
+        first = await client.get_proxy()
+        assert (await client.get_proxy()).list['1'] is first.list['1']
+        tagged = await client.get_proxy(types.ProxyState.ALL, 'tag')
+        assert tagged.list['1'].descr == 'tag'
+        assert client.proxy_cache.hits == 1
+
+    asyncio.run(main())
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Refresh-ahead cache tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+
+import httpx
+import pytest
+
+from proxy6 import errors, types
+from proxy6.async_.api import AsyncProxy6
+from proxy6.autoscaler import CapacityReconciler
+from proxy6.pipeline import Pipeline
+from proxy6.planner import SelectorAction, SelectorPlanner, SetTypePlanner
+from proxy6.refresh_ahead import RefreshAheadCache
+
+from .utils import FakeAPI, make_proxy, ok, unthrottle
+
+
+class Source:
+    '''Counts fetches and returns a new value for each.
+    '''
+
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.fetches = 0
+        self.refreshes = 0
+
+    async def fetch(self) -> dict:
+        self.fetches += 1
+        await asyncio.sleep(self.delay)
+        return {'n': self.fetches + self.refreshes}
+
+    async def refresh(self) -> dict:
+        self.refreshes += 1
+        await asyncio.sleep(self.delay)
+        return {'n': self.fetches + self.refreshes}
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def main():
+        cache, source = RefreshAheadCache(), Source(0.01)
+        results = await asyncio.gather(*(
+            cache.get('getcount', {'country': 'ru'}, source.fetch, source.refresh) for _ in range(5)
+        ))
+        assert results == [{'n': 1}] * 5
+        assert source.fetches == 1
+        assert (cache.hits, cache.misses) == (4, 1)
+        await cache.get('getcount', {'country': 'us'}, source.fetch, source.refresh)
+        assert source.fetches == 2
+
+    asyncio.run(main())
+
+
+def test_hot_key_is_refreshed_ahead_in_background():
+    async def main():
+        cache = RefreshAheadCache(ttls={'getcount': 0.2}, ahead=0.5, min_hits=1)
+        source = Source(0.05)
+        get = lambda: cache.get('getcount', None, source.fetch, source.refresh)
+        assert await get() == {'n': 1}
+        assert await get() == {'n': 1}
+        await asyncio.sleep(0.12)
+        # Inside the refresh window: served from cache while refreshed.
+        assert await get() == {'n': 1}
+        assert cache.prefetches == 1
+        await asyncio.sleep(0.1)
+        assert await get() == {'n': 2}
+        assert (source.fetches, source.refreshes) == (1, 1)
+
+    asyncio.run(main())
+
+
+def test_prefetch_rate_is_limited():
+    async def main():
+        cache = RefreshAheadCache(ttls={'getcount': 0.1}, ahead=1, min_hits=1, max_prefetch_rate=0)
+        source = Source()
+        for _ in range(3):
+            await cache.get('getcount', None, source.fetch, source.refresh)
+        assert source.refreshes == 0
+        assert cache.prefetch_skipped == 1
+
+    asyncio.run(main())
+
+
+def test_write_drops_responses_and_inflight_reads():
+    async def main():
+        cache, source = RefreshAheadCache(), Source(0.05)
+        await cache.get('getproxy', None, source.fetch, source.refresh)
+        await cache.get('getcountry', None, source.fetch, source.refresh)
+        cache.invalidate('delete')
+        assert await cache.get('getcountry', None, source.fetch, source.refresh) == {'n': 2}
+        # A read that started before the write is returned but not stored.
+        read = asyncio.create_task(cache.get('getproxy', None, source.fetch, source.refresh))
+        await asyncio.sleep(0.01)
+        cache.invalidate('setdescr')
+        assert await read == {'n': 3}
+        assert await cache.get('getproxy', None, source.fetch, source.refresh) == {'n': 4}
+
+    asyncio.run(main())
+
+
+def test_failed_fetch_is_not_cached():
+    async def main():
+        cache = RefreshAheadCache()
+
+        async def fail():
+            raise errors.RPSAPIError('busy')
+
+        with pytest.raises(errors.RPSAPIError):
+            await cache.get('getcount', None, fail, fail)
+        assert await cache.get('getcount', None, Source().fetch, fail) == {'n': 1}
+
+    asyncio.run(main())
+
+
+def test_failed_write_invalidates_cached_reads():
+    deletes = []
+
+    def delete(params):
+        deletes.append(params)
+        return httpx.Response(503) if len(deletes) == 1 else ok(count=1)
+
+    api = FakeAPI(getproxy=lambda params: ok(list_count=0, list={}), delete=delete)
+
+    async def main():
+        client = AsyncProxy6('key', transport=api.transport(), refresh_ahead=True)
+        unthrottle(client)
+        await client.get_proxy()
+        await client.get_proxy()
+        with pytest.raises(errors.RPSAPIError):
+            await client.delete(['1'])
+        await client.get_proxy()
+        await client.delete(['1'])
+        await client.get_proxy()
+        await client.get_proxy(cached=False)
+
+    asyncio.run(main())
+    assert api.methods() == ['getproxy', 'delete', 'getproxy', 'delete', 'getproxy', 'getproxy']
+
+
+def test_plan_then_write_callers_read_past_the_cache():
+    proxies = {id: make_proxy(id, descr='a') for id in '123'}
+    api = FakeAPI(
+        getproxy=lambda params: ok(list_count=len(proxies), list=proxies),
+        delete=lambda params: ok(count=1),
+    )
+
+    async def main():
+        client = AsyncProxy6('key', transport=api.transport(), refresh_ahead=True)
+        unthrottle(client)
+        await client.get_proxy()
+        await client.get_proxy(types.ProxyState.ACTIVE)
+        await client.get_proxy(descr='a')
+        reads = lambda: api.methods().count('getproxy')
+        assert reads() == 3
+        # Read-only callers may be answered from the cache.
+        assert [p.id async for p in Pipeline(client).fetch().stream()] == ['1', '2', '3']
+        assert reads() == 3
+        await SetTypePlanner(client).refresh()
+        await SelectorPlanner(client, chunk_size=1).plan(['1', '2', '3'], SelectorAction.DELETE)
+        await CapacityReconciler(client, []).plan()
+        await Pipeline(client).fetch().batch(2).delete().run()
+        # refresh, selector plan and verify, reconciler, write pipeline.
+        assert reads() == 8
+
+    asyncio.run(main())
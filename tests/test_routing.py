@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Per-target latency routing tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import socket
+
+import pytest
+
+from proxy6.routing import RoutingTable, measure_route
+
+from .utils import proxy_info
+
+
+async def _connect_proxy(delays: dict[str, float | None]) -> asyncio.AbstractServer:
+    '''Local HTTP CONNECT stand-in: answers after the per-host delay, 502 for None.
+    '''
+    async def handle(reader, writer):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+            host = head.split()[1].decode().rsplit(':', 1)[0]
+            if delays.get(host) is None:
+                writer.write(b'HTTP/1.1 502 Bad Gateway\r\n\r\n')
+            else:
+                await asyncio.sleep(delays[host])
+                writer.write(b'HTTP/1.1 200 Connection established\r\n\r\n')
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+
+async def _socks_proxy() -> asyncio.AbstractServer:
+    '''Local SOCKS5 stand-in accepting any username/password.
+    '''
+    async def handle(reader, writer):
+        try:
+            await reader.readexactly(3)
+            writer.write(b'\x05\x02')
+            _, ulen = await reader.readexactly(2)
+            await reader.readexactly(ulen)
+            plen, = await reader.readexactly(1)
+            await reader.readexactly(plen)
+            writer.write(b'\x01\x00')
+            _, _, _, atyp = await reader.readexactly(4)
+            length, = await reader.readexactly(1) if atyp == 3 else (4,)
+            await reader.readexactly(length + 2)
+            writer.write(b'\x05\x00\x00\x01' + bytes(4) + b'\x00\x00')
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+
+def _port(server: asyncio.AbstractServer) -> int:
+    return server.sockets[0].getsockname()[1]
+
+
+def _closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_best_proxies_per_target():
+    async def main():
+        servers = [
+            await _connect_proxy({'a.test': 0.05, 'b.test': 0.3}),
+            await _connect_proxy({'a.test': 0.2, 'b.test': 0.05}),
+            await _connect_proxy({'a.test': None, 'b.test': 0.1}),
+        ]
+        socks = await _socks_proxy()
+        proxies = [proxy_info(str(i), host='127.0.0.1', port=_port(s)) for i, s in enumerate(servers)]
+        proxies.append(proxy_info('socks', host='127.0.0.1', port=_port(socks), type='socks'))
+        proxies.append(proxy_info('dead', host='127.0.0.1', port=_closed_port()))
+        table = RoutingTable(['a.test', 'b.test:8443'], proxies, top_k=3, timeout=1, concurrency=4)
+        try:
+            await table.measure()
+        finally:
+            for server in servers + [socks]:
+                server.close()
+        return table
+
+    table = asyncio.run(main())
+    assert [p.id for p in table.best('a.test')][1:] == ['0', '1']
+    assert table.best('a.test')[0].id == 'socks'
+    assert [p.id for p in table.best(('b.test', 8443), 2)] == ['socks', '1']
+    failed = table.stats('2', 'a.test')
+    assert (failed.samples, failed.success_rate, failed.latency) == (1, 0.0, 1)
+    assert table.stats('dead', 'b.test:8443').success_rate == 0.0
+    assert all(p.id not in ('2', 'dead') for p in table.best('a.test'))
+    with pytest.raises(KeyError):
+        table.best('c.test')
+
+
+def test_measure_route_without_target_times_tcp_connect():
+    async def main():
+        server = await _connect_proxy({})
+        try:
+            proxy = proxy_info('1', host='127.0.0.1', port=_port(server))
+            assert await measure_route(proxy, timeout=1) is not None
+            assert await measure_route(proxy, 'a.test', 443, timeout=1) is None
+        finally:
+            server.close()
+
+    asyncio.run(main())
+
+
+def test_update_keeps_measurements_and_record_smooths():
+    table = RoutingTable(['a.test'], [proxy_info('1'), proxy_info('2')], alpha=0.5, timeout=4)
+    table.record('1', 'a.test', 1.0)
+    table.record('1', 'a.test', None)
+    assert table.stats('1', 'a.test').latency == 2.5
+    assert table.stats('1', 'a.test').success_rate == 0.5
+    table.update([proxy_info('3'), proxy_info('1')])
+    assert table.stats('1', 'a.test').samples == 2
+    assert table.stats('3', 'a.test').samples == 0
+    assert [p.id for p in table.best('a.test')] == ['1']
+    with pytest.raises(KeyError):
+        table.stats('2', 'a.test')
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Request scheduler tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import time
+
+import pytest
+
+from proxy6 import errors
+from proxy6.async_.scheduler import RequestPriority, RequestScheduler, method_priority, request_priority
+
+
+class GateDelayer:
+    '''Rate limiter that hands out a slot only when the test opens it.
+    '''
+
+    def __init__(self) -> None:
+        self.slots = asyncio.Semaphore(0)
+        self.released = 0
+        self.cancelled = 0
+
+    async def acquire(self) -> dict[str, float]:
+        await self.slots.acquire()
+        return {'start': time.time()}
+
+    def release(self, record: dict[str, float]) -> None:
+        self.released += 1
+
+    def cancel(self, record: dict[str, float]) -> None:
+        self.cancelled += 1
+
+    def open(self, count: int = 1) -> None:
+        for _ in range(count):
+            self.slots.release()
+
+
+async def _drain(delayer: GateDelayer, tasks: list[asyncio.Task], requests: int) -> None:
+    # One slot at a time, so the order is decided by the scheduler only.
+    for _ in range(requests):
+        delayer.open()
+        await asyncio.sleep(0.01)
+    await asyncio.gather(*tasks)
+
+
+def test_priority_classes_then_round_robin_callers():
+    async def main():
+        delayer = GateDelayer()
+        scheduler = RequestScheduler(delayer)
+        order = []
+
+        async def call(name, priority, caller):
+            await scheduler.run(lambda: asyncio.sleep(0, order.append(name)), priority, caller=caller)
+
+        requests = [
+            ('a1', RequestPriority.READ, 'a'), ('a2', RequestPriority.READ, 'a'),
+            ('a3', RequestPriority.READ, 'a'), ('b1', RequestPriority.READ, 'b'),
+            ('bg', RequestPriority.BACKGROUND, 'c'), ('w', RequestPriority.WRITE, 'c'),
+        ]
+        tasks = [asyncio.create_task(call(*request)) for request in requests]
+        await asyncio.sleep(0.01)
+        await _drain(delayer, tasks, len(tasks))
+        assert order == ['w', 'a1', 'b1', 'a2', 'a3', 'bg']
+        assert delayer.released == len(requests)
+        stats = scheduler.stats()
+        assert stats['read']['dispatched'] == 4
+        assert stats['read']['depth'] == 0
+
+    asyncio.run(main())
+
+
+def test_caller_defaults_to_task_name():
+    async def main():
+        delayer = GateDelayer()
+        scheduler = RequestScheduler(delayer)
+        order = []
+
+        async def batch(name, count):
+            for i in range(count):
+                await scheduler.run(lambda: asyncio.sleep(0, order.append(name)))
+
+        tasks = [
+            asyncio.create_task(batch('big', 3), name='big'),
+            asyncio.create_task(batch('small', 1), name='small'),
+        ]
+        await asyncio.sleep(0.01)
+        await _drain(delayer, tasks, 4)
+        assert order.index('small') == 1
+
+    asyncio.run(main())
+
+
+def test_expired_deadline_is_dropped_without_slot():
+    async def main():
+        delayer = GateDelayer()
+        scheduler = RequestScheduler(delayer)
+        called = []
+        with pytest.raises(errors.DeadlineAPIError):
+            await scheduler.run(lambda: asyncio.sleep(0, called.append(1)), deadline=time.monotonic() - 1)
+        with pytest.raises(errors.DeadlineAPIError):
+            await scheduler.run(lambda: asyncio.sleep(0, called.append(1)), deadline=time.monotonic() + 0.05)
+        assert called == []
+        assert scheduler.stats()['read']['dropped'] == 2
+        # The slot freed by the dropped waiter goes to the next request.
+        task = asyncio.create_task(scheduler.run(lambda: asyncio.sleep(0, called.append(2))))
+        await asyncio.sleep(0.01)
+        delayer.open()
+        await task
+        assert called == [2]
+
+    asyncio.run(main())
+
+
+def test_queued_request_past_deadline_is_skipped():
+    async def main():
+        delayer = GateDelayer()
+        scheduler = RequestScheduler(delayer)
+        order = []
+
+        async def call(name, deadline):
+            await scheduler.run(lambda: asyncio.sleep(0, order.append(name)), deadline=deadline, caller=name)
+
+        late = asyncio.create_task(call('late', time.monotonic() + 0.05))
+        other = asyncio.create_task(call('other', None))
+        await asyncio.sleep(0.1)
+        delayer.open()
+        await other
+        with pytest.raises(errors.DeadlineAPIError):
+            await late
+        assert order == ['other']
+        assert delayer.cancelled == 0
+
+    asyncio.run(main())
+
+
+def test_method_priority():
+    assert method_priority('buy') == RequestPriority.WRITE
+    assert method_priority('getproxy') == RequestPriority.READ
+    token = request_priority.set(RequestPriority.BACKGROUND)
+    try:
+        assert method_priority('buy') == RequestPriority.BACKGROUND
+    finally:
+        request_priority.reset(token)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Shared memory inventory tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+
+from proxy6 import types
+from proxy6.async_.api import AsyncProxy6
+from proxy6.shared_inventory import InventoryPublisher, InventoryReader, InventorySnapshot, encode
+
+from .utils import FakeAPI, make_proxy, ok, proxy_info, unthrottle
+
+
+PROXIES = [
+    proxy_info('20', descr='тег', type='socks', port='1080'),
+    proxy_info('3', ip='2001:db8::1', host='2001:db8::1', version='6', country=None, descr=None),
+    proxy_info('100', active='0', date_end='2026-02-01 12:30:00'),
+]
+
+
+def test_encode_round_trip():
+    snapshot = InventorySnapshot(encode(PROXIES + [PROXIES[0]], 7))
+    assert (snapshot.version, len(snapshot)) == (7, 3)
+    assert [proxy.id for proxy in snapshot] == ['100', '20', '3']
+    for proxy in PROXIES:
+        assert snapshot.get(proxy.id) == proxy
+    assert snapshot.get('4') is None
+    assert snapshot.text(snapshot.find('20'), 'descr') == 'тег'
+
+
+def test_columns_and_expiry_scan():
+    snapshot = InventorySnapshot(encode(PROXIES, 1))
+    assert list(snapshot.column('port')) == [8000, 1080, 8000]
+    assert snapshot.ending_before(datetime(2026, 6, 1)) == [snapshot.find('100')]
+
+
+def test_empty_and_foreign_buffers():
+    assert list(InventorySnapshot(encode([], 1))) == []
+    with pytest.raises(ValueError):
+        InventorySnapshot(b'NOTINVEN' + bytes(64))
+
+
+def test_reader_follows_published_versions(tmp_path):
+    path = str(tmp_path / 'inventory')
+    publisher = InventoryPublisher(path)
+    reader = InventoryReader(path)
+    with pytest.raises(FileNotFoundError):
+        reader.snapshot()
+    assert publisher.publish(PROXIES[:1]) == 1
+    old = reader.snapshot()
+    assert reader.snapshot() is old
+    publisher.publish(PROXIES)
+    assert reader.version == 2
+    # Old snapshots keep the replaced file mapped.
+    assert [proxy.id for proxy in old] == ['20']
+    assert os.listdir(tmp_path) == ['inventory']
+    # A restarted publisher continues the version sequence.
+    assert InventoryPublisher(path).publish([]) == 3
+
+
+@pytest.mark.parametrize('mode', [None, 0o440])
+def test_published_file_is_read_only(tmp_path, monkeypatch, mode):
+    path = str(tmp_path / 'inventory')
+    publisher = InventoryPublisher(path) if mode is None else InventoryPublisher(path, mode=mode)
+    created = []
+    real_open = os.open
+
+    def tracking_open(file, flags, mode=0o777, **kwargs):
+        created.append((file, mode))
+        return real_open(file, flags, mode, **kwargs)
+
+    monkeypatch.setattr(os, 'open', tracking_open)
+    # A temporary file left by a crashed publisher doesn't block the next one.
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb'):
+        pass
+    os.chmod(tmp, 0o400)
+    publisher.publish(PROXIES)
+    assert created == [(tmp, 0o600)]
+    assert os.stat(path).st_mode & 0o777 == (mode or 0o400)
+    assert os.listdir(tmp_path) == ['inventory']
+
+
+def test_refresh_publishes_get_proxy(tmp_path):
+    api = FakeAPI(getproxy=lambda params: ok(list_count=2, list={'1': make_proxy('1'), '2': make_proxy('2')}))
+    path = str(tmp_path / 'inventory')
+
+    async def main():
+        client = AsyncProxy6('key', transport=api.transport())
+        unthrottle(client)
+        publisher = InventoryPublisher(path, client, types.ProxyState.ACTIVE, 'pool', interval=60)
+        publisher.start()
+        await asyncio.sleep(0.05)
+        await publisher.stop()
+
+    asyncio.run(main())
+    assert api.calls == [('getproxy', {'state': 'active', 'descr': 'pool'})]
+    assert [proxy.id for proxy in InventoryReader(path).snapshot()] == ['1', '2']
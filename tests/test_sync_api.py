@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Thread-safe sync client tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import threading
+import time
+
+import httpx
+import pytest
+
+from proxy6 import errors, types
+from proxy6.sync.api import Proxy6, RequestDelayer
+
+from .utils import FakeAPI, make_proxy, ok, unthrottle
+
+
+INTERVAL = 0.1
+
+
+def _client(api: FakeAPI, **kwargs) -> Proxy6:
+    client = Proxy6('key', transport=api.transport(), **kwargs)
+    client.RPS_RETRY_DELAY = 0
+    unthrottle(client)
+    return client
+
+
+def test_delayer_waits_for_a_finished_slot_to_expire():
+    delayer = RequestDelayer()
+    delayer.REQUESTS_SECONDS_INTERVAL = INTERVAL
+    first, second = delayer.acquire(), delayer.acquire()
+    delayer.release(first)
+    delayer.release(second)
+    started = time.monotonic()
+    delayer.release(delayer.acquire())
+    assert time.monotonic() - started >= INTERVAL * 0.9
+
+
+def test_delayer_deadline_and_wake_up_on_release():
+    delayer = RequestDelayer()
+    held = [delayer.acquire(), delayer.acquire()]
+    # Both slots are in flight: nothing to wait for but the deadline.
+    with pytest.raises(errors.DeadlineAPIError):
+        delayer.acquire(time.monotonic() + 0.05)
+    delayer.REQUESTS_SECONDS_INTERVAL = 0
+    threading.Timer(0.05, delayer.release, held[:1]).start()
+    started = time.monotonic()
+    delayer.acquire(time.monotonic() + 5)
+    assert 0.04 <= time.monotonic() - started < 1
+
+
+def test_threads_share_the_rate_limit():
+    starts: list[float] = []
+    lock = threading.Lock()
+
+    def count(params):
+        with lock:
+            starts.append(time.monotonic())
+        return ok(count=1)
+
+    client = Proxy6('key', transport=FakeAPI(getcount=count).transport())
+    client.request_delayer.REQUESTS_SECONDS_INTERVAL = INTERVAL
+    threads = [threading.Thread(target=client.get_count, args=('ru',)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    starts.sort()
+    assert len(starts) == 8
+    limit = client.request_delayer.MAX_REQUESTS_PER_INTERVAL
+    # No more than `limit` requests start within any interval.
+    assert all(later - earlier >= INTERVAL * 0.9 for earlier, later in zip(starts, starts[limit:]))
+
+
+def test_rps_errors_are_retried():
+    script = [httpx.Response(503), httpx.Response(503), ok(count=3)]
+    api = FakeAPI(getcount=lambda params: script.pop(0))
+    with _client(api) as client:
+        assert client.get_count('ru').count == 3
+        assert api.methods() == ['getcount'] * 3
+        api.handlers['getcount'] = lambda params: httpx.Response(503)
+        with pytest.raises(errors.RPSAPIError):
+            client.get_count('ru')
+        assert len(api.calls) == 3 + client.RPS_RETRIES + 1
+        api.handlers['getcount'] = lambda params: httpx.Response(500)
+        with pytest.raises(errors.UnexpectedAPIError):
+            client.get_count('ru')
+        assert len(api.calls) == 3 + client.RPS_RETRIES + 2
+
+
+def test_map_keeps_order_and_collects_errors():
+    def check(params):
+        if params['ids'] == 'bad':
+            return {'status': 'no', 'error_id': 230, 'error': 'Error ids'}
+        time.sleep(0.01 * int(params['ids']))
+        return ok(proxy_id=params['ids'], proxy_status=params['ids'] != '2')
+
+    with _client(FakeAPI(check=check), max_workers=4) as client:
+        results = client.map_check(['3', '1', '2'])
+        assert [(r.proxy_id, r.proxy_status) for r in results] == [('3', True), ('1', True), ('2', False)]
+        results = client.map_check(['1', 'bad'], return_exceptions=True)
+        assert isinstance(results[1], errors.IDsAPIError)
+        with pytest.raises(errors.IDsAPIError):
+            client.map_check(['1', 'bad'])
+        assert client.map(lambda a, b: a + b, [(1, 2), (3, 4)]) == [3, 7]
+
+
+def test_map_helpers_pass_their_arguments():
+    api = FakeAPI(
+        getcount=lambda params: ok(count=len(params['country'])),
+        getprice=lambda params: ok(
+            price=int(params['count']) * int(params['period']), price_single=1,
+            period=int(params['period']), count=int(params['count'])
+        ),
+        getproxy=lambda params: ok(list_count=1, list={'1': make_proxy('1', descr=params['descr'])}),
+    )
+    with _client(api) as client:
+        counts = client.map_get_count(['ru', 'usa'], types.ProxyVersion.IPV4)
+        prices = client.map_get_price([(1, 30), (10, 7)])
+        proxies = client.map_get_proxy(['a', 'b'], types.ProxyState.ACTIVE)
+    assert [r.count for r in counts] == [2, 3]
+    assert [float(r.price) for r in prices] == [30, 70]
+    assert [r.list['1'].descr for r in proxies] == ['a', 'b']
+    assert sorted(params['version'] for method, params in api.calls if method == 'getcount') == ['4', '4']
+    assert {params['state'] for method, params in api.calls if method == 'getproxy'} == {'active'}
+
+
+def test_nested_map_runs_inline_instead_of_deadlocking():
+    api = FakeAPI(getcount=lambda params: ok(count=len(params['country'])))
+    client = _client(api, max_workers=1)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(
+        client.map(lambda countries: [r.count for r in client.map_get_count(countries)], [(['ru', 'usa'],)])
+    ), daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    client.close()
+    assert result == [[[2, 3]]]
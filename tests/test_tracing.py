@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Request tracing tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+
+import httpx
+import pytest
+
+from proxy6 import errors, tracing
+from proxy6.async_.api import AsyncProxy6
+from proxy6.sync.api import Proxy6
+
+from .utils import FakeAPI, ok, unthrottle
+
+
+# httpx `trace` events of one request, as httpcore reports them.
+EVENTS = [
+    'connection.connect_tcp.started', 'connection.connect_tcp.complete',
+    'connection.start_tls.started', 'connection.start_tls.complete',
+    'http11.send_request_headers.started', 'http11.send_request_body.complete',
+    'http11.receive_response_headers.complete',
+    'http11.receive_response_body.started', 'http11.receive_response_body.complete',
+]
+NETWORK = ['dns', 'connect', 'tls', 'send', 'ttfb', 'body']
+
+
+def _network(request: httpx.Request) -> None:
+    # What the DNS cache of `proxy6.network` marks before connecting.
+    tracing.mark_current('dns.started')
+    tracing.mark_current('dns.complete')
+
+
+def _sync_handler(api: FakeAPI):
+    def handle(request: httpx.Request) -> httpx.Response:
+        _network(request)
+        for name in EVENTS:
+            request.extensions['trace'](name, {})
+        return api(request)
+
+    return handle
+
+
+def _async_handler(api: FakeAPI):
+    async def handle(request: httpx.Request) -> httpx.Response:
+        _network(request)
+        for name in EVENTS:
+            await request.extensions['trace'](name, {})
+        return api(request)
+
+    return handle
+
+
+def _phases(tracer: tracing.RecordingTracer, method: str) -> list[str]:
+    parent = next(span for span in tracer.spans if span.name == f'proxy6 {method}')
+    assert parent.end_time >= max(span.end_time for span in tracer.spans if span.parent is parent)
+    return [span.name.removeprefix('proxy6.') for span in tracer.spans if span.parent is parent]
+
+
+def test_async_phase_breakdown():
+    api = FakeAPI(getcount=lambda params: ok(count=5))
+    tracer = tracing.RecordingTracer()
+
+    async def main():
+        client = AsyncProxy6('key', transport=httpx.MockTransport(_async_handler(api)))
+        unthrottle(client)
+        client.tracer = tracer
+        return await client.get_count('ru')
+
+    assert asyncio.run(main()).count == 5
+    assert _phases(tracer, 'getcount') == ['queue', 'rate_limit'] + NETWORK + ['json', 'validate']
+    assert tracer.spans[-1].attributes == {
+        'proxy6.method': 'getcount', 'proxy6.priority': 'read', 'http.status_code': 200
+    }
+
+
+def test_sync_phase_breakdown_has_no_queue():
+    api = FakeAPI(getcount=lambda params: ok(count=5))
+    tracer = tracing.RecordingTracer()
+    client = Proxy6('key', transport=httpx.MockTransport(_sync_handler(api)))
+    unthrottle(client)
+    client.tracer = tracer
+    assert client.get_count('ru').count == 5
+    assert _phases(tracer, 'getcount') == ['rate_limit'] + NETWORK + ['json', 'validate']
+    assert tracer.spans[-1].attributes['proxy6.attempt'] == 0
+
+
+def test_raw_request_trace_is_not_left_pending():
+    api = FakeAPI(getcount=lambda params: ok(count=5))
+    tracer = tracing.RecordingTracer()
+    client = Proxy6('key', transport=api.transport())
+    unthrottle(client)
+    client.tracer = tracer
+    assert client.make_request('getcount', {'country': 'ru'})['count'] == 5
+    assert tracing._pending.get() is None
+    assert _phases(tracer, 'getcount') == ['rate_limit', 'json']
+
+    async def main():
+        aclient = AsyncProxy6('key', transport=api.transport())
+        unthrottle(aclient)
+        aclient.tracer = tracer
+        await aclient.make_request('getcount', {'country': 'ru'})
+        assert tracing._pending.get() is None
+
+    tracer.clear()
+    asyncio.run(main())
+    assert _phases(tracer, 'getcount') == ['queue', 'rate_limit', 'json']
+
+
+def test_failed_call_is_traced_with_error():
+    api = FakeAPI(getcount=lambda params: {'status': 'no', 'error_id': 100, 'error': 'Error key'})
+    tracer = tracing.RecordingTracer()
+
+    async def main():
+        client = AsyncProxy6('key', transport=api.transport())
+        unthrottle(client)
+        client.tracer = tracer
+        with pytest.raises(errors.KeyAPIError):
+            await client.get_count('ru')
+
+    asyncio.run(main())
+    parent = tracer.spans[-1]
+    assert parent.name == 'proxy6 getcount'
+    assert parent.attributes['error.type'] == 'KeyAPIError'
+    assert isinstance(parent.exception, errors.KeyAPIError)
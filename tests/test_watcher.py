@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Inventory watcher tests.
+#  Created by LulzLoL231 at 19/10/26
+#
+import asyncio
+import time
+
+from proxy6.async_.api import AsyncProxy6
+from proxy6.watcher import InventoryWatcher, ProxyEventKind, diff_inventory
+
+from .utils import FakeAPI, make_proxy, ok, proxy_info, unthrottle
+
+
+def make_watcher(inventory: dict, **kwargs) -> tuple[InventoryWatcher, FakeAPI]:
+    api = FakeAPI(getproxy=lambda params: ok(list_count=len(inventory), list=dict(inventory)))
+    client = AsyncProxy6('key', transport=api.transport(), refresh_ahead=True)
+    unthrottle(client)
+    return InventoryWatcher(client, **kwargs), api
+
+
+def test_diff_inventory_kinds():
+    old = {
+        '1': proxy_info('1'), '2': proxy_info('2'),
+        '3': proxy_info('3'), '4': proxy_info('4'),
+    }
+    new = {
+        '1': proxy_info('1'),
+        '2': proxy_info('2', date_end='2028-01-01 00:00:00'),
+        '3': proxy_info('3', descr='new', type='socks'),
+        '5': proxy_info('5'),
+    }
+    kinds = sorted((e.id, e.kind.value) for e in diff_inventory(old, new))
+    assert kinds == [
+        ('2', 'prolonged'), ('3', 'descr_changed'), ('3', 'type_changed'),
+        ('4', 'removed'), ('5', 'added'),
+    ]
+
+
+def test_polls_bypass_response_cache():
+    inventory = {'1': make_proxy('1')}
+
+    async def main():
+        watcher, api = make_watcher(inventory)
+        assert await watcher.poll() == []
+        inventory['2'] = make_proxy('2')
+        events = await watcher.poll()
+        assert [(e.kind, e.id) for e in events] == [(ProxyEventKind.ADDED, '2')]
+        assert api.methods() == ['getproxy', 'getproxy']
+
+    asyncio.run(main())
+
+
+def test_expired_is_reported_once():
+    inventory = {'1': make_proxy('1')}
+
+    async def main():
+        watcher, _ = make_watcher(inventory)
+        await watcher.poll()
+        inventory['1'] = make_proxy('1', active='0')
+        assert [e.kind for e in await watcher.poll()] == [ProxyEventKind.EXPIRED]
+        assert await watcher.poll() == []
+
+    asyncio.run(main())
+
+
+def test_events_are_kept_before_first_iteration():
+    inventory = {}
+
+    async def main():
+        watcher, _ = make_watcher(inventory)
+        await watcher.poll()
+        stream = watcher.events()
+        inventory['1'] = make_proxy('1')
+        await watcher.poll()
+        event = await asyncio.wait_for(stream.__anext__(), 1)
+        assert event.id == '1'
+        await stream.aclose()
+        assert watcher._queues == []
+
+    asyncio.run(main())
+
+
+def test_slow_subscriber_drops_oldest_events():
+    inventory = {}
+
+    async def main():
+        watcher, _ = make_watcher(inventory)
+        await watcher.poll()
+        stream = watcher.events(maxsize=2)
+        inventory.update({str(i): make_proxy(str(i)) for i in range(3)})
+        await watcher.poll()
+        assert watcher.dropped == 1
+        assert [(await stream.__anext__()).id for _ in range(2)] == ['1', '2']
+
+    asyncio.run(main())
+
+
+def test_stop_ends_streams_also_after_stop():
+    async def main():
+        watcher, _ = make_watcher({}, min_interval=60)
+        stream = watcher.events()
+        watcher.start()
+        await asyncio.sleep(0.05)
+        await watcher.stop()
+        assert [e async for e in stream] == []
+        later = await asyncio.wait_for(_collect(watcher.events()), 1)
+        assert later == []
+
+    asyncio.run(main())
+
+
+async def _collect(stream) -> list:
+    return [event async for event in stream]
+
+
+def test_interval_backs_off_and_resets():
+    watcher, _ = make_watcher({}, min_interval=2, max_interval=5, backoff=2)
+    watcher.inventory = {}
+    assert watcher._next_interval(False) == 4
+    watcher.interval = 4
+    assert watcher._next_interval(False) == 5
+    assert watcher._next_interval(True) == 2
+
+
+def test_interval_shrinks_before_date_end():
+    watcher, _ = make_watcher({}, min_interval=1, max_interval=300)
+    watcher.interval = 300
+    soon = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time() + 10))
+    watcher.inventory = {'1': proxy_info('1', date_end=soon)}
+    assert 5 < watcher._next_interval(False) <= 12
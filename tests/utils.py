@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+#  pyProxy6 API: Test helpers.
+#  Created by LulzLoL231 at 19/10/26
+#
+from urllib.parse import parse_qs
+
+import httpx
+
+from proxy6 import types
+
+
+def make_proxy(id: str, **fields) -> dict:
+    '''Returns raw `getproxy` list entry.
+    '''
+    proxy = {
+        'id': id, 'ip': '10.0.0.1', 'host': '10.0.0.1', 'port': '8000',
+        'user': 'user', 'pass': 'pass', 'type': 'http', 'version': '4',
+        'country': 'ru', 'date': '2026-01-01 00:00:00',
+        'date_end': '2027-01-01 00:00:00', 'unixtime': 1767225600,
+        'unixtime_end': 1798761600, 'descr': '', 'active': '1'
+    }
+    proxy.update(fields)
+    return proxy
+
+
+def proxy_info(id: str, **fields) -> types.ProxyInfo:
+    return types.ProxyInfo.model_validate(make_proxy(id, **fields))
+
+
+def ok(**fields) -> dict:
+    '''Returns successful API response body.
+    '''
+    resp = {'status': 'yes', 'user_id': '1', 'balance': '100', 'currency': 'RUB'}
+    resp.update(fields)
+    return resp
+
+
+class FakeAPI:
+    '''`httpx.MockTransport` handler dispatching API methods to `handlers`.
+
+    Each handler gets the query params and returns the response body, a
+    `httpx.Response` or raises. Calls are recorded as (method, params).
+    '''
+
+    def __init__(self, **handlers) -> None:
+        self.handlers = handlers
+        self.calls: list[tuple[str, dict]] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        method = request.url.path.rstrip('/').split('/')[-1]
+        params = {k: v[0] for k, v in parse_qs(request.url.query.decode()).items()}
+        self.calls.append((method, params))
+        resp = self.handlers[method](params)
+        if isinstance(resp, httpx.Response):
+            return resp
+        return httpx.Response(200, json=resp)
+
+    def methods(self) -> list[str]:
+        return [method for method, _ in self.calls]
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self)
+
+
+def unthrottle(client) -> None:
+    '''Lifts the client rate limit so tests don't wait for it.
+    '''
+    client.request_delayer.MAX_REQUESTS_PER_INTERVAL = 10 ** 6